@@ -1,240 +1,415 @@
-import streamlit as st
-import os
-from crew_config import build_agent
-from rag_pipeline import build_vector_store
-import logging
-from datetime import datetime
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Page configuration
-st.set_page_config(
-    page_title="Agentic RAG Assistant", 
-    page_icon="🤖", 
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "agent" not in st.session_state:
-    st.session_state.agent = None
-if "vectorstore" not in st.session_state:
-    st.session_state.vectorstore = None
-if "pdf_loaded" not in st.session_state:
-    st.session_state.pdf_loaded = False
-
-# Sidebar for configuration
-with st.sidebar:
-    st.header("⚙️ Configuration")
-    
-    # API Key status
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        st.success("✅ Google API Key loaded")
-    else:
-        st.error("❌ Google API Key not found")
-        st.info("Please add your Google API Key to the .env file")
-    
-    st.divider()
-    
-    # PDF Upload
-    st.subheader("📄 Document Upload")
-    uploaded_file = st.file_uploader(
-        "Upload a PDF document for RAG", 
-        type=["pdf"],
-        help="Upload a PDF to enable context-aware responses"
-    )
-    
-    if uploaded_file:
-        if st.button("Process PDF"):
-            with st.spinner("Processing PDF..."):
-                try:
-                    # Save uploaded file
-                    with open("temp_document.pdf", "wb") as f:
-                        f.write(uploaded_file.getvalue())
-                    
-                    # Build vector store
-                    st.session_state.vectorstore = build_vector_store("temp_document.pdf")
-                    st.session_state.pdf_loaded = True
-                    st.success("PDF processed successfully!")
-                    
-                    # Clean up temp file
-                    if os.path.exists("temp_document.pdf"):
-                        os.remove("temp_document.pdf")
-                        
-                except Exception as e:
-                    st.error(f"Error processing PDF: {str(e)}")
-                    logger.error(f"PDF processing error: {str(e)}")
-    
-    # Default document check
-    if not st.session_state.pdf_loaded:
-        if os.path.exists("Career_Advisor_Guide_2025.pdf"):
-            if st.button("Load Default Document"):
-                with st.spinner("Loading default document..."):
-                    try:
-                        st.session_state.vectorstore = build_vector_store("Career_Advisor_Guide_2025.pdf")
-                        st.session_state.pdf_loaded = True
-                        st.success("Default document loaded!")
-                    except Exception as e:
-                        st.error(f"Error loading default document: {str(e)}")
-        else:
-            st.info("No default document found. Upload a PDF to enable RAG.")
-    
-    st.divider()
-    
-    # Student Profile
-    st.subheader("👤 Student Profile")
-    student_profile = st.text_area(
-        "Describe your background",
-        value="AI enthusiast interested in machine learning and career development",
-        height=100,
-        help="This helps personalize responses to your background and interests"
-    )
-    
-    st.divider()
-    
-    # Settings
-    st.subheader("🔧 Settings")
-    max_context_docs = st.slider(
-        "Max context documents", 
-        min_value=1, 
-        max_value=10, 
-        value=3,
-        help="Number of relevant documents to retrieve for context"
-    )
-    
-    # Clear chat button
-    if st.button("🗑️ Clear Chat History"):
-        st.session_state.messages = []
-        st.rerun()
-
-# Main interface
-st.title("🤖 Agentic RAG Assistant")
-st.markdown(
-    "An intelligent assistant powered by Google Gemini with Retrieval-Augmented Generation capabilities."
-)
-
-# Status indicators
-col1, col2, col3 = st.columns(3)
-with col1:
-    if api_key:
-        st.success("🔑 API Connected")
-    else:
-        st.error("🔑 API Not Connected")
-
-with col2:
-    if st.session_state.agent:
-        st.success("🤖 Agent Ready")
-    else:
-        st.warning("🤖 Agent Loading...")
-
-with col3:
-    if st.session_state.pdf_loaded:
-        st.success("📄 RAG Enabled")
-    else:
-        st.info("📄 RAG Disabled")
-
-st.divider()
-
-# Initialize agent if not already done
-if not st.session_state.agent and api_key:
-    try:
-        with st.spinner("Initializing AI agent..."):
-            st.session_state.agent = build_agent()
-        st.success("Agent initialized successfully!")
-        st.rerun()
-    except Exception as e:
-        st.error(f"Failed to initialize agent: {str(e)}")
-        logger.error(f"Agent initialization error: {str(e)}")
-
-# Chat interface
-if st.session_state.agent:
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
-            if "timestamp" in msg:
-                st.caption(f"*{msg['timestamp']}*")
-    
-    # User input
-    if query := st.chat_input("Ask me anything about your career, AI, or upload a document for specific questions..."):
-        # Add user message
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        st.session_state.messages.append({
-            "role": "user", 
-            "content": query,
-            "timestamp": timestamp
-        })
-        
-        with st.chat_message("user"):
-            st.markdown(query)
-            st.caption(f"*{timestamp}*")
-        
-        # Generate response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    context = ""
-                    
-                    # Retrieve context if RAG is enabled
-                    if st.session_state.pdf_loaded and st.session_state.vectorstore:
-                        try:
-                            docs = st.session_state.vectorstore.similarity_search(
-                                query, k=max_context_docs
-                            )
-                            context = "\n\n".join([d.page_content for d in docs])
-                            
-                            # Show retrieved context in expander
-                            if context:
-                                with st.expander("📚 Retrieved Context"):
-                                    st.text(context[:500] + "..." if len(context) > 500 else context)
-                        except Exception as e:
-                            st.warning(f"Could not retrieve context: {str(e)}")
-                            logger.warning(f"Context retrieval error: {str(e)}")
-                    
-                    # Generate response
-                    if context:
-                        response = st.session_state.agent.respond(
-                            context=context, 
-                            query=query, 
-                            student_profile=student_profile
-                        )
-                    else:
-                        response = st.session_state.agent.respond(
-                            query=query, 
-                            student_profile=student_profile
-                        )
-                    
-                    st.markdown(response)
-                    response_timestamp = datetime.now().strftime("%H:%M:%S")
-                    st.caption(f"*{response_timestamp}*")
-                    
-                    # Add assistant message
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": response,
-                        "timestamp": response_timestamp
-                    })
-                    
-                except Exception as e:
-                    error_msg = f"I apologize, but I encountered an error: {str(e)}"
-                    st.error(error_msg)
-                    logger.error(f"Response generation error: {str(e)}")
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": error_msg,
-                        "timestamp": datetime.now().strftime("%H:%M:%S")
-                    })
-else:
-    st.info("🔄 Please ensure your Google API key is configured in the .env file to start chatting.")
-    
-    # Show sample .env content
-    st.code("""
-# Add this to your .env file:
-GOOGLE_API_KEY=your_api_key_here
+import streamlit as st
+import os
+from crew_config import build_agent
+from embeddings import embedding_stats
+from reranker import Reranker
+from retrieval import CachedRetriever, shared_query_batcher
+from web_search import build_web_searcher
+from context import CONTEXT_TOKEN_BUDGET, assemble_context
+from memory import ConversationMemory
+from uploads import touch_upload
+from jobs import shared_queue
+import metrics
+import time
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Page configuration
+st.set_page_config(
+    page_title="Agentic RAG Assistant", 
+    page_icon="🤖", 
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Initialize session state
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+if "memory" not in st.session_state:
+    # What the agent sees of the chat; messages above is only for display
+    st.session_state.memory = ConversationMemory()
+if "agent" not in st.session_state:
+    st.session_state.agent = None
+if "vectorstore" not in st.session_state:
+    st.session_state.vectorstore = None
+if "pdf_loaded" not in st.session_state:
+    st.session_state.pdf_loaded = False
+if "persist_dir" not in st.session_state:
+    st.session_state.persist_dir = "chroma_db"
+if "upload" not in st.session_state:
+    st.session_state.upload = None
+if "pending_job" not in st.session_state:
+    st.session_state.pending_job = None
+
+def apply_finished_job():
+    """Swap in the index of this session's ingestion job once it has finished"""
+    pending = st.session_state.pending_job
+    if pending is None:
+        return
+    job = shared_queue().get(pending["id"])
+    if job is None:
+        st.session_state.pending_job = None
+        return
+    if not job.done:
+        return
+    
+    st.session_state.pending_job = None
+    if job.status == "done":
+        # Chat keeps using the previous index until this single swap
+        info = job.result
+        vectorstore = job.take_vectorstore()
+        if vectorstore is None:
+            st.session_state.ingest_error = f"Index for {job.name} is no longer available"
+            return
+        st.session_state.vectorstore = vectorstore
+        st.session_state.persist_dir = info["persist_dir"]
+        st.session_state.upload = info if pending["upload"] else None
+        st.session_state.pdf_loaded = True
+        st.toast(f"✅ {job.name} is ready")
+    else:
+        st.session_state.ingest_error = f"Error processing {job.name}: {job.error}"
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "estimating..."
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    return f"{seconds // 60:.0f}m {seconds % 60:.0f}s"
+
+def show_job_progress():
+    """Progress bar for this session's ingestion job"""
+    pending = st.session_state.pending_job
+    job = shared_queue().get(pending["id"]) if pending else None
+    if job is None:
+        return
+    if job.done:
+        # Rerun the whole script so the new index is swapped in
+        st.rerun()
+    
+    progress = job.snapshot()
+    if progress["status"] == "queued":
+        st.caption(f"⏳ {progress['name']}: queued")
+        return
+    pages = f"{progress['pages']}/{progress['pages_total']}" if progress["pages_total"] else str(progress["pages"])
+    st.progress(progress["fraction"] or 0.0,
+                text=f"📥 {progress['name']}: {pages} pages, {progress['embedded']} chunks embedded")
+    st.caption(f"ETA {format_seconds(progress['eta_seconds'])} · you can keep chatting meanwhile")
+    if not hasattr(st, "fragment"):
+        st.button("🔄 Refresh progress")
+
+# Refresh only the progress panel every second where Streamlit supports it
+if hasattr(st, "fragment"):
+    show_job_progress = st.fragment(run_every=1.0)(show_job_progress)
+
+apply_finished_job()
+
+# Sidebar for configuration
+with st.sidebar:
+    st.header("⚙️ Configuration")
+    
+    # API Key status
+    api_key = os.getenv("GOOGLE_API_KEY")
+    local_backend = os.getenv("LLM_BACKEND", "gemini").lower() == "local"
+    if local_backend:
+        st.info("🧪 Local LLM backend (offline stand-in)")
+    elif api_key:
+        st.success("✅ Google API Key loaded")
+    else:
+        st.error("❌ Google API Key not found")
+        st.info("Please add your Google API Key to the .env file")
+    
+    st.divider()
+    
+    # PDF Upload
+    st.subheader("📄 Document Upload")
+    uploaded_file = st.file_uploader(
+        "Upload a PDF document for RAG", 
+        type=["pdf"],
+        help="Upload a PDF to enable context-aware responses"
+    )
+    
+    if uploaded_file:
+        if st.button("Process PDF"):
+            try:
+                # Each distinct PDF gets its own collection keyed by its hash,
+                # so sessions stay isolated and repeat uploads are not re-embedded.
+                # Indexing runs in the background; only the copy happens here.
+                uploaded_file.seek(0)
+                job = shared_queue().submit_upload(uploaded_file, uploaded_file.name)
+                st.session_state.pending_job = {"id": job.id, "upload": True}
+            except Exception as e:
+                st.error(f"Error processing PDF: {str(e)}")
+                logger.error(f"PDF processing error: {str(e)}")
+    
+    # Default document check
+    if not st.session_state.pdf_loaded and st.session_state.pending_job is None:
+        if os.path.exists("Career_Advisor_Guide_2025.pdf"):
+            if st.button("Load Default Document"):
+                job = shared_queue().submit_pdf("Career_Advisor_Guide_2025.pdf")
+                st.session_state.pending_job = {"id": job.id, "upload": False}
+        else:
+            st.info("No default document found. Upload a PDF to enable RAG.")
+    
+    if st.session_state.pending_job is not None:
+        show_job_progress()
+    if st.session_state.get("ingest_error"):
+        st.error(st.session_state.pop("ingest_error"))
+    
+    st.divider()
+    
+    # Student Profile
+    st.subheader("👤 Student Profile")
+    student_profile = st.text_area(
+        "Describe your background",
+        value="AI enthusiast interested in machine learning and career development",
+        height=100,
+        help="This helps personalize responses to your background and interests"
+    )
+    
+    st.divider()
+    
+    # Settings
+    st.subheader("🔧 Settings")
+    max_context_docs = st.slider(
+        "Max context documents", 
+        min_value=1, 
+        max_value=10, 
+        value=3,
+        help="Number of relevant documents to retrieve for context"
+    )
+    context_token_budget = st.slider(
+        "Context token budget",
+        min_value=250,
+        max_value=4000,
+        value=CONTEXT_TOKEN_BUDGET,
+        step=250,
+        help="Retrieved text is de-duplicated and packed by relevance up to this many tokens"
+    )
+    rerank_enabled = st.checkbox(
+        "Re-rank results",
+        value=False,
+        help="Score a larger candidate pool with a cross-encoder and keep the best matches"
+    )
+    rerank_budget_ms = st.slider(
+        "Re-ranking budget (ms)",
+        min_value=50,
+        max_value=1000,
+        value=150,
+        step=50,
+        disabled=not rerank_enabled,
+        help="Re-ranking stops early once this budget would be exceeded"
+    )
+    reranker = None
+    if rerank_enabled:
+        # Kept across reruns; rebuilt only when the budget changes
+        reranker = st.session_state.get("reranker")
+        if reranker is None or reranker.budget_seconds != rerank_budget_ms / 1000:
+            reranker = Reranker(budget_seconds=rerank_budget_ms / 1000)
+            st.session_state.reranker = reranker
+    if reranker is not None:
+        # Loads once per process; turns skip re-ranking until it is ready
+        reranker.start_loading()
+        if not reranker.ready:
+            st.caption("⏳ Loading re-ranking model...")
+    # A bad web search setting disables the feature instead of the page
+    web_search_error = None
+    try:
+        web_search_default = build_web_searcher() is not None
+    except ValueError as e:
+        web_search_default, web_search_error = False, str(e)
+    web_search_enabled = st.checkbox(
+        "🌐 Web search",
+        value=web_search_default,
+        help="Add web results to the context; slow searches are cut off so answers are not delayed"
+    )
+    web_searcher = None
+    if web_search_enabled:
+        try:
+            web_searcher = build_web_searcher(enabled=True)
+        except ValueError as e:
+            web_search_error = str(e)
+    if web_search_error:
+        st.warning(f"🌐 Web search is unavailable: {web_search_error}")
+    
+    # Embedding model cost (shared by every session in this process)
+    model_stats = embedding_stats()
+    if model_stats:
+        with st.expander("🧠 Embedding Model"):
+            for stats in model_stats:
+                st.caption(stats["model_name"])
+                st.text(f"Load time: {stats['load_seconds']:.2f}s")
+                if stats["rss_delta_bytes"] is not None:
+                    st.text(f"Memory: +{stats['rss_delta_bytes'] / 1e6:.0f} MB")
+                st.text(f"Reused: {stats['hits']} times")
+    
+    # Per-stage timings of recent turns (all sessions in this process)
+    timing_stats = metrics.snapshot()
+    if timing_stats["stages"]:
+        with st.expander("⏱️ Recent Timings"):
+            st.table([
+                {"Stage": name, "Last ms": f"{stage['last_ms']:.1f}",
+                 "p50 ms": f"{stage['p50_ms']:.1f}", "p95 ms": f"{stage['p95_ms']:.1f}"}
+                for name, stage in sorted(timing_stats["stages"].items())
+            ])
+            for name, value in sorted(timing_stats["counters"].items()):
+                st.caption(f"{name}: {value:g}")
+    
+    # Clear chat button
+    if st.button("🗑️ Clear Chat History"):
+        st.session_state.messages = []
+        st.session_state.memory.clear()
+        st.rerun()
+
+# Main interface
+st.title("🤖 Agentic RAG Assistant")
+st.markdown(
+    "An intelligent assistant powered by Google Gemini with Retrieval-Augmented Generation capabilities."
+)
+
+# Status indicators
+col1, col2, col3 = st.columns(3)
+with col1:
+    if local_backend:
+        st.info("🧪 Local Backend")
+    elif api_key:
+        st.success("🔑 API Connected")
+    else:
+        st.error("🔑 API Not Connected")
+
+with col2:
+    if st.session_state.agent:
+        st.success("🤖 Agent Ready")
+    else:
+        st.warning("🤖 Agent Loading...")
+
+with col3:
+    if st.session_state.pdf_loaded:
+        st.success("📄 RAG Enabled")
+    elif st.session_state.pending_job is not None:
+        st.info("📥 Indexing Document...")
+    else:
+        st.info("📄 RAG Disabled")
+
+st.divider()
+
+# Initialize agent if not already done
+if not st.session_state.agent and (api_key or local_backend):
+    try:
+        with st.spinner("Initializing AI agent..."):
+            st.session_state.agent = build_agent()
+        st.success("Agent initialized successfully!")
+        st.rerun()
+    except Exception as e:
+        st.error(f"Failed to initialize agent: {str(e)}")
+        logger.error(f"Agent initialization error: {str(e)}")
+
+# Chat interface
+if st.session_state.agent:
+    # Display chat history
+    for msg in st.session_state.messages:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+            if "timestamp" in msg:
+                st.caption(f"*{msg['timestamp']}*")
+    
+    # User input
+    if query := st.chat_input("Ask me anything about your career, AI, or upload a document for specific questions..."):
+        # Add user message
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        st.session_state.messages.append({
+            "role": "user", 
+            "content": query,
+            "timestamp": timestamp
+        })
+        
+        with st.chat_message("user"):
+            st.markdown(query)
+            st.caption(f"*{timestamp}*")
+        
+        # Generate response
+        with st.chat_message("assistant"):
+            try:
+                turn_start = time.perf_counter()
+                context = ""
+                docs = []
+                
+                # Started first so the web round trip overlaps document search
+                pending_web = web_searcher.start(query) if web_searcher is not None else None
+                
+                # Retrieve context if RAG is enabled
+                if st.session_state.pdf_loaded and st.session_state.vectorstore:
+                    try:
+                        with st.spinner("Searching documents..."):
+                            # Uploads and the default document both live in the
+                            # upload store, which drops indexes left unused
+                            touch_upload(st.session_state.persist_dir)
+                            vectorstore = st.session_state.vectorstore
+                            retriever = CachedRetriever(vectorstore,
+                                                        persist_dir=st.session_state.persist_dir,
+                                                        reranker=reranker,
+                                                        batcher=shared_query_batcher(vectorstore.embeddings))
+                            docs = retriever.search(query, k=max_context_docs)
+                    except Exception as e:
+                        st.warning(f"Could not retrieve context: {str(e)}")
+                        logger.warning(f"Context retrieval error: {str(e)}")
+                
+                if pending_web is not None:
+                    with st.spinner("Searching the web..."):
+                        docs = docs + pending_web.result()
+                
+                # Local passages first, so web results only fill leftover budget
+                context = assemble_context(docs, max_tokens=context_token_budget)
+                
+                # Show retrieved context in expander
+                if context:
+                    with st.expander("📚 Retrieved Context"):
+                        st.text(context[:500] + "..." if len(context) > 500 else context)
+                
+                # Stream the response into the message as chunks arrive
+                placeholder = st.empty()
+                placeholder.markdown("Thinking...")
+                response = ""
+                for chunk in st.session_state.agent.respond_stream(
+                    context=context, 
+                    query=query, 
+                    student_profile=student_profile,
+                    history=st.session_state.memory.render()
+                ):
+                    response += chunk
+                    placeholder.markdown(response + "▌")
+                placeholder.markdown(response)
+                metrics.record("turn.total", time.perf_counter() - turn_start)
+                st.session_state.memory.add_turn(query, response)
+                
+                response_timestamp = datetime.now().strftime("%H:%M:%S")
+                st.caption(f"*{response_timestamp}*")
+                
+                # Add assistant message
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": response,
+                    "timestamp": response_timestamp
+                })
+                
+            except Exception as e:
+                error_msg = f"I apologize, but I encountered an error: {str(e)}"
+                st.error(error_msg)
+                logger.error(f"Response generation error: {str(e)}")
+                
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": error_msg,
+                    "timestamp": datetime.now().strftime("%H:%M:%S")
+                })
+else:
+    st.info("🔄 Please ensure your Google API key is configured in the .env file to start chatting.")
+    
+    # Show sample .env content
+    st.code("""
+# Add this to your .env file:
+GOOGLE_API_KEY=your_api_key_here
 """, language="bash")
\ No newline at end of file
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for ingestion, retrieval and end-to-end turns.
+
+Generates synthetic PDFs of configurable size, then measures:
+    - ingestion throughput (pages/sec, chunks/sec) per corpus size
+    - similarity_search p50/p95/p99 latency for k=1..10, plus the BM25 and
+      hybrid (dense + BM25 with reciprocal-rank fusion) latency per k
+    - vector search alone (pre-computed query embeddings) on Chroma versus the
+      memory-mapped NumPy backend, single and batched, and its open time
+    - end-to-end turn latency (retrieve + respond) against the local LLM stand-in
+    - query embedding throughput under concurrency, one query per forward pass
+      versus micro-batched across callers
+    - web search against the local stand-in search server: cold fan-out,
+      cached repeats, and a server slower than the latency budget
+    - rendered conversation history against its token budget, for a long
+      chat and for a single oversized question
+Results are written as JSON so runs can be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+# Setup logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+VOCABULARY = (
+    "career machine learning data science engineering internship degree course "
+    "certification mathematics statistics python programming research university "
+    "college entrance exam scholarship mentor portfolio project interview salary "
+    "skills industry analytics design management finance medicine law commerce "
+    "biology physics chemistry robotics cloud security networks startup placement"
+).split()
+
+QUERIES = [
+    "What courses should I take for machine learning?",
+    "Which entrance exam is needed for engineering colleges?",
+    "How do I build a data science portfolio?",
+    "What skills do recruiters look for in interviews?",
+    "Are scholarships available for research degrees?",
+    "Which certification helps a cloud security career?",
+    "How important is mathematics for robotics?",
+    "What salary can a finance analyst expect?",
+]
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_synthetic_pdf(path: str, pages: int, words_per_page: int = 350,
+                        seed: int = 0) -> None:
+    """
+    Write a text PDF with random career-guide vocabulary using only the stdlib.
+
+    Args:
+        path: Output file path
+        pages: Number of pages
+        words_per_page: Words of body text on each page
+        seed: Seed so the same arguments always produce the same PDF
+    """
+    rng = random.Random(seed)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    page_ids = []
+    next_id = 4
+    for page_no in range(pages):
+        words = [rng.choice(VOCABULARY) for _ in range(words_per_page)]
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        text_ops = " ".join(f"({_pdf_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 40 800 Td 13 TL (Page {page_no + 1}) ' {text_ops} ET".encode("latin-1")
+        objects[next_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (next_id + 1)
+        )
+        objects[next_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        page_ids.append(next_id)
+        next_id += 2
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in range(1, next_id):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % next_id
+    for obj_id in range(1, next_id):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref_offset)
+
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def latency_summary(seconds: List[float]) -> dict:
+    """p50/p95/p99/mean of a list of durations, in milliseconds."""
+    return {
+        "count": len(seconds),
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "mean_ms": (sum(seconds) / len(seconds) * 1000) if seconds else 0.0,
+    }
+
+def bench_ingestion(pdf_path: str, persist_dir: str, pages: int) -> dict:
+    """Time a cold build of one synthetic PDF into a fresh index."""
+    from embeddings import current_rss_bytes
+    from rag_pipeline import build_vector_store, load_existing_vector_store
+
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    vectorstore = build_vector_store(pdf_path, persist_dir=persist_dir)
+    seconds = time.perf_counter() - start
+    chunks = len(vectorstore.get(include=[])["ids"])
+
+    # A second build of the same file exercises the incremental fast path
+    start = time.perf_counter()
+    build_vector_store(pdf_path, persist_dir=persist_dir)
+    warm_seconds = time.perf_counter() - start
+
+    # Same chunks in the NumPy backend, copied from Chroma without re-embedding
+    build_vector_store(pdf_path, persist_dir=persist_dir, backend="numpy")
+    start = time.perf_counter()
+    numpy_store = load_existing_vector_store(persist_dir, backend="numpy")
+    numpy_open_seconds = time.perf_counter() - start
+
+    rss_after = current_rss_bytes()
+    return {
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds if seconds else 0.0,
+        "chunks_per_sec": chunks / seconds if seconds else 0.0,
+        "warm_rebuild_seconds": warm_seconds,
+        "numpy_open_ms": numpy_open_seconds * 1000,
+        "rss_bytes": rss_after,
+        "rss_delta_bytes": (rss_after - rss_before
+                            if rss_before is not None and rss_after is not None else None),
+        "_vectorstore": vectorstore,
+        "_numpy_store": numpy_store,
+    }
+
+def bench_retrieval(vectorstore, persist_dir: str, pages: int, ks: List[int],
+                    repeats: int, numpy_store=None) -> List[dict]:
+    """
+    Dense, BM25 and hybrid search latency per k, uncached, over the query set.
+
+    With numpy_store, also times vector search alone on both backends
+    (embeddings computed up front), and the NumPy backend answering the
+    whole query set in one batch (reported per query).
+    """
+    from rag_pipeline import hybrid_search, load_bm25_index
+
+    bm25 = load_bm25_index(persist_dir, vectorstore)
+    query_vectors = vectorstore.embeddings.embed_documents(QUERIES)
+    results = []
+    for k in ks:
+        timings, lexical, hybrid = [], [], []
+        chroma_vector, numpy_vector, numpy_batch = [], [], []
+        for _ in range(repeats):
+            for query in QUERIES:
+                start = time.perf_counter()
+                vectorstore.similarity_search(query, k=k)
+                timings.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                bm25.search(query, k)
+                lexical.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                hybrid_search(vectorstore, query, k=k, persist_dir=persist_dir)
+                hybrid.append(time.perf_counter() - start)
+
+            if numpy_store is None:
+                continue
+            for query_vector in query_vectors:
+                start = time.perf_counter()
+                vectorstore.similarity_search_by_vector(query_vector, k=k)
+                chroma_vector.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                numpy_store.similarity_search_by_vector(query_vector, k=k)
+                numpy_vector.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            numpy_store.similarity_search_by_vectors(query_vectors, k=k)
+            numpy_batch.append((time.perf_counter() - start) / len(query_vectors))
+        row = {"pages": pages, "k": k, **latency_summary(timings),
+               "lexical": latency_summary(lexical),
+               "hybrid": latency_summary(hybrid)}
+        if numpy_store is not None:
+            row.update(chroma_vector=latency_summary(chroma_vector),
+                       numpy_vector=latency_summary(numpy_vector),
+                       numpy_batch_per_query=latency_summary(numpy_batch))
+        results.append(row)
+    return results
+
+def bench_turns(vectorstore, persist_dir: str, pages: int, turns: int, k: int,
+                llm_latency: float) -> dict:
+    """End-to-end turn latency: cached retrieval + respond on the local backend."""
+    from context import assemble_context
+    from crew_config import LocalBackend, build_agent
+    from retrieval import CachedRetriever, RetrievalCache
+
+    agent = build_agent(use_cache=False, backend=LocalBackend(latency_seconds=llm_latency))
+    retriever = CachedRetriever(vectorstore, persist_dir=persist_dir, cache=RetrievalCache())
+    totals, retrieval, generation = [], [], []
+    for i in range(turns):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        docs = retriever.search(query, k=k)
+        mid = time.perf_counter()
+        agent.respond(context=assemble_context(docs), query=query)
+        end = time.perf_counter()
+        retrieval.append(mid - start)
+        generation.append(end - mid)
+        totals.append(end - start)
+    return {
+        "pages": pages,
+        "k": k,
+        "llm_latency_seconds": llm_latency,
+        "turn": latency_summary(totals),
+        "retrieval": latency_summary(retrieval),
+        "generation": latency_summary(generation),
+        "cache": dict(retriever.cache.stats),
+    }
+
+def bench_query_batching(concurrency: int = 8, queries_per_client: int = 25) -> List[dict]:
+    """
+    Query embedding throughput and latency with concurrent callers, with and
+    without the micro-batcher (each query distinct, so no cache is involved).
+    """
+    from embeddings import get_embeddings
+    from retrieval import QueryEmbeddingBatcher
+
+    embeddings = get_embeddings()
+    modes = {"unbatched": embeddings.embed_query,
+             "batched": QueryEmbeddingBatcher(embeddings).embed_query}
+    results = []
+    for mode, embed in modes.items():
+        def client(worker: int) -> List[float]:
+            latencies = []
+            for i in range(queries_per_client):
+                query = f"{QUERIES[(worker + i) % len(QUERIES)]} ({worker}-{i})"
+                start = time.perf_counter()
+                embed(query)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [value for values in pool.map(client, range(concurrency)) for value in values]
+        seconds = time.perf_counter() - start
+        results.append({"mode": mode, "concurrency": concurrency,
+                        "queries_per_sec": len(latencies) / seconds if seconds else 0.0,
+                        **latency_summary(latencies)})
+    return results
+
+def bench_web_search(latency_seconds: float = 0.2, budget_seconds: float = 0.5,
+                     repeats: int = 3) -> List[dict]:
+    """
+    Web search turn overhead on the local search server: cold queries,
+    cached repeats, and a server three times slower than the budget.
+    """
+    from web_search import HttpSearchProvider, LocalSearchServer, WebSearcher
+
+    server = LocalSearchServer(latency_seconds=latency_seconds).start()
+    try:
+        searcher = WebSearcher(HttpSearchProvider(server.url), budget_seconds=budget_seconds)
+        # First search pays one-time imports and connection setup
+        searcher.search("warmup")
+        results = []
+        for mode in ("cold", "cached", "slow"):
+            if mode == "slow":
+                server.latency_seconds = budget_seconds * 3
+            latencies, found = [], 0
+            for i in range(repeats):
+                for query in QUERIES:
+                    # Cached repeats the first cold pass; the others are all misses
+                    query = f"{query} ({'cold 0' if mode == 'cached' else f'{mode} {i}'})"
+                    start = time.perf_counter()
+                    found += len(searcher.search(query))
+                    latencies.append(time.perf_counter() - start)
+            results.append({"mode": mode, "server_latency_seconds": server.latency_seconds,
+                            "budget_seconds": budget_seconds,
+                            "results_per_query": found / len(latencies),
+                            **latency_summary(latencies)})
+        return results
+    finally:
+        server.stop()
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_history_budget(budgets: tuple = (50, 100, 800), turns: int = 20) -> List[dict]:
+    """Largest rendered history per token budget: a long chat and one oversized turn."""
+    from context import estimate_tokens
+    from memory import ConversationMemory
+
+    answer = " ".join(VOCABULARY * 20)
+    results = []
+    for budget in budgets:
+        memory = ConversationMemory(max_tokens=budget)
+        long_chat = 0
+        for i in range(turns):
+            memory.add_turn(f"{QUERIES[i % len(QUERIES)]} ({i})", answer)
+            long_chat = max(long_chat, estimate_tokens(memory.render()))
+        oversized = ConversationMemory(max_tokens=budget)
+        oversized.add_turn(" ".join(QUERIES * 20), answer)
+        oversized_tokens = estimate_tokens(oversized.render())
+        results.append({"budget_tokens": budget, "turns": turns,
+                        "long_chat_tokens": long_chat, "oversized_turn_tokens": oversized_tokens,
+                        "within_budget": max(long_chat, oversized_tokens) <= budget})
+    return results
+
+def run_benchmarks(sizes: List[int], ks: List[int], repeats: int = 3, turns: int = 50,
+                   llm_latency: float = 0.0, workdir: Optional[str] = None) -> dict:
+    """
+    Run the full suite for each corpus size and return machine-readable results.
+
+    Args:
+        sizes: Corpus sizes in pages
+        ks: Values of k for retrieval latency
+        repeats: Passes over the query set per k
+        turns: End-to-end turns per corpus size
+        llm_latency: Simulated LLM latency for end-to-end turns
+        workdir: Directory for PDFs and indexes (default: a temp dir)
+
+    Returns:
+        Dict with meta, ingestion, retrieval and turns sections
+    """
+    from embeddings import embedding_stats, get_embeddings
+
+    # Load the model up front so ingestion numbers exclude one-time model load
+    get_embeddings()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "ks": ks,
+        },
+        "ingestion": [],
+        "retrieval": [],
+        "turns": [],
+        "query_batching": [],
+        "web_search": [],
+        "history_budget": [],
+    }
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for pages in sizes:
+            print(f"📄 {pages} pages: ingesting...")
+            pdf_path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            write_synthetic_pdf(pdf_path, pages, seed=pages)
+            persist_dir = os.path.join(tmp, f"index_{pages}")
+            ingestion = bench_ingestion(pdf_path, persist_dir, pages)
+            vectorstore = ingestion.pop("_vectorstore")
+            numpy_store = ingestion.pop("_numpy_store")
+            results["ingestion"].append(ingestion)
+
+            print(f"🔍 {pages} pages: retrieval latency...")
+            results["retrieval"].extend(bench_retrieval(vectorstore, persist_dir, pages, ks,
+                                                        repeats, numpy_store))
+
+            print(f"💬 {pages} pages: end-to-end turns...")
+            results["turns"].append(bench_turns(vectorstore, persist_dir, pages, turns, 3, llm_latency))
+
+    print("🧮 Query embedding under concurrency...")
+    results["query_batching"] = bench_query_batching()
+
+    print("🌐 Web search against the local search server...")
+    results["web_search"] = bench_web_search()
+
+    print("🧾 Conversation history against its token budget...")
+    results["history_budget"] = bench_history_budget()
+
+    results["meta"]["embedding_model"] = embedding_stats()
+    return results
+
+def print_summary(results: dict) -> None:
+    print(f"\n{'Pages':>6} {'Chunks':>7} {'Ingest s':>9} {'Pages/s':>8} {'Chunks/s':>9} {'Warm s':>7} {'NumPy open ms':>14}")
+    for row in results["ingestion"]:
+        print(f"{row['pages']:>6} {row['chunks']:>7} {row['seconds']:>9.2f} "
+              f"{row['pages_per_sec']:>8.1f} {row['chunks_per_sec']:>9.1f} {row['warm_rebuild_seconds']:>7.3f} "
+              f"{row['numpy_open_ms']:>14.2f}")
+    print(f"\n{'Pages':>6} {'k':>3} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bm25 p50':>9} {'hybrid p50':>11} "
+          f"{'chroma vec':>11} {'numpy vec':>10} {'numpy batch':>12}")
+    for row in results["retrieval"]:
+        print(f"{row['pages']:>6} {row['k']:>3} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+              f"{row['lexical']['p50_ms']:>9.3f} {row['hybrid']['p50_ms']:>11.2f} "
+              f"{row['chroma_vector']['p50_ms']:>11.3f} {row['numpy_vector']['p50_ms']:>10.3f} "
+              f"{row['numpy_batch_per_query']['p50_ms']:>12.3f}")
+    print(f"\n{'Pages':>6} {'turn p50':>9} {'turn p95':>9} {'retr p50':>9} {'gen p50':>8}")
+    for row in results["turns"]:
+        print(f"{row['pages']:>6} {row['turn']['p50_ms']:>9.2f} {row['turn']['p95_ms']:>9.2f} "
+              f"{row['retrieval']['p50_ms']:>9.2f} {row['generation']['p50_ms']:>8.2f}")
+    print(f"\n{'Query embedding':16} {'Clients':>7} {'Queries/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in results.get("query_batching", []):
+        print(f"{row['mode']:16} {row['concurrency']:>7} {row['queries_per_sec']:>10.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+    print(f"\n{'Web search':11} {'Server ms':>10} {'Budget ms':>10} {'Results':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in results.get("web_search", []):
+        print(f"{row['mode']:11} {row['server_latency_seconds'] * 1000:>10.0f} {row['budget_seconds'] * 1000:>10.0f} "
+              f"{row['results_per_query']:>8.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+    print(f"\n{'History budget':>14} {'Long chat':>10} {'Oversized':>10} {'Within':>7}")
+    for row in results.get("history_budget", []):
+        print(f"{row['budget_tokens']:>14} {row['long_chat_tokens']:>10} {row['oversized_turn_tokens']:>10} "
+              f"{'yes' if row['within_budget'] else 'NO':>7}")
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG benchmark suite")
+    parser.add_argument("--sizes", type=_int_list, default=[10, 50, 200],
+                        help="Comma-separated corpus sizes in pages")
+    parser.add_argument("--ks", type=_int_list, default=list(range(1, 11)),
+                        help="Comma-separated k values for retrieval latency")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Passes over the query set per k")
+    parser.add_argument("--turns", type=int, default=50,
+                        help="End-to-end turns per corpus size")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Simulated LLM latency in seconds for end-to-end turns")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.ks, args.repeats, args.turns, args.llm_latency)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"\n✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import os
+import re
+import logging
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+
+import metrics
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = 1500
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Shared text shorter than this is treated as coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 20
+# Chunks whose page offsets are at most this far apart are adjacent
+MAX_ADJACENT_GAP = 2
+SHINGLE_SIZE = 3
+SEPARATOR = "\n\n"
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?]\s")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+def context_token_budget() -> int:
+    """Token budget for retrieved context from CONTEXT_TOKEN_BUDGET (0 = no limit)."""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", str(CONTEXT_TOKEN_BUDGET)))
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    idx = left.find(probe, max(0, len(left) - len(right)))
+    while idx != -1:
+        if right.startswith(left[idx:]):
+            return len(left) - idx
+        idx = left.find(probe, idx + 1)
+    return 0
+
+def _merge_text(passage: dict, text: str, start: Optional[int]) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Merge a chunk into a passage from the same page.
+
+    Uses page offsets when both sides have them (chunks indexed with
+    start_index), otherwise the overlap the splitter leaves between
+    consecutive chunks. Returns the merged text and start, or None.
+    """
+    current = passage["text"]
+    if text in current:
+        return current, passage["start"]
+    if current in text:
+        return text, start
+
+    p_start = passage["start"]
+    if start is not None and p_start is not None:
+        p_end, end = p_start + len(current), start + len(text)
+        if p_start <= start <= p_end + MAX_ADJACENT_GAP:
+            tail = text[p_end - start:] if start < p_end else " " + text
+            return current + tail, p_start
+        if start <= p_start <= end + MAX_ADJACENT_GAP:
+            tail = current[end - p_start:] if p_start < end else " " + current
+            return text + tail, start
+        return None
+
+    size = _overlap(current, text)
+    if size:
+        return current + text[size:], p_start
+    size = _overlap(text, current)
+    if size:
+        return text + current[size:], start
+    return None
+
+def _merge_chunks(docs: List[Document]) -> List[dict]:
+    """Collapse overlapping and adjacent chunks of the same page into passages."""
+    passages: List[dict] = []
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        if not text:
+            continue
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        start = doc.metadata.get("start_index")
+        target = None
+        if key != (None, None):
+            for passage in passages:
+                if passage["key"] != key:
+                    continue
+                merged = _merge_text(passage, text, start)
+                if merged is not None:
+                    passage["text"], passage["start"] = merged
+                    target = passage
+                    break
+        if target is None:
+            passages.append({"key": key, "text": text, "start": start, "rank": rank})
+            continue
+
+        # The grown passage may now bridge other passages from the page
+        changed = True
+        while changed:
+            changed = False
+            for other in passages:
+                if other is target or other["key"] != key:
+                    continue
+                merged = _merge_text(target, other["text"], other["start"])
+                if merged is not None:
+                    target["text"], target["start"] = merged
+                    target["rank"] = min(target["rank"], other["rank"])
+                    passages.remove(other)
+                    changed = True
+                    break
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _drop_near_duplicates(passages: List[dict], threshold: float) -> List[dict]:
+    """
+    Drop passages whose word shingles mostly appear in a more relevant one.
+
+    Overlap is measured against the smaller shingle set, so a passage that
+    is nearly contained in another counts as a duplicate. When the less
+    relevant passage is the larger one, its text replaces the kept one.
+    """
+    kept: List[dict] = []
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        duplicate = False
+        for other in kept:
+            shared = len(shingles & other["shingles"])
+            if shared / max(1, min(len(shingles), len(other["shingles"]))) >= threshold:
+                if len(shingles) > len(other["shingles"]):
+                    other["text"], other["shingles"] = passage["text"], shingles
+                duplicate = True
+                break
+        if not duplicate:
+            passage["shingles"] = shingles
+            kept.append(passage)
+    return kept
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to a token budget, preferably at a sentence or word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut)]
+    if sentence_ends and sentence_ends[-1] > max_chars // 2:
+        return cut[:sentence_ends[-1]].rstrip()
+    space = cut.rfind(" ")
+    return cut[:space] if space > max_chars // 2 else cut
+
+def assemble_context(docs: List[Document], max_tokens: Optional[int] = None,
+                     near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD) -> str:
+    """
+    Build the context passed to the agent from retrieved documents.
+
+    Overlapping and adjacent chunks of the same page are merged, near-duplicate
+    passages are dropped, and passages are packed by relevance until the token
+    budget is used. A passage that does not fit is skipped so smaller, less
+    relevant ones can still fill the budget; the most relevant passage is
+    truncated rather than dropped when it alone is over budget.
+
+    Args:
+        docs: Retrieved documents, most relevant first
+        max_tokens: Token budget (default: CONTEXT_TOKEN_BUDGET, 0 = no limit)
+        near_duplicate_threshold: Share of word 3-grams above which a
+            passage counts as a duplicate of a more relevant one
+
+    Returns:
+        Context string with passages separated by blank lines
+    """
+    if not docs:
+        return ""
+    if max_tokens is None:
+        max_tokens = context_token_budget()
+
+    with metrics.span("context.assemble"):
+        passages = _drop_near_duplicates(_merge_chunks(docs), near_duplicate_threshold)
+
+        packed: List[str] = []
+        used = 0
+        separator_tokens = estimate_tokens(SEPARATOR)
+        for passage in passages:
+            cost = estimate_tokens(passage["text"]) + (separator_tokens if packed else 0)
+            if max_tokens <= 0 or used + cost <= max_tokens:
+                packed.append(passage["text"])
+                used += cost
+            elif not packed:
+                packed.append(_truncate(passage["text"], max_tokens))
+                used = estimate_tokens(packed[0])
+        context = SEPARATOR.join(packed)
+
+    raw_tokens = estimate_tokens(SEPARATOR.join(doc.page_content for doc in docs))
+    metrics.inc("context_tokens", used)
+    metrics.inc("context_tokens_saved", max(0, raw_tokens - used))
+    metrics.inc("context_passages_skipped", len(passages) - len(packed))
+    logger.debug(f"Assembled {len(docs)} chunks into {len(packed)} passages, "
+                 f"{used}/{raw_tokens} tokens")
+    return context
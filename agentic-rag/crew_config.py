@@ -1,60 +1,340 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
-import logging
-
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Load environment variables
-load_dotenv()
-
-class GeminiRAGAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
-        
-        self.role = "RAG Assistant"
-        self.goal = "Answer queries using retrieval augmented generation"
-        self.backstory = "An AI assistant powered by Google Gemini that provides accurate responses based on retrieved context"
-        
-        logger.info("GeminiRAGAgent initialized successfully")
-    
-    def respond(self, context="", query="", student_profile=""):
-        """Generate response based on context and query"""
-        try:
-            if context and query:
-                prompt = f"""Context: {context}
-                
-Query: {query}
-                
-Based on the provided context, please provide a helpful and accurate response to the query. If the context doesn't contain relevant information, acknowledge this and provide general guidance."""
-            elif query:
-                prompt = f"""Query: {query}
-                
-Student Profile: {student_profile}
-                
-Please provide helpful career guidance and advice based on the query."""
-            else:
-                prompt = context or "Hello! How can I help you today?"
-            
-            response = self.model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
-            return f"I apologize, but I encountered an error while processing your request: {str(e)}"
-
-def build_agent():
-    """Build and return a GeminiRAGAgent instance"""
-    try:
-        return GeminiRAGAgent()
-    except Exception as e:
-        logger.error(f"Failed to build agent: {str(e)}")
-        raise
-
+import os
+import re
+import time
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+import logging
+from typing import AsyncIterator, Iterator, Optional
+import metrics
+from context import estimate_tokens
+from response_cache import ResponseCache
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+class GenerationError(Exception):
+    """The LLM backend failed to produce a response"""
+
+class LLMBackend(ABC):
+    """Text generation backend used by GeminiRAGAgent"""
+    model_name = ""
+    
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """Full response text for a prompt"""
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        yield self.generate(prompt)
+    
+    async def agenerate(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.generate, prompt)
+    
+    async def agenerate_stream(self, prompt: str) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt)
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-generativeai SDK"""
+    
+    def __init__(self, model_name: str = "gemini-1.5-flash"):
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+        
+        import google.generativeai as genai
+        
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+    
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+    
+    async def agenerate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+    
+    async def agenerate_stream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in await self.model.generate_content_async(prompt, stream=True):
+            yield chunk.text
+
+class LocalBackend(LLMBackend):
+    """
+    Offline stand-in that returns deterministic responses.
+    
+    The same prompt always produces the same text. latency_seconds is the
+    simulated time to first token and chunk_delay_seconds the gap between
+    streamed chunks of chunk_words words, so load tests can model an API
+    without network access.
+    """
+    model_name = "local-stub"
+    
+    def __init__(self, latency_seconds: float = 0.0, chunk_delay_seconds: float = 0.0,
+                 chunk_words: int = 5, response_words: int = 60):
+        self.latency_seconds = latency_seconds
+        self.chunk_delay_seconds = chunk_delay_seconds
+        self.chunk_words = max(1, chunk_words)
+        self.response_words = max(1, response_words)
+    
+    def _chunks(self, prompt: str) -> list:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        match = re.search(r"^Query: (.*)$", prompt, re.MULTILINE)
+        topic = (match.group(1) if match else prompt).split()
+        words = [f"[{digest}]"] + [topic[i % len(topic)] if topic else "response"
+                                   for i in range(self.response_words - 1)]
+        return [" ".join(words[i:i + self.chunk_words]) + " "
+                for i in range(0, len(words), self.chunk_words)]
+    
+    def generate(self, prompt: str) -> str:
+        chunks = self._chunks(prompt)
+        time.sleep(self.latency_seconds + self.chunk_delay_seconds * (len(chunks) - 1))
+        return "".join(chunks)
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self.latency_seconds)
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i:
+                time.sleep(self.chunk_delay_seconds)
+            yield chunk
+    
+    async def agenerate(self, prompt: str) -> str:
+        chunks = self._chunks(prompt)
+        await asyncio.sleep(self.latency_seconds + self.chunk_delay_seconds * (len(chunks) - 1))
+        return "".join(chunks)
+    
+    async def agenerate_stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency_seconds)
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i:
+                await asyncio.sleep(self.chunk_delay_seconds)
+            yield chunk
+
+class GeminiRAGAgent:
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None):
+        self.backend = backend if backend is not None else GeminiBackend()
+        self.model_name = self.backend.model_name
+        self.cache = cache
+        self.last_stream_stats = {}
+        
+        self.role = "RAG Assistant"
+        self.goal = "Answer queries using retrieval augmented generation"
+        self.backstory = "An AI assistant powered by Google Gemini that provides accurate responses based on retrieved context"
+        
+        logger.info(f"GeminiRAGAgent initialized successfully ({self.model_name})")
+    
+    def build_prompt(self, context="", query="", student_profile="", history=""):
+        """Format the prompt sent to the model, with earlier turns if given"""
+        if context and query:
+            prompt = f"""Context: {context}
+                
+Query: {query}
+                
+Based on the provided context, please provide a helpful and accurate response to the query. If the context doesn't contain relevant information, acknowledge this and provide general guidance."""
+        elif query:
+            prompt = f"""Query: {query}
+                
+Student Profile: {student_profile}
+                
+Please provide helpful career guidance and advice based on the query."""
+        else:
+            prompt = context or "Hello! How can I help you today?"
+        if history and query:
+            prompt = f"""Conversation so far:
+{history}
+
+{prompt}"""
+        return prompt
+    
+    def _cached_response(self, prompt):
+        """Look up the response cache, counting hits and misses"""
+        if not self.cache:
+            return None
+        cached = self.cache.get(prompt, self.model_name)
+        metrics.inc("llm_cache_hits" if cached is not None else "llm_cache_misses")
+        return cached
+    
+    def _record_generation(self, prompt, text, seconds, ttft=None):
+        """Record generation timings and approximate token counts"""
+        metrics.record("llm.generate", seconds)
+        if ttft is not None:
+            metrics.record("llm.first_token", ttft)
+        metrics.inc("prompt_tokens", estimate_tokens(prompt))
+        metrics.inc("response_tokens", estimate_tokens(text))
+    
+    def respond(self, context="", query="", student_profile="", history="",
+                raise_errors=False):
+        """
+        Generate response based on context, query and conversation history.
+        
+        On a backend failure an apology is returned as the response, or with
+        raise_errors GenerationError is raised so callers such as the HTTP
+        API can report the failure as an error.
+        """
+        try:
+            with metrics.span("prompt.build"):
+                prompt = self.build_prompt(context, query, student_profile, history)
+            
+            cached = self._cached_response(prompt)
+            if cached is not None:
+                return cached
+            
+            start = time.perf_counter()
+            text = self.backend.generate(prompt)
+            self._record_generation(prompt, text, time.perf_counter() - start)
+            
+            # Only successful responses reach the cache; errors return below
+            if self.cache and text:
+                self.cache.put(prompt, self.model_name, text)
+            return text
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            metrics.inc("llm_errors")
+            if raise_errors:
+                raise GenerationError(str(e)) from e
+            return f"I apologize, but I encountered an error while processing your request: {str(e)}"
+
+    def respond_stream(self, context="", query="", student_profile="", history="") -> Iterator[str]:
+        """Generate a response, yielding text chunks as they arrive"""
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        try:
+            with metrics.span("prompt.build"):
+                prompt = self.build_prompt(context, query, student_profile, history)
+            
+            cached = self._cached_response(prompt)
+            if cached is not None:
+                self.last_stream_stats = {"ttft_seconds": time.perf_counter() - start,
+                                          "total_seconds": time.perf_counter() - start,
+                                          "chunks": 1, "cached": True}
+                yield cached
+                return
+            
+            for text in self.backend.generate_stream(prompt):
+                if not text:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+            
+            total = time.perf_counter() - start
+            self.last_stream_stats = {"ttft_seconds": first_token, "total_seconds": total,
+                                      "chunks": len(parts), "cached": False}
+            self._record_generation(prompt, "".join(parts), total, first_token)
+            logger.info(f"Streamed {len(parts)} chunks, first token after "
+                        f"{(first_token or total):.2f}s, total {total:.2f}s")
+            
+            # Only complete, successful responses reach the cache
+            if self.cache and parts:
+                self.cache.put(prompt, self.model_name, "".join(parts))
+            
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            metrics.inc("llm_errors")
+            yield f"I apologize, but I encountered an error while processing your request: {str(e)}"
+
+    async def arespond(self, context="", query="", student_profile="", history="",
+                       raise_errors=False):
+        """Async respond(): awaits the API call instead of blocking the event loop"""
+        try:
+            with metrics.span("prompt.build"):
+                prompt = self.build_prompt(context, query, student_profile, history)
+            loop = asyncio.get_running_loop()
+            
+            cached = await loop.run_in_executor(None, self._cached_response, prompt)
+            if cached is not None:
+                return cached
+            
+            start = time.perf_counter()
+            text = await self.backend.agenerate(prompt)
+            self._record_generation(prompt, text, time.perf_counter() - start)
+            
+            if self.cache and text:
+                await loop.run_in_executor(None, self.cache.put, prompt, self.model_name, text)
+            return text
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            metrics.inc("llm_errors")
+            if raise_errors:
+                raise GenerationError(str(e)) from e
+            return f"I apologize, but I encountered an error while processing your request: {str(e)}"
+    
+    async def arespond_stream(self, context="", query="", student_profile="",
+                              history="") -> AsyncIterator[str]:
+        """Async respond_stream(): yields text chunks without blocking the event loop"""
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        try:
+            with metrics.span("prompt.build"):
+                prompt = self.build_prompt(context, query, student_profile, history)
+            loop = asyncio.get_running_loop()
+            
+            cached = await loop.run_in_executor(None, self._cached_response, prompt)
+            if cached is not None:
+                yield cached
+                return
+            
+            async for text in self.backend.agenerate_stream(prompt):
+                if not text:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+            
+            total = time.perf_counter() - start
+            self._record_generation(prompt, "".join(parts), total, first_token)
+            logger.info(f"Streamed {len(parts)} chunks, first token after "
+                        f"{(first_token or total):.2f}s, total {total:.2f}s")
+            
+            if self.cache and parts:
+                await loop.run_in_executor(None, self.cache.put, prompt, self.model_name, "".join(parts))
+            
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            metrics.inc("llm_errors")
+            yield f"I apologize, but I encountered an error while processing your request: {str(e)}"
+
+def build_backend(name: Optional[str] = None) -> LLMBackend:
+    """Build the backend named by LLM_BACKEND ("gemini" or "local")"""
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "local":
+        return LocalBackend(
+            latency_seconds=float(os.getenv("LOCAL_LLM_LATENCY", "0.5")),
+            chunk_delay_seconds=float(os.getenv("LOCAL_LLM_CHUNK_DELAY", "0.05")),
+            chunk_words=int(os.getenv("LOCAL_LLM_CHUNK_WORDS", "5")),
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+def build_agent(use_cache=True, backend: Optional[LLMBackend] = None):
+    """Build and return a GeminiRAGAgent instance"""
+    try:
+        if backend is None:
+            backend = build_backend()
+        cache = None
+        # The local stand-in is for load tests, where cache hits would hide the cost being measured
+        if (use_cache and not isinstance(backend, LocalBackend)
+                and os.getenv("RESPONSE_CACHE", "on").lower() not in ("0", "off", "false")):
+            cache = ResponseCache(os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3"))
+        return GeminiRAGAgent(cache=cache, backend=backend)
+    except Exception as e:
+        logger.error(f"Failed to build agent: {str(e)}")
+        raise
+
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from onnx_embeddings import OnnxEmbeddings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# MiniLM-L6 on CPU saturates throughput around 64 sequences per forward pass;
+# larger batches only add padding waste and memory.
+EMBED_BATCH_SIZE = 64
+# "torch" runs sentence-transformers; "onnx" runs an exported (by default
+# int8-quantized) graph on onnxruntime without importing torch
+EMBEDDING_BACKENDS = ("torch", "onnx")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+ONNX_EXPORT_INFO_FILENAME = "export.json"
+
+# Models live at module level so they survive Streamlit reruns and are
+# shared by every session served from the same process.
+_registry: Dict[Tuple[str, str, bool, str], Union[HuggingFaceEmbeddings, OnnxEmbeddings]] = {}
+_stats: Dict[Tuple[str, str, bool, str], dict] = {}
+_lock = threading.Lock()
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+def model_cache_path(model_name: str = EMBEDDING_MODEL_NAME) -> Optional[str]:
+    """
+    Locate a downloaded copy of the model without importing any ML library.
+
+    Checks the Hugging Face hub cache and the legacy sentence-transformers cache.
+
+    Returns:
+        Path to the cached model directory, or None if it is not downloaded
+    """
+    hf_home = os.getenv("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface"))
+    hub_cache = os.getenv("HF_HUB_CACHE", os.getenv("HUGGINGFACE_HUB_CACHE",
+                                                    os.path.join(hf_home, "hub")))
+    st_home = os.getenv("SENTENCE_TRANSFORMERS_HOME",
+                        os.path.join(os.path.expanduser("~"), ".cache", "torch", "sentence_transformers"))
+    candidates = [
+        os.path.join(hub_cache, "models--" + model_name.replace("/", "--"), "snapshots"),
+        os.path.join(st_home, model_name.replace("/", "_")),
+    ]
+    for path in candidates:
+        if os.path.isdir(path) and os.listdir(path):
+            return path
+    return None
+
+def embedding_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve the embedding backend: explicit value, else EMBEDDING_BACKEND.
+
+    Raises:
+        ValueError: If the backend is not one of EMBEDDING_BACKENDS
+    """
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "torch")).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} "
+                         f"(expected one of {', '.join(EMBEDDING_BACKENDS)})")
+    return backend
+
+def onnx_model_dir(model_name: str = EMBEDDING_MODEL_NAME,
+                   root: str = ONNX_MODEL_DIR) -> str:
+    """Directory of the ONNX export of a model (see onnx_embeddings)."""
+    return os.path.join(root, model_name.replace("/", "_"))
+
+def onnx_model_exported(model_name: str = EMBEDDING_MODEL_NAME) -> bool:
+    """Whether the ONNX export exists, checked without importing onnxruntime."""
+    return os.path.exists(os.path.join(onnx_model_dir(model_name), ONNX_EXPORT_INFO_FILENAME))
+
+def get_embeddings(model_name: str = EMBEDDING_MODEL_NAME,
+                   device: str = "cpu",
+                   normalize: bool = True,
+                   backend: Optional[str] = None) -> Union[HuggingFaceEmbeddings, OnnxEmbeddings]:
+    """
+    Return the shared embeddings model, loading it on first use.
+
+    Both backends produce vectors for the same index: the ONNX export is
+    validated against the torch model (see onnx_embeddings).
+
+    Args:
+        model_name: Sentence-transformers model name
+        device: Torch device to load the model on (torch backend)
+        normalize: Whether embeddings are L2-normalized
+        backend: "torch" or "onnx" (default: EMBEDDING_BACKEND, torch)
+
+    Returns:
+        Embeddings instance shared across the process
+    """
+    backend = embedding_backend(backend)
+    key = (model_name, device, normalize, backend)
+    # Holding the lock while loading makes concurrent first callers wait
+    # for a single load instead of each loading their own copy.
+    with _lock:
+        embeddings = _registry.get(key)
+        if embeddings is not None:
+            _stats[key]["hits"] += 1
+            return embeddings
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            if backend == "onnx":
+                from onnx_embeddings import load_onnx_embeddings
+
+                embeddings = load_onnx_embeddings(model_name, normalize=normalize)
+            else:
+                # Imported here so the measured load time includes torch
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+
+                embeddings = HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    model_kwargs={'device': device},
+                    encode_kwargs={'normalize_embeddings': normalize,
+                                   'batch_size': EMBED_BATCH_SIZE}
+                )
+        except Exception as e:
+            logger.error(f"Failed to load embeddings model {model_name}: {str(e)}")
+            raise
+        load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+
+        _registry[key] = embeddings
+        _stats[key] = {
+            "model_name": model_name,
+            "device": device,
+            "normalize": normalize,
+            "backend": backend,
+            "load_seconds": load_seconds,
+            "rss_before_bytes": rss_before,
+            "rss_after_bytes": rss_after,
+            "rss_delta_bytes": (rss_after - rss_before
+                                if rss_before is not None and rss_after is not None
+                                else None),
+            "loaded_at": datetime.now().isoformat(timespec="seconds"),
+            "hits": 0,
+        }
+        logger.info(f"Loaded embeddings model {model_name} ({backend}) on {device} "
+                    f"in {load_seconds:.2f}s")
+        return embeddings
+
+def embedding_stats() -> List[dict]:
+    """Load time, memory and reuse counts for every loaded embeddings model."""
+    with _lock:
+        return [dict(stats) for stats in _stats.values()]
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from rag_pipeline import count_pdf_pages, load_existing_vector_store
+from uploads import UPLOAD_ROOT, index_upload, maybe_collect_garbage, stage_upload
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Embedding is CPU-bound, so one job at a time keeps each job fast and
+# leaves cores for query embedding in the chat sessions
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+MAX_FINISHED_JOBS = 100
+
+class IngestionJob:
+    """
+    One background ingestion, updated by the worker thread.
+
+    Readers (e.g. Streamlit reruns) poll snapshot(); the result is only
+    handed over once the index is fully built, so a session keeps using its
+    current index until then. After completion the job keeps only the info
+    dict: the live vector store goes to the first take_vectorstore() caller
+    and later callers reopen it from disk, so finished jobs do not pin open
+    collections.
+    """
+
+    def __init__(self, name: str, key: str, pages_total: Optional[int] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.key = key
+        self.status = "queued"
+        self.pages_total = pages_total
+        self.pages = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self._vectorstore: Any = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def take_vectorstore(self) -> Any:
+        """
+        Vector store built by a finished job.
+
+        The first caller gets the store the job built; later callers (other
+        sessions that submitted the same document) get it reopened from disk.
+        """
+        with self._lock:
+            if self.status != "done":
+                return None
+            vectorstore, self._vectorstore = self._vectorstore, None
+        if vectorstore is None:
+            vectorstore = load_existing_vector_store(self.result["persist_dir"])
+        return vectorstore
+
+    def _progress(self, stats: dict) -> None:
+        with self._lock:
+            self.pages = stats.get("pages", self.pages)
+            self.chunks = stats.get("chunks", self.chunks)
+            self.embedded = stats.get("embedded", self.embedded)
+
+    def snapshot(self) -> dict:
+        """Consistent view of the job's progress, with fraction done and ETA."""
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            fraction = None
+            eta_seconds = None
+            if self.status == "done":
+                fraction, eta_seconds = 1.0, 0.0
+            elif self.pages_total:
+                fraction = min(1.0, self.pages / self.pages_total)
+                if self.pages and self.status == "running":
+                    eta_seconds = elapsed / self.pages * max(0, self.pages_total - self.pages)
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "pages": self.pages,
+                "pages_total": self.pages_total,
+                "chunks": self.chunks,
+                "embedded": self.embedded,
+                "fraction": fraction,
+                "elapsed_seconds": elapsed,
+                "eta_seconds": eta_seconds,
+                "error": self.error,
+            }
+
+class IngestionQueue:
+    """
+    Thread pool that builds indexes in the background.
+
+    Submitting a document that is already queued or running returns the
+    existing job, so repeated clicks or several users uploading the same
+    PDF share one ingestion.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                        thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._active: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, key: str,
+               build: Callable[[Callable[[dict], None]], Tuple[Any, dict]],
+               pages_total: Optional[int] = None) -> IngestionJob:
+        """
+        Queue build(progress) unless a job with the same key is still active.
+
+        Args:
+            name: Display name
+            key: Identity of the work, e.g. the document hash
+            build: Callable doing the ingestion; receives a progress callback
+                and returns (vectorstore, info) with info["persist_dir"]
+            pages_total: Page count used for fraction done and ETA
+
+        Returns:
+            The new or already active job
+        """
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None:
+                return active
+            job = IngestionJob(name, key, pages_total)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            # Oldest finished jobs go first; active ones are never evicted
+            excess = len(self._jobs) - MAX_FINISHED_JOBS
+            for old_id in [old_id for old_id, old in self._jobs.items() if old.done][:max(0, excess)]:
+                del self._jobs[old_id]
+        metrics.inc("ingest_jobs_submitted")
+        self._pool.submit(self._run, job, build)
+        logger.info(f"Queued ingestion job {job.id} for {name}")
+        return job
+
+    def _run(self, job: IngestionJob, build: Callable) -> None:
+        with job._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            with metrics.span("ingest.job"):
+                vectorstore, info = build(job._progress)
+            with job._lock:
+                job.result = info
+                job._vectorstore = vectorstore
+                job.status = "done"
+            logger.info(f"Ingestion job {job.id} finished in "
+                        f"{time.time() - job.started_at:.1f}s")
+        except Exception as e:
+            with job._lock:
+                job.error = str(e)
+                job.status = "failed"
+            metrics.inc("ingest_jobs_failed")
+            logger.error(f"Ingestion job {job.id} for {job.name} failed: {str(e)}")
+        finally:
+            with job._lock:
+                job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def submit_upload(self, fileobj: BinaryIO, filename: str,
+                      upload_root: str = UPLOAD_ROOT) -> IngestionJob:
+        """
+        Stage an upload now and index it in the background.
+
+        The file is copied to the upload store before returning, so the job
+        does not depend on the caller's file object. The job result is the
+        info dict from index_upload(); take_vectorstore() returns the index.
+
+        Raises:
+            ValueError: If the file is empty or not a PDF
+        """
+        maybe_collect_garbage(upload_root)
+        doc_hash, pdf_path = stage_upload(fileobj, upload_root)
+        return self.submit(filename, doc_hash,
+                           lambda progress: index_upload(doc_hash, pdf_path, filename, progress),
+                           pages_total=_safe_page_count(pdf_path))
+
+    def submit_pdf(self, pdf_path: str, upload_root: str = UPLOAD_ROOT) -> IngestionJob:
+        """
+        Index a PDF on disk in the background, the same way as an upload.
+
+        The PDF is copied into the upload store under its content hash and
+        indexed in that directory, never into a shared index other sessions
+        read: after the file changes, the rebuild goes to a new directory
+        and sessions move to it only once the job has finished.
+        """
+        with open(pdf_path, "rb") as f:
+            return self.submit_upload(f, os.path.basename(pdf_path), upload_root)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+def _safe_page_count(pdf_path: str) -> Optional[int]:
+    try:
+        return count_pdf_pages(pdf_path)
+    except Exception as e:
+        # The job itself will report the unreadable PDF
+        logger.warning(f"Could not count pages of {pdf_path}: {str(e)}")
+        return None
+
+# One queue per process so jobs survive Streamlit reruns and page switches
+_shared_queue: Optional[IngestionQueue] = None
+_shared_lock = threading.Lock()
+
+def shared_queue() -> IngestionQueue:
+    """Return the process-wide ingestion queue, creating it on first use."""
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = IngestionQueue()
+        return _shared_queue
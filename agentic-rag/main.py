@@ -1,111 +1,200 @@
-import os
-import sys
-from dotenv import load_dotenv
-from rag_pipeline import build_vector_store
-from crew_config import build_agent
-import logging
-
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# Load environment variables
-load_dotenv()
-
-def main():
-    """Main CLI interface for the Agentic RAG system"""
-    try:
-        # Check for API key
-        if not os.getenv("GOOGLE_API_KEY"):
-            print("❌ Error: GOOGLE_API_KEY not found in environment variables.")
-            print("Please add your Google API key to the .env file:")
-            print("GOOGLE_API_KEY=your_api_key_here")
-            sys.exit(1)
-        
-        print("🤖 Initializing Agentic RAG Assistant...")
-        
-        # Build agent
-        try:
-            agent = build_agent()
-            print("✅ Agent initialized successfully")
-        except Exception as e:
-            print(f"❌ Failed to initialize agent: {str(e)}")
-            sys.exit(1)
-        
-        # Check for default PDF and build vector store
-        vectorstore = None
-        pdf_path = "Career_Advisor_Guide_2025.pdf"
-        
-        if os.path.exists(pdf_path):
-            try:
-                print(f"📄 Loading document: {pdf_path}")
-                vectorstore = build_vector_store(pdf_path)
-                print("✅ Vector store built successfully")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not build vector store: {str(e)}")
-                print("🔄 Continuing in basic mode without RAG...")
-        else:
-            print(f"⚠️  Warning: Default document '{pdf_path}' not found")
-            print("🔄 Running in basic mode without RAG...")
-        
-        print("\n" + "="*50)
-        print("🚀 Agentic RAG Assistant is ready!")
-        if vectorstore:
-            print("📚 RAG mode: Enabled")
-        else:
-            print("💬 Basic mode: No document context")
-        print("Type 'exit', 'quit', or 'q' to quit.")
-        print("="*50 + "\n")
-        
-        # Main conversation loop
-        while True:
-            try:
-                query = input("You: ").strip()
-                
-                if not query:
-                    continue
-                    
-                if query.lower() in ['exit', 'quit', 'q']:
-                    print("👋 Goodbye!")
-                    break
-                
-                print("🤔 Thinking...")
-                
-                # Retrieve relevant docs if vectorstore is available
-                context = ""
-                if vectorstore:
-                    try:
-                        docs = vectorstore.similarity_search(query, k=3)
-                        context = "\n\n".join([d.page_content for d in docs])
-                        if context:
-                            print(f"📖 Retrieved {len(docs)} relevant document(s)")
-                    except Exception as e:
-                        logger.warning(f"Context retrieval failed: {str(e)}")
-                
-                # Generate response
-                try:
-                    if context:
-                        response = agent.respond(context=context, query=query)
-                    else:
-                        response = agent.respond(query=query)
-                    
-                    print(f"\nAssistant: {response}\n")
-                    
-                except Exception as e:
-                    print(f"❌ Error generating response: {str(e)}")
-                    logger.error(f"Response generation failed: {str(e)}")
-                    
-            except KeyboardInterrupt:
-                print("\n\n👋 Goodbye!")
-                break
-            except Exception as e:
-                print(f"❌ Unexpected error: {str(e)}")
-                logger.error(f"Unexpected error in main loop: {str(e)}")
-                
-    except Exception as e:
-        print(f"❌ Fatal error: {str(e)}")
-        logger.error(f"Fatal error in main: {str(e)}")
-        sys.exit(1)
-
-if __name__ == "__main__":
-    main()
+import os
+import sys
+import time
+import threading
+from dotenv import load_dotenv
+from context import assemble_context
+from memory import ConversationMemory
+from rag_pipeline import open_vector_store
+from reranker import build_reranker
+from retrieval import CachedRetriever
+from web_search import build_web_searcher
+from crew_config import build_agent
+import metrics
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+class BackgroundLoader:
+    """Run a loader in a daemon thread; result() blocks only until it finishes"""
+    
+    def __init__(self, loader, *args):
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        threading.Thread(target=self._run, args=(loader, args), daemon=True).start()
+    
+    def _run(self, loader, args):
+        try:
+            self._value = loader(*args)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+    
+    @property
+    def done(self):
+        return self._done.is_set()
+    
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+def load_retriever(pdf_path):
+    """Open the index (rebuilding only if stale) and warm the embeddings model"""
+    vectorstore = open_vector_store(pdf_path)
+    vectorstore.embeddings.embed_query("warmup")
+    reranker = build_reranker()
+    if reranker is not None:
+        reranker.start_loading()
+    return CachedRetriever(vectorstore, reranker=reranker)
+
+def main():
+    """Main CLI interface for the Agentic RAG system"""
+    try:
+        # Check for API key
+        if os.getenv("LLM_BACKEND", "gemini").lower() == "gemini" and not os.getenv("GOOGLE_API_KEY"):
+            print("❌ Error: GOOGLE_API_KEY not found in environment variables.")
+            print("Please add your Google API key to the .env file:")
+            print("GOOGLE_API_KEY=your_api_key_here")
+            sys.exit(1)
+        
+        print("🤖 Initializing Agentic RAG Assistant...")
+        metrics.start_json_dump_from_env()
+        
+        # Build the agent and open the index in the background so the
+        # prompt is usable immediately; a query only waits if it needs them
+        agent = None
+        agent_loader = BackgroundLoader(build_agent)
+        
+        retriever = None
+        retriever_loader = None
+        pdf_path = "Career_Advisor_Guide_2025.pdf"
+        
+        if os.path.exists(pdf_path):
+            print(f"📄 Loading document in background: {pdf_path}")
+            retriever_loader = BackgroundLoader(load_retriever, pdf_path)
+        else:
+            print(f"⚠️  Warning: Default document '{pdf_path}' not found")
+            print("🔄 Running in basic mode without RAG...")
+        
+        print("\n" + "="*50)
+        print("🚀 Agentic RAG Assistant is ready!")
+        if retriever_loader:
+            print("📚 RAG mode: Enabled (index warming up in background)")
+        else:
+            print("💬 Basic mode: No document context")
+        try:
+            web_searcher = build_web_searcher()
+        except ValueError as e:
+            web_searcher = None
+            print(f"⚠️  Web search: Disabled, invalid configuration: {str(e)}")
+        if web_searcher is not None:
+            print(f"🌐 Web search: Enabled ({web_searcher.provider.name})")
+        print("Type 'exit', 'quit', or 'q' to quit, 'clear' to start a new conversation.")
+        print("="*50 + "\n")
+        
+        # Recent turns verbatim plus a summary of older ones
+        memory = ConversationMemory()
+        
+        # Main conversation loop
+        while True:
+            try:
+                query = input("You: ").strip()
+                
+                if not query:
+                    continue
+                    
+                if query.lower() in ['exit', 'quit', 'q']:
+                    print("👋 Goodbye!")
+                    break
+                
+                if query.lower() == 'clear':
+                    memory.clear()
+                    print("🧹 Conversation history cleared.")
+                    continue
+                
+                print("🤔 Thinking...")
+                turn_start = time.perf_counter()
+                
+                # Runs while the agent, index and vector retrieval are awaited
+                pending_web = web_searcher.start(query) if web_searcher is not None else None
+                
+                if agent is None:
+                    if not agent_loader.done:
+                        print("⏳ Waiting for the agent to finish initializing...")
+                    try:
+                        agent = agent_loader.result()
+                    except Exception as e:
+                        print(f"❌ Failed to initialize agent: {str(e)}")
+                        sys.exit(1)
+                
+                if retriever_loader is not None:
+                    if not retriever_loader.done:
+                        print("⏳ Waiting for the document index to finish loading...")
+                    try:
+                        retriever = retriever_loader.result()
+                        print("✅ Vector store loaded successfully")
+                    except Exception as e:
+                        print(f"⚠️  Warning: Could not build vector store: {str(e)}")
+                        print("🔄 Continuing in basic mode without RAG...")
+                    retriever_loader = None
+                
+                # Retrieve relevant docs if vectorstore is available
+                context = ""
+                docs = []
+                if retriever:
+                    try:
+                        docs = retriever.search(query, k=3)
+                        if docs:
+                            print(f"📖 Retrieved {len(docs)} relevant document(s)")
+                    except Exception as e:
+                        logger.warning(f"Context retrieval failed: {str(e)}")
+                if pending_web is not None:
+                    web_docs = pending_web.result()
+                    if web_docs:
+                        print(f"🌐 Found {len(web_docs)} web result(s)")
+                    docs = docs + web_docs
+                context = assemble_context(docs)
+                
+                # Stream the response as it is generated
+                try:
+                    print("\nAssistant: ", end="", flush=True)
+                    response = ""
+                    for chunk in agent.respond_stream(context=context, query=query,
+                                                      history=memory.render()):
+                        print(chunk, end="", flush=True)
+                        response += chunk
+                    print("\n")
+                    metrics.record("turn.total", time.perf_counter() - turn_start)
+                    memory.add_turn(query, response)
+                    
+                    ttft = agent.last_stream_stats.get("ttft_seconds")
+                    if ttft is not None:
+                        logger.debug(f"Time to first token: {ttft:.2f}s")
+                    
+                except Exception as e:
+                    print(f"❌ Error generating response: {str(e)}")
+                    logger.error(f"Response generation failed: {str(e)}")
+                    
+            except KeyboardInterrupt:
+                print("\n\n👋 Goodbye!")
+                break
+            except Exception as e:
+                print(f"❌ Unexpected error: {str(e)}")
+                logger.error(f"Unexpected error in main loop: {str(e)}")
+                
+    except Exception as e:
+        print(f"❌ Fatal error: {str(e)}")
+        logger.error(f"Fatal error in main: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+import re
+import logging
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from context import estimate_tokens
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET = 800
+RECENT_TURNS = 3
+SUMMARY_TOKEN_BUDGET = 250
+# Words kept from each side of a turn when it is folded into the summary
+SUMMARY_QUERY_WORDS = 25
+SUMMARY_RESPONSE_WORDS = 35
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+def history_token_budget() -> int:
+    """Token budget for conversation history from HISTORY_TOKEN_BUDGET (0 = no history)."""
+    return int(os.getenv("HISTORY_TOKEN_BUDGET", str(HISTORY_TOKEN_BUDGET)))
+
+def _clip_words(text: str, max_words: int) -> str:
+    words = text.split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + "..."
+
+def _gist(text: str, max_words: int) -> str:
+    """First sentence of a text, capped at max_words."""
+    text = " ".join(text.split())
+    first = _SENTENCE_RE.split(text, maxsplit=1)[0] if text else ""
+    return _clip_words(first, max_words)
+
+def summarize_turn(query: str, response: str) -> str:
+    """One-line extractive summary of a turn: the question and the gist of the answer."""
+    return (f"- Student asked: {_gist(query, SUMMARY_QUERY_WORDS)} "
+            f"Assistant: {_gist(response, SUMMARY_RESPONSE_WORDS)}")
+
+class ConversationMemory:
+    """
+    Bounded per-session conversation history.
+
+    The last few turns are kept verbatim; older turns are folded into a
+    rolling summary so prompt size stays flat however long the chat gets.
+    The summary is extractive (one line per turn, oldest lines dropped) by
+    default, or produced by summarizer(summary, query, response), e.g. a
+    cheap LLM call returning the new summary. render() never exceeds
+    max_tokens: over budget, the oldest summary lines go first, then the
+    older recent turns, and finally the newest turn's question and answer
+    are cut.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None,
+                 recent_turns: int = RECENT_TURNS,
+                 summary_tokens: int = SUMMARY_TOKEN_BUDGET,
+                 summarizer: Optional[Callable[[str, str, str], str]] = None):
+        self.max_tokens = history_token_budget() if max_tokens is None else max_tokens
+        self.recent_turns = max(1, recent_turns)
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self.summary_lines: List[str] = []
+        self.turn_count = 0
+
+    def __len__(self) -> int:
+        return self.turn_count
+
+    def add_turn(self, query: str, response: str) -> None:
+        """Record a completed turn and compact older turns if needed."""
+        self.turns.append((query, response))
+        self.turn_count += 1
+        while len(self.turns) > self.recent_turns:
+            self._fold(*self.turns.popleft())
+        # Keep the newest turn verbatim even if it alone is over budget;
+        # render() truncates it instead
+        while len(self.turns) > 1 and self._recent_tokens() > self._recent_budget():
+            self._fold(*self.turns.popleft())
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary_lines = []
+        self.turn_count = 0
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    @property
+    def _summary_budget(self) -> int:
+        return min(self.summary_tokens, self.max_tokens)
+
+    def _summary_block(self, lines: Optional[List[str]] = None) -> str:
+        lines = self.summary_lines if lines is None else lines
+        return "Earlier in this conversation:\n" + "\n".join(lines) if lines else ""
+
+    @staticmethod
+    def _blocks_tokens(blocks: List[str]) -> int:
+        # Every block is followed by a separator, counted as one token
+        return sum(estimate_tokens(block) + 1 for block in blocks if block)
+
+    def _recent_budget(self) -> int:
+        return max(0, self.max_tokens - self._blocks_tokens([self._summary_block()]))
+
+    def _recent_tokens(self) -> int:
+        return self._blocks_tokens([self._format_turn(q, r) for q, r in self.turns])
+
+    def _fold(self, query: str, response: str) -> None:
+        """Move a turn out of the verbatim window into the summary."""
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(self.summary, query, response)
+                self.summary_lines = [_clip_words(summary, self._summary_budget * 3 // 4)]
+                return
+            except Exception as e:
+                logger.warning(f"Summarizer failed, using extractive summary: {str(e)}")
+        self.summary_lines.append(summarize_turn(query, response))
+        while len(self.summary_lines) > 1 and estimate_tokens(self.summary) > self._summary_budget:
+            self.summary_lines.pop(0)
+
+    @staticmethod
+    def _format_turn(query: str, response: str) -> str:
+        return f"Student: {query}\nAssistant: {response}"
+
+    @classmethod
+    def _truncate_turn(cls, query: str, response: str, max_tokens: int) -> str:
+        """Format a turn with its question and answer cut to fit max_tokens, or ""."""
+        room = max_tokens * 4 - len(cls._format_turn("...", "..."))
+        if room <= 0:
+            return ""
+        # The question gets at least half the room, more if the answer is short
+        query_room = max(room // 2, room - len(response))
+        if len(query) > query_room:
+            query = query[:query_room].rstrip() + "..."
+        response_room = room - min(len(query), query_room)
+        if len(response) > response_room:
+            response = response[:response_room].rstrip() + "..."
+        return cls._format_turn(query, response)
+
+    def render(self) -> str:
+        """
+        History text for the prompt, within max_tokens.
+
+        Returns:
+            Summary of earlier turns followed by the recent turns verbatim
+            (the newest one cut if it alone is over budget), or an empty
+            string if there is no history or no budget
+        """
+        if self.max_tokens <= 0 or not (self.turns or self.summary_lines):
+            return ""
+        lines = list(self.summary_lines)
+        turns = [self._format_turn(q, r) for q, r in self.turns]
+
+        def over_budget() -> bool:
+            return self._blocks_tokens([self._summary_block(lines)] + turns) > self.max_tokens
+
+        # Summary lines go before recent turns, oldest first
+        while lines and over_budget():
+            lines.pop(0)
+        while len(turns) > 1 and over_budget():
+            turns.pop(0)
+        if turns and over_budget():
+            # Only the newest turn is left and it alone is over budget
+            turns[-1] = self._truncate_turn(*self.turns[-1], self.max_tokens - 1)
+        parts = [self._summary_block(lines)] + turns
+        return "\n\n".join(part for part in parts if part)
+
+    def to_dict(self) -> dict:
+        """Compact, JSON-serializable state for session storage."""
+        return {"turns": [list(turn) for turn in self.turns],
+                "summary": self.summary_lines,
+                "turn_count": self.turn_count}
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "ConversationMemory":
+        memory = cls(**kwargs)
+        memory.turns.extend(tuple(turn) for turn in data.get("turns", []))
+        memory.summary_lines = list(data.get("summary", []))
+        memory.turn_count = data.get("turn_count", len(memory.turns))
+        return memory
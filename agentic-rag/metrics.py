@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Histogram buckets in seconds, from sub-millisecond lookups to slow LLM calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SAMPLES = 200
+
+class _Stage:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+_stages: Dict[str, _Stage] = {}
+_counters: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def record(stage: str, seconds: float) -> None:
+    """Record one duration for a pipeline stage."""
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = _Stage()
+        entry.count += 1
+        entry.total += seconds
+        entry.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry.buckets[i] += 1
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one sample of a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+def inc(counter: str, value: float = 1) -> None:
+    """Increase a monotonically growing counter."""
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0) + value
+
+def _percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def snapshot() -> dict:
+    """Per-stage timings over recent samples plus all counters."""
+    with _lock:
+        stages = {}
+        for name, entry in _stages.items():
+            ordered = sorted(entry.recent)
+            stages[name] = {
+                "count": entry.count,
+                "sum_seconds": entry.total,
+                "last_ms": entry.recent[-1] * 1000 if entry.recent else 0.0,
+                "p50_ms": _percentile(ordered, 50) * 1000,
+                "p95_ms": _percentile(ordered, 95) * 1000,
+            }
+        return {"timestamp": time.time(), "stages": stages, "counters": dict(_counters)}
+
+def _metric_name(name: str) -> str:
+    return "rag_" + "".join(c if c.isalnum() else "_" for c in name)
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        if _stages:
+            lines.append("# HELP rag_stage_seconds Time spent in each pipeline stage")
+            lines.append("# TYPE rag_stage_seconds histogram")
+        for name, entry in sorted(_stages.items()):
+            for bound, count in zip(BUCKETS, entry.buckets):
+                lines.append(f'rag_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'rag_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {entry.count}')
+            lines.append(f'rag_stage_seconds_sum{{stage="{name}"}} {entry.total}')
+            lines.append(f'rag_stage_seconds_count{{stage="{name}"}} {entry.count}')
+        for name, value in sorted(_counters.items()):
+            metric = _metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+def start_json_dump(path: str, interval_seconds: float = 60.0) -> threading.Thread:
+    """Write snapshot() to path every interval_seconds from a daemon thread."""
+    def dump_forever():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot(), f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {str(e)}")
+
+    thread = threading.Thread(target=dump_forever, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
+
+_dump_thread: Optional[threading.Thread] = None
+
+def start_json_dump_from_env() -> None:
+    """Start the periodic JSON dump if METRICS_DUMP_PATH is set (once per process)."""
+    global _dump_thread
+    path = os.getenv("METRICS_DUMP_PATH")
+    with _lock:
+        if not path or _dump_thread is not None:
+            return
+        _dump_thread = start_json_dump(path, float(os.getenv("METRICS_DUMP_INTERVAL", "60")))
+    logger.info(f"Dumping metrics to {path}")
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import subprocess
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embeddings import (EMBED_BATCH_SIZE, EMBEDDING_MODEL_NAME, ONNX_EXPORT_INFO_FILENAME,
+                        current_rss_bytes, onnx_model_dir)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "model.onnx"
+QUANTIZED_FILENAME = "model_quantized.onnx"
+# all-MiniLM-L6-v2 is trained with max_seq_length 256; sentence-transformers
+# truncates there, so the ONNX path must too for vectors to match
+MAX_SEQUENCE_LENGTH = 256
+ONNX_OPSET = 14
+# Minimum cosine similarity to the torch vectors, per probe text. Dynamic
+# int8 quantization of MiniLM stays above 0.98; the float graph is exact
+# up to kernel rounding.
+MIN_COSINE_QUANTIZED = 0.98
+MIN_COSINE_FLOAT = 0.9999
+# Cosine alone does not show what 0.98 costs in retrieval, so the export
+# also searches a probe corpus embedded by torch (an existing index) with
+# ONNX query vectors and requires this share of the torch top-k
+RECALL_K = 5
+MIN_RECALL_QUANTIZED = 0.9
+MIN_RECALL_FLOAT = 0.99
+
+PROBE_TEXTS = [
+    "What courses should I take for machine learning?",
+    "Which entrance exam is needed for engineering colleges?",
+    "How do I build a data science portfolio?",
+    "Scholarships are available for research degrees at most universities.",
+    "CS-101 covers programming fundamentals, data structures and algorithms.",
+    "A finance analyst needs statistics, accounting and communication skills.",
+    "warmup",
+    "",
+    " ".join(["Career planning involves assessing interests, values and skills, "
+              "exploring occupations and setting goals."] * 30),
+]
+
+_RECALL_FIELDS = ["machine learning", "data science", "civil engineering", "medicine", "law",
+                  "finance", "graphic design", "cloud security", "robotics", "journalism",
+                  "architecture", "biotechnology"]
+_RECALL_TOPICS = ["entrance exams", "undergraduate courses", "internships", "salaries",
+                  "scholarships", "certifications", "job interviews", "postgraduate research",
+                  "required skills", "portfolio projects"]
+
+def recall_probe() -> Tuple[List[str], List[str]]:
+    """
+    Small career-guide corpus and queries for the recall check.
+
+    Every field/topic pair is one passage, so near-misses between related
+    passages show up as lost recall.
+    """
+    documents = [f"A guide to {topic} for students who want a career in {field}, "
+                 f"with advice on how to prepare and what to expect."
+                 for field in _RECALL_FIELDS for topic in _RECALL_TOPICS]
+    queries = [f"How should I approach {topic} if I want to work in {field}?"
+               for i, field in enumerate(_RECALL_FIELDS)
+               for topic in (_RECALL_TOPICS[i % len(_RECALL_TOPICS)],
+                             _RECALL_TOPICS[(i * 3 + 1) % len(_RECALL_TOPICS)])]
+    return documents, queries
+
+def recall_at_k(index_vectors: Sequence[Sequence[float]],
+                reference_queries: Sequence[Sequence[float]],
+                candidate_queries: Sequence[Sequence[float]],
+                k: int = RECALL_K) -> float:
+    """Share of each reference query's top-k that the candidate query also retrieves."""
+    index_vectors = np.asarray(index_vectors, dtype=np.float32)
+    k = min(k, len(index_vectors))
+    expected = np.argsort(-(np.asarray(reference_queries, dtype=np.float32) @ index_vectors.T),
+                          axis=1)[:, :k]
+    found = np.argsort(-(np.asarray(candidate_queries, dtype=np.float32) @ index_vectors.T),
+                       axis=1)[:, :k]
+    hits = sum(len(set(want) & set(got)) for want, got in zip(expected, found))
+    return hits / (k * len(expected))
+
+def onnx_quantize_enabled() -> bool:
+    """Whether to run the int8 graph, from ONNX_QUANTIZE (default on)."""
+    return os.getenv("ONNX_QUANTIZE", "on").lower() not in ("0", "off", "false", "no")
+
+def default_threads() -> int:
+    """
+    Intra-op threads: ONNX_THREADS, else the cores this process may run on.
+
+    onnxruntime sizes its pool from the host's cores, which oversubscribes
+    containers limited to a few CPUs.
+    """
+    if os.getenv("ONNX_THREADS"):
+        return max(1, int(os.getenv("ONNX_THREADS")))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+def read_export_info(model_dir: str) -> Optional[dict]:
+    """Export metadata written by export_onnx_model(), or None if not exported."""
+    try:
+        with open(os.path.join(model_dir, ONNX_EXPORT_INFO_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cosine_report(reference: Sequence[Sequence[float]],
+                  candidate: Sequence[Sequence[float]]) -> dict:
+    """Per-text cosine similarity and max absolute difference between two embeddings sets."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+def export_onnx_model(model_name: str = EMBEDDING_MODEL_NAME,
+                      model_dir: Optional[str] = None) -> str:
+    """
+    Export the sentence-transformers model to ONNX, quantize it and validate it.
+
+    This is the only step that needs torch and transformers; afterwards the
+    model runs on onnxruntime and tokenizers alone. Both the float graph and
+    a dynamically int8-quantized graph are written, and each is compared
+    with the torch embeddings on PROBE_TEXTS (cosine) and on recall_probe()
+    (recall@RECALL_K of ONNX queries against a torch-built index, the
+    situation of an existing index after switching EMBEDDING_BACKEND). An
+    int8 graph that misses either bound is kept but marked failed, so
+    OnnxEmbeddings falls back to the float graph.
+
+    Args:
+        model_name: Hugging Face model name
+        model_dir: Output directory (default: onnx_model_dir(model_name))
+
+    Returns:
+        The output directory
+
+    Raises:
+        ValueError: If the float graph does not match the torch model
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoModel, AutoTokenizer
+
+    model_dir = model_dir or onnx_model_dir(model_name)
+    tmp_dir = f"{model_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    start = time.perf_counter()
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(tmp_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    inputs = ("input_ids", "attention_mask", "token_type_ids")
+    model_path = os.path.join(tmp_dir, MODEL_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(model), tuple(sample[name] for name in inputs), model_path,
+            input_names=list(inputs), output_names=["last_hidden_state"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in inputs},
+                          "last_hidden_state": {0: "batch", 1: "sequence"}},
+            opset_version=ONNX_OPSET, do_constant_folding=True,
+        )
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(model_path, os.path.join(tmp_dir, QUANTIZED_FILENAME),
+                     weight_type=QuantType.QInt8)
+
+    # A one-off reference model, not the shared one from get_embeddings()
+    reference_model = SentenceTransformer(model_name, device="cpu")
+    reference = reference_model.encode(PROBE_TEXTS, normalize_embeddings=True)
+    recall_documents, recall_queries = recall_probe()
+    reference_index = reference_model.encode(recall_documents, normalize_embeddings=True)
+    reference_queries = reference_model.encode(recall_queries, normalize_embeddings=True)
+    validation = {}
+    for quantized, min_cosine, min_recall in ((False, MIN_COSINE_FLOAT, MIN_RECALL_FLOAT),
+                                              (True, MIN_COSINE_QUANTIZED, MIN_RECALL_QUANTIZED)):
+        onnx_model = OnnxEmbeddings(tmp_dir, quantized=quantized)
+        report = cosine_report(reference, onnx_model.embed_documents(PROBE_TEXTS))
+        report["recall_at_k"] = recall_at_k(reference_index, reference_queries,
+                                            onnx_model.embed_documents(recall_queries))
+        report["k"] = RECALL_K
+        report["passed"] = report["min_cosine"] >= min_cosine and report["recall_at_k"] >= min_recall
+        validation["quantized" if quantized else "float"] = report
+    if not validation["float"]["passed"]:
+        raise ValueError(f"ONNX export of {model_name} does not match the torch model: "
+                         f"min cosine {validation['float']['min_cosine']:.6f}, "
+                         f"recall@{RECALL_K} {validation['float']['recall_at_k']:.3f}")
+
+    with open(os.path.join(tmp_dir, ONNX_EXPORT_INFO_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "max_length": MAX_SEQUENCE_LENGTH,
+                   "opset": ONNX_OPSET, "validation": validation}, f, indent=2)
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.replace(tmp_dir, model_dir)
+    logger.info(f"Exported {model_name} to {model_dir} in {time.perf_counter() - start:.1f}s "
+                f"(int8 min cosine {validation['quantized']['min_cosine']:.4f}, "
+                f"recall@{RECALL_K} {validation['quantized']['recall_at_k']:.3f})")
+    return model_dir
+
+class OnnxEmbeddings:
+    """
+    Sentence embeddings from an exported MiniLM graph on onnxruntime (CPU).
+
+    Same interface and vectors as the HuggingFaceEmbeddings it replaces:
+    token embeddings are mean-pooled over the attention mask and
+    L2-normalized, with the same 256-token truncation. Texts are sorted by
+    length before batching so batches carry little padding. Importing this
+    needs neither torch nor transformers.
+    """
+
+    def __init__(self, model_dir: str, quantized: Optional[bool] = None,
+                 threads: Optional[int] = None, batch_size: int = EMBED_BATCH_SIZE,
+                 normalize: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        info = read_export_info(model_dir) or {}
+        self.model_dir = model_dir
+        self.quantized = onnx_quantize_enabled() if quantized is None else quantized
+        if self.quantized and info.get("validation", {}).get("quantized", {}).get("passed") is False:
+            logger.warning(f"int8 graph in {model_dir} failed validation, using the float graph")
+            self.quantized = False
+        self.threads = threads or default_threads()
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+        max_length = info.get("max_length", MAX_SEQUENCE_LENGTH)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        self.tokenizer.enable_padding(pad_id=pad_id if pad_id is not None else 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        filename = QUANTIZED_FILENAME if self.quantized else MODEL_FILENAME
+        self.session = ort.InferenceSession(os.path.join(model_dir, filename), options,
+                                            providers=["CPUExecutionProvider"])
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            batch = self._embed_batch([texts[i] for i in rows])
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[rows] = batch
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def load_onnx_embeddings(model_name: str = EMBEDDING_MODEL_NAME,
+                         normalize: bool = True) -> OnnxEmbeddings:
+    """
+    Open the exported ONNX model.
+
+    The export is not done here: it needs torch and takes minutes, and this
+    runs under the embeddings registry lock, which would stall every other
+    caller. Run `python run.py onnx` (export_onnx_model()) beforehand.
+
+    Raises:
+        FileNotFoundError: If the model has not been exported
+    """
+    model_dir = onnx_model_dir(model_name)
+    if read_export_info(model_dir) is None:
+        raise FileNotFoundError(f"No ONNX export of {model_name} in {model_dir}; "
+                                f"run `python run.py onnx` first")
+    return OnnxEmbeddings(model_dir, normalize=normalize)
+
+def _measure(backend: str, queries: int = 20) -> dict:
+    """Startup, memory and latency of one backend, in a fresh process."""
+    from embeddings import get_embeddings
+
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    model = get_embeddings(backend=backend)
+    model.embed_query("warmup")
+    startup_seconds = time.perf_counter() - start
+    rss_after = current_rss_bytes()
+
+    latencies = []
+    for i in range(queries):
+        text = PROBE_TEXTS[i % 6]
+        start = time.perf_counter()
+        model.embed_query(text)
+        latencies.append(time.perf_counter() - start)
+    chunks = [PROBE_TEXTS[-1][:2000]] * EMBED_BATCH_SIZE
+    start = time.perf_counter()
+    model.embed_documents(chunks)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "startup_seconds": startup_seconds,
+        "rss_bytes": rss_after,
+        "rss_delta_bytes": (rss_after - rss_before
+                            if rss_before is not None and rss_after is not None else None),
+        "query_p50_ms": sorted(latencies)[len(latencies) // 2] * 1000,
+        "chunks_per_sec": len(chunks) / batch_seconds if batch_seconds else 0.0,
+        "probe_vectors": model.embed_documents(PROBE_TEXTS),
+    }
+
+def compare_backends(backends: Sequence[str] = ("torch", "onnx")) -> Dict[str, dict]:
+    """
+    Measure each embedding backend in its own process and compare vectors.
+
+    Separate processes keep one backend's imports out of the other's
+    startup time and RSS.
+
+    Returns:
+        Dict keyed by backend with startup_seconds, rss_bytes,
+        rss_delta_bytes, query_p50_ms, chunks_per_sec and, for backends
+        after the first, cosine agreement with the first
+    """
+    results = {}
+    for backend in backends:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", backend],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        results[backend] = json.loads(output.strip().splitlines()[-1])
+    reference = results[backends[0]]["probe_vectors"]
+    for backend in backends[1:]:
+        results[backend]["agreement"] = cosine_report(reference, results[backend]["probe_vectors"])
+    for result in results.values():
+        del result["probe_vectors"]
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--measure":
+        logging.basicConfig(level=logging.WARNING)
+        print(json.dumps(_measure(sys.argv[2])))
+    else:
+        print("Usage: python onnx_embeddings.py --measure torch|onnx")
+        sys.exit(2)
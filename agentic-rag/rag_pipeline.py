@@ -1,136 +1,1067 @@
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-import os
-import logging
-from typing import Optional
-
-# Setup logging
-logger = logging.getLogger(__name__)
-
-def build_vector_store(pdf_path: str = "Career_Advisor_Guide_2025.pdf", 
-                      chunk_size: int = 500, 
-                      chunk_overlap: int = 50,
-                      persist_dir: str = "chroma_db") -> Optional[Chroma]:
-    """
-    Build a vector store from a PDF document.
-    
-    Args:
-        pdf_path: Path to the PDF file
-        chunk_size: Size of text chunks for splitting
-        chunk_overlap: Overlap between consecutive chunks
-        persist_dir: Directory to persist the vector store
-        
-    Returns:
-        Chroma vector store or None if failed
-        
-    Raises:
-        FileNotFoundError: If PDF file doesn't exist
-        Exception: For other processing errors
-    """
-    try:
-        # Validate PDF file exists
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-        
-        if not pdf_path.lower().endswith('.pdf'):
-            raise ValueError(f"File must be a PDF: {pdf_path}")
-        
-        logger.info(f"Loading PDF: {pdf_path}")
-        
-        # Load PDF
-        loader = PyPDFLoader(pdf_path)
-        docs = loader.load()
-        
-        if not docs:
-            raise ValueError(f"No content found in PDF: {pdf_path}")
-        
-        logger.info(f"Loaded {len(docs)} pages from PDF")
-        
-        # Split documents
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
-        splits = splitter.split_documents(docs)
-        
-        if not splits:
-            raise ValueError("No text chunks created from PDF")
-        
-        logger.info(f"Created {len(splits)} text chunks")
-        
-        # Initialize embeddings
-        try:
-            embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'},  # Ensure CPU usage for compatibility
-                encode_kwargs={'normalize_embeddings': True}
-            )
-            logger.info("Embeddings model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load embeddings model: {str(e)}")
-            raise
-        
-        # Create vector store
-        try:
-            vectorstore = Chroma.from_documents(
-                splits, 
-                embeddings, 
-                persist_directory=persist_dir
-            )
-            
-            # Persist the vector store
-            vectorstore.persist()
-            logger.info(f"Vector store created and persisted to {persist_dir}")
-            
-            return vectorstore
-            
-        except Exception as e:
-            logger.error(f"Failed to create vector store: {str(e)}")
-            raise
-            
-    except FileNotFoundError:
-        logger.error(f"PDF file not found: {pdf_path}")
-        raise
-    except ValueError as e:
-        logger.error(f"Invalid input: {str(e)}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error building vector store: {str(e)}")
-        raise
-
-def load_existing_vector_store(persist_dir: str = "chroma_db") -> Optional[Chroma]:
-    """
-    Load an existing vector store from disk.
-    
-    Args:
-        persist_dir: Directory where vector store is persisted
-        
-    Returns:
-        Chroma vector store or None if not found
-    """
-    try:
-        if not os.path.exists(persist_dir):
-            logger.info(f"No existing vector store found at {persist_dir}")
-            return None
-        
-        # Initialize embeddings (must match the one used during creation)
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        
-        # Load existing vector store
-        vectorstore = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings
-        )
-        
-        logger.info(f"Loaded existing vector store from {persist_dir}")
-        return vectorstore
-        
-    except Exception as e:
-        logger.error(f"Failed to load existing vector store: {str(e)}")
-        return None
+from __future__ import annotations
+
+import metrics
+from embeddings import EMBED_BATCH_SIZE, EMBEDDING_MODEL_NAME, get_embeddings
+import os
+import re
+import json
+import math
+import heapq
+import hashlib
+import glob
+import time
+import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# langchain, chromadb and torch take seconds to import, so they are imported
+# inside the functions that need them and importing this module stays cheap.
+if TYPE_CHECKING:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.documents import Document
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "index_manifest.json"
+MANIFEST_VERSION = 1
+PARSE_PAGES_PER_TASK = 8
+BM25_FILENAME = "bm25_index.json"
+BM25_VERSION = 1
+RRF_K = 60
+HYBRID_CANDIDATES = 20
+# "numpy" keeps vectors in a memory-mapped matrix instead of Chroma; both
+# persist under the same directory and share the manifest and BM25 index
+VECTOR_BACKENDS = ("chroma", "numpy")
+# Quantized vectors the numpy backend can serve from RAM (COMPACT_VECTORS)
+COMPACT_VECTOR_DTYPES = ("float16", "int8")
+MIGRATE_BATCH_SIZE = 1000
+
+# Bumped on every write so in-process caches notice re-indexing immediately
+_index_generations: Dict[str, int] = {}
+_generation_lock = threading.Lock()
+
+# Loaded BM25 indexes per persist dir, reloaded when the index changes
+_bm25_cache: Dict[str, Tuple[tuple, "BM25Index"]] = {}
+_bm25_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_TOKEN_SPLIT_RE = re.compile(r"[-./]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have how i in is it me my of on or "
+    "should that the this to was what when where which who will with you your".split()
+)
+
+def _file_sha256(path: str) -> str:
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _settings_key(chunk_size: int, chunk_overlap: int,
+                  model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """Key for the settings that change chunk boundaries or vectors."""
+    raw = f"{chunk_size}|{chunk_overlap}|{model_name}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def _chunk_id(settings_key: str, source_key: str, text: str) -> str:
+    """Content-addressed id for a chunk of a given source."""
+    raw = f"{settings_key}\x00{source_key}\x00{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _manifest_path(persist_dir: str) -> str:
+    return os.path.join(persist_dir, MANIFEST_FILENAME)
+
+def _load_manifest(persist_dir: str) -> dict:
+    """Load the index manifest, or an empty one if missing or unreadable."""
+    path = _manifest_path(persist_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+        logger.warning(f"Ignoring index manifest with unknown version: {path}")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read index manifest {path}: {str(e)}")
+    return {"version": MANIFEST_VERSION, "sources": {}}
+
+def _save_manifest(persist_dir: str, manifest: dict) -> None:
+    """Write the manifest atomically so a crash never leaves it half-written."""
+    os.makedirs(persist_dir, exist_ok=True)
+    path = _manifest_path(persist_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def read_index_manifest(persist_dir: str = "chroma_db") -> dict:
+    """
+    Read the index manifest without touching Chroma or the embeddings model.
+
+    Args:
+        persist_dir: Directory where vector store is persisted
+
+    Returns:
+        Manifest dict with a "sources" mapping of indexed files
+    """
+    return _load_manifest(persist_dir)
+
+def _bump_index_generation(persist_dir: str) -> None:
+    key = os.path.abspath(persist_dir)
+    with _generation_lock:
+        _index_generations[key] = _index_generations.get(key, 0) + 1
+
+def index_version(persist_dir: str = "chroma_db") -> tuple:
+    """
+    Cheap token that changes whenever the index is re-indexed.
+
+    Combines an in-process write counter with the manifest's modification
+    time, so writes from other processes (e.g. run.py ingest) are seen too.
+    """
+    try:
+        manifest_mtime = os.stat(_manifest_path(persist_dir)).st_mtime_ns
+    except OSError:
+        manifest_mtime = None
+    return (_index_generations.get(os.path.abspath(persist_dir), 0), manifest_mtime)
+
+def vector_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve the vector store backend: explicit value, else VECTOR_BACKEND.
+
+    Raises:
+        ValueError: If the backend is not one of VECTOR_BACKENDS
+    """
+    backend = (backend or os.getenv("VECTOR_BACKEND", "chroma")).lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend} "
+                         f"(expected one of {', '.join(VECTOR_BACKENDS)})")
+    return backend
+
+def _manifest_backend(manifest: dict) -> str:
+    # Manifests written before the NumPy backend existed describe Chroma
+    return manifest.get("backend", "chroma")
+
+def index_is_current(pdf_path: str,
+                     chunk_size: int = 500,
+                     chunk_overlap: int = 50,
+                     persist_dir: str = "chroma_db",
+                     backend: Optional[str] = None) -> bool:
+    """
+    Check whether the persisted index already holds this exact PDF.
+
+    Args:
+        pdf_path: Path to the PDF file
+        chunk_size: Size of text chunks for splitting
+        chunk_overlap: Overlap between consecutive chunks
+        persist_dir: Directory where vector store is persisted
+        backend: Vector store backend (default: VECTOR_BACKEND, chroma)
+
+    Returns:
+        True if the manifest records the same file hash and settings,
+        written through the same backend; False for an unknown backend
+    """
+    if not os.path.exists(pdf_path):
+        return False
+    try:
+        backend = vector_backend(backend)
+    except ValueError as e:
+        logger.warning(f"Cannot check index: {str(e)}")
+        return False
+    manifest = _load_manifest(persist_dir)
+    if _manifest_backend(manifest) != backend:
+        return False
+    entry = manifest["sources"].get(os.path.abspath(pdf_path))
+    if not entry:
+        return False
+    return (entry.get("settings") == _settings_key(chunk_size, chunk_overlap)
+            and entry.get("file_hash") == _file_sha256(pdf_path))
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF, read from its page tree without extracting text."""
+    from pypdf import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+def _parse_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text for pages [start, end); runs inside a worker process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [(page_no, reader.pages[page_no].extract_text() or "")
+            for page_no in range(start, end)]
+
+def _iter_pages(pdf_path: str, parse_workers: int = 0) -> Iterator[Document]:
+    """
+    Yield PDF pages one at a time.
+
+    With parse_workers > 1 pages are extracted in a process pool a few
+    ranges ahead of the consumer, so parsing overlaps with embedding.
+    """
+    if parse_workers <= 1:
+        from langchain_community.document_loaders import PyPDFLoader
+
+        yield from PyPDFLoader(pdf_path).lazy_load()
+        return
+
+    from langchain_core.documents import Document
+
+    total_pages = count_pdf_pages(pdf_path)
+    ranges = [(start, min(start + PARSE_PAGES_PER_TASK, total_pages))
+              for start in range(0, total_pages, PARSE_PAGES_PER_TASK)]
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        pending = deque()
+        next_range = 0
+        # Bound the read-ahead so memory stays flat on very large PDFs
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < parse_workers * 2:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(_parse_page_range, pdf_path, start, end))
+                next_range += 1
+            for page_no, text in pending.popleft().result():
+                yield Document(page_content=text,
+                               metadata={"source": pdf_path, "page": page_no})
+
+def _batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most batch_size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _iter_chunks(pdf_path: str, chunk_size: int, chunk_overlap: int,
+                 parse_workers: int, counts: dict) -> Iterator[Document]:
+    """Stream text chunks page by page, tallying pages and chunks in counts."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    logger.info(f"Loading PDF: {pdf_path}")
+
+    # start_index lets context assembly merge adjacent chunks of a page
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+    for page in _iter_pages(pdf_path, parse_workers):
+        counts["pages"] += 1
+        for chunk in splitter.split_documents([page]):
+            counts["chunks"] += 1
+            yield chunk
+
+def _check_counts(pdf_path: str, counts: dict) -> None:
+    """Raise the same errors as an eager load when a PDF yields nothing."""
+    if not counts["pages"]:
+        raise ValueError(f"No content found in PDF: {pdf_path}")
+    if not counts["chunks"]:
+        raise ValueError("No text chunks created from PDF")
+    logger.info(f"Loaded {counts['pages']} pages and created {counts['chunks']} text chunks")
+
+def _tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens for BM25.
+
+    Codes such as "CS-101" or "B.Tech" are kept whole and also emitted as
+    their parts and in joined form, so "cs101", "cs 101" and "btech" match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.append(_TOKEN_SPLIT_RE.sub("", token))
+            tokens.extend(part for part in _TOKEN_SPLIT_RE.split(token)
+                          if part not in _STOPWORDS)
+    return tokens
+
+def _bm25_path(persist_dir: str) -> str:
+    return os.path.join(persist_dir, BM25_FILENAME)
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk text, persisted next to Chroma.
+
+    Chunks use the same ids as the Chroma collection, so ingestion adds and
+    deletes them in the same pass. Only chunk text and metadata are written
+    to disk; postings and lengths are rebuilt when the index is loaded.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Tuple[str, dict]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, chunk_id: str, text: str, metadata: Optional[dict] = None) -> None:
+        """Index a chunk, replacing any chunk with the same id."""
+        if chunk_id in self.docs:
+            self.remove(chunk_id)
+        tokens = _tokenize(text)
+        self.docs[chunk_id] = (text, dict(metadata or {}))
+        self.lengths[chunk_id] = len(tokens)
+        self.total_length += len(tokens)
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+
+    def metadata(self, chunk_id: str) -> Optional[dict]:
+        """Stored metadata of a chunk, or None if it is not indexed."""
+        entry = self.docs.get(chunk_id)
+        return entry[1] if entry is not None else None
+
+    def update_metadata(self, chunk_id: str, metadata: dict) -> None:
+        """Replace a chunk's metadata; its text and postings are unchanged."""
+        if chunk_id in self.docs:
+            self.docs[chunk_id] = (self.docs[chunk_id][0], dict(metadata))
+
+    def remove(self, chunk_id: str) -> None:
+        """Drop a chunk from the index if present."""
+        entry = self.docs.pop(chunk_id, None)
+        if entry is None:
+            return
+        self.total_length -= self.lengths.pop(chunk_id)
+        for term in set(_tokenize(entry[0])):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Score chunks containing any query term.
+
+        Args:
+            query: User query text
+            k: Number of chunks to return
+
+        Returns:
+            List of (chunk id, BM25 score), best first
+        """
+        total = len(self.docs)
+        if not total:
+            return []
+        avg_length = (self.total_length / total) or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(_tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def search_documents(self, query: str, k: int = 3) -> List[Document]:
+        """search() returning Documents, for fusion with dense results."""
+        from langchain_core.documents import Document
+
+        results = []
+        for chunk_id, _ in self.search(query, k):
+            text, metadata = self.docs[chunk_id]
+            results.append(Document(page_content=text, metadata=dict(metadata)))
+        return results
+
+    def save(self, persist_dir: str) -> None:
+        """Write the index atomically next to the Chroma files."""
+        os.makedirs(persist_dir, exist_ok=True)
+        path = _bm25_path(persist_dir)
+        tmp_path = f"{path}.tmp"
+        data = {
+            "version": BM25_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": {chunk_id: [text, metadata] for chunk_id, (text, metadata) in self.docs.items()},
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, persist_dir: str) -> Optional["BM25Index"]:
+        """Load a persisted index, or None if it is missing or unreadable."""
+        path = _bm25_path(persist_dir)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read BM25 index {path}: {str(e)}")
+            return None
+        if data.get("version") != BM25_VERSION:
+            logger.warning(f"Ignoring BM25 index with unknown version: {path}")
+            return None
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        for chunk_id, (text, metadata) in data["docs"].items():
+            index.add(chunk_id, text, metadata)
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Chroma) -> "BM25Index":
+        """Build an index from every chunk already in a Chroma collection."""
+        index = cls()
+        data = vectorstore.get(include=["documents", "metadatas"])
+        for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+            index.add(chunk_id, text or "", metadata)
+        return index
+
+def _bm25_version(persist_dir: str) -> tuple:
+    try:
+        bm25_mtime = os.stat(_bm25_path(persist_dir)).st_mtime_ns
+    except OSError:
+        bm25_mtime = None
+    return index_version(persist_dir) + (bm25_mtime,)
+
+def _publish_bm25_index(persist_dir: str, index: BM25Index) -> None:
+    """Hand a freshly written index to in-process readers without a reload."""
+    with _bm25_lock:
+        _bm25_cache[os.path.abspath(persist_dir)] = (_bm25_version(persist_dir), index)
+
+def load_bm25_index(persist_dir: str = "chroma_db",
+                    vectorstore: Optional[Chroma] = None) -> Optional[BM25Index]:
+    """
+    Return the BM25 index for a persisted store, cached until it changes.
+
+    Stores indexed before the BM25 index existed have no index file; given
+    the vector store, one is built from its chunks and saved.
+
+    Args:
+        persist_dir: Directory where vector store is persisted
+        vectorstore: Chroma store to rebuild a missing index from
+
+    Returns:
+        BM25Index, or None if there is none and no vector store was given
+    """
+    key = os.path.abspath(persist_dir)
+    version = _bm25_version(persist_dir)
+    with _bm25_lock:
+        cached = _bm25_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = BM25Index.load(persist_dir)
+        if index is None and vectorstore is not None:
+            logger.info(f"No BM25 index in {persist_dir}, building one from the vector store")
+            index = BM25Index.from_vectorstore(vectorstore)
+            index.save(persist_dir)
+            version = _bm25_version(persist_dir)
+        if index is not None:
+            _bm25_cache[key] = (version, index)
+        return index
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 3,
+                           rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Fuse ranked result lists with reciprocal-rank fusion.
+
+    Each document scores the sum of 1 / (rrf_k + rank) over the lists it
+    appears in. Documents are matched by text, so a chunk found by both
+    searches counts once.
+
+    Args:
+        result_lists: Ranked lists of documents, best first
+        k: Number of documents to return
+        rrf_k: Rank damping constant (60 in the original RRF paper)
+
+    Returns:
+        Top-k fused documents, best first
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
+
+def hybrid_search(vectorstore: Chroma, query: str, k: int = 3,
+                  persist_dir: str = "chroma_db",
+                  candidate_k: int = HYBRID_CANDIDATES,
+                  embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Dense and BM25 search fused with reciprocal-rank fusion.
+
+    Dense search catches paraphrases, BM25 catches exact terms such as
+    course codes, exam names and college names. Stage latencies are recorded
+    as retrieval.dense, retrieval.lexical and retrieval.fusion.
+
+    Args:
+        vectorstore: Chroma vector store
+        query: User query text
+        k: Number of documents to return
+        persist_dir: Directory where vector store is persisted
+        candidate_k: Candidates taken from each search before fusion
+        embedding: Precomputed query embedding, if any
+
+    Returns:
+        List of matching documents, best first
+    """
+    candidate_k = max(k, candidate_k)
+    with metrics.span("retrieval.dense"):
+        if embedding is None:
+            dense = vectorstore.similarity_search(query, k=candidate_k)
+        else:
+            dense = vectorstore.similarity_search_by_vector(embedding, k=candidate_k)
+
+    index = load_bm25_index(persist_dir, vectorstore)
+    if index is None:
+        return dense[:k]
+    with metrics.span("retrieval.lexical"):
+        lexical = index.search_documents(query, candidate_k)
+    with metrics.span("retrieval.fusion"):
+        return reciprocal_rank_fusion([dense, lexical], k)
+
+def compact_dtype(compact: Optional[str] = None, backend: Optional[str] = None) -> str:
+    """
+    Resolve the vectors served from RAM: explicit value, else COMPACT_VECTORS.
+
+    Raises:
+        ValueError: If the dtype is unknown, or compact vectors are asked of
+            a backend other than numpy
+    """
+    if compact is None:
+        compact = os.getenv("COMPACT_VECTORS", "")
+    compact = compact.lower()
+    dtype = "float32" if compact in ("", "0", "off", "false", "none") else compact
+    if dtype != "float32" and dtype not in COMPACT_VECTOR_DTYPES:
+        raise ValueError(f"Unknown compact vector dtype: {dtype} "
+                         f"(expected one of {', '.join(COMPACT_VECTOR_DTYPES)} or off)")
+    if dtype != "float32" and vector_backend(backend) != "numpy":
+        raise ValueError(f"Compact {dtype} vectors are served by the numpy backend; "
+                         "set VECTOR_BACKEND=numpy")
+    return dtype
+
+def _open_store(persist_dir: str, embeddings: HuggingFaceEmbeddings, backend: str,
+                compact: Optional[str] = None):
+    """Open (or create empty) the vector store of a backend under persist_dir."""
+    dtype = compact_dtype(compact, backend)
+    if backend == "numpy":
+        from vector_index import NumpyVectorStore
+
+        return (NumpyVectorStore.load(persist_dir, embeddings, dtype)
+                or NumpyVectorStore(embeddings, persist_dir, dtype))
+
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(
+        persist_directory=persist_dir,
+        embedding_function=embeddings
+    )
+
+def _upsert_chunks(vectorstore, ids: List[str], vectors, metadatas: List[dict],
+                   documents: List[str]) -> None:
+    """Write chunks with pre-computed embeddings to either backend."""
+    from vector_index import NumpyVectorStore
+
+    if isinstance(vectorstore, NumpyVectorStore):
+        vectorstore.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=documents)
+    else:
+        vectorstore._collection.upsert(ids=ids, embeddings=vectors,
+                                       metadatas=metadatas, documents=documents)
+
+def _update_metadatas(vectorstore, ids: List[str], metadatas: List[dict]) -> None:
+    """Replace the metadata of stored chunks in either backend, keeping their vectors."""
+    from vector_index import NumpyVectorStore
+
+    if isinstance(vectorstore, NumpyVectorStore):
+        vectorstore.update_metadatas(ids=ids, metadatas=metadatas)
+    else:
+        vectorstore._collection.update(ids=ids, metadatas=metadatas)
+
+def _copy_vectors(source, target) -> int:
+    """Make target hold exactly the chunks of source, without re-embedding."""
+    data = source.get(include=["documents", "metadatas", "embeddings"])
+    stale = set(target.get(include=[])["ids"]) - set(data["ids"])
+    if stale:
+        target.delete(ids=list(stale))
+    for start in range(0, len(data["ids"]), MIGRATE_BATCH_SIZE):
+        end = start + MIGRATE_BATCH_SIZE
+        _upsert_chunks(target, list(data["ids"][start:end]),
+                       [list(map(float, vector)) for vector in data["embeddings"][start:end]],
+                       list(data["metadatas"][start:end]), list(data["documents"][start:end]))
+    return len(data["ids"])
+
+def _drop_unmanaged_chunks(vectorstore: Chroma) -> None:
+    """Remove chunks written before the manifest existed (random ids, duplicates)."""
+    existing_ids = vectorstore.get(include=[])["ids"]
+    if existing_ids:
+        logger.info(f"Removing {len(existing_ids)} chunks not tracked by the index manifest")
+        vectorstore.delete(ids=existing_ids)
+
+def _index_document(vectorstore: Chroma, embeddings: HuggingFaceEmbeddings,
+                    pdf_path: str, chunk_size: int, chunk_overlap: int,
+                    batch_size: int, parse_workers: int, manifest: dict,
+                    lock: threading.Lock, bm25: BM25Index,
+                    progress: Optional[Callable[[dict], None]] = None,
+                    force: bool = False) -> dict:
+    """
+    Incrementally index one PDF into a shared vector store and BM25 index.
+
+    The lock guards Chroma, BM25 and manifest updates so several documents
+    can be parsed and embedded concurrently. Returns per-document stats;
+    progress, if given, receives a copy after every batch. With force every
+    chunk is re-embedded and overwritten under its id, even if unchanged.
+    An unchanged chunk keeps its vector, but its metadata is updated when
+    it differs, so a chunk that moved to another page after an edit is
+    cited with its new page and start_index.
+    """
+    start = time.perf_counter()
+    source_key = os.path.abspath(pdf_path)
+    settings = _settings_key(chunk_size, chunk_overlap)
+    file_hash = _file_sha256(pdf_path)
+    stats = {"source": pdf_path, "pages": 0, "chunks": 0, "embedded": 0,
+             "updated": 0, "removed": 0, "embed_seconds": 0.0, "skipped": False}
+
+    with lock:
+        entry = manifest["sources"].get(source_key)
+
+    if (not force and entry and entry.get("file_hash") == file_hash
+            and entry.get("settings") == settings):
+        logger.info(f"Index is current for {pdf_path}, skipping re-embedding")
+        stats.update(chunks=len(entry.get("chunk_ids", [])), skipped=True,
+                     seconds=time.perf_counter() - start)
+        if progress is not None:
+            progress(dict(stats))
+        return stats
+
+    doc_metadata = {"doc_id": file_hash[:16], "title": os.path.basename(pdf_path)}
+    counts = {"pages": 0, "chunks": 0}
+    chunks = _iter_chunks(pdf_path, chunk_size, chunk_overlap, parse_workers, counts)
+
+    # Identical chunks map to the same id, so keep only the first occurrence
+    chunk_ids = []
+    previous_ids = set(entry.get("chunk_ids", [])) if entry else set()
+    reusable_ids = set() if force else previous_ids
+    seen = set()
+    for batch in _batched(chunks, batch_size):
+        new_docs, new_ids, reused = [], [], []
+        for doc in batch:
+            chunk_id = _chunk_id(settings, source_key, doc.page_content)
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            chunk_ids.append(chunk_id)
+            doc.metadata.update(doc_metadata)
+            if chunk_id in reusable_ids:
+                reused.append((chunk_id, doc.metadata))
+            else:
+                new_docs.append(doc)
+                new_ids.append(chunk_id)
+        if reused:
+            # BM25 holds the same metadata as the vector store, in memory
+            with lock:
+                moved = [(chunk_id, metadata) for chunk_id, metadata in reused
+                         if bm25.metadata(chunk_id) != metadata]
+                if moved:
+                    _update_metadatas(vectorstore, [chunk_id for chunk_id, _ in moved],
+                                      [metadata for _, metadata in moved])
+                    for chunk_id, metadata in moved:
+                        bm25.update_metadata(chunk_id, metadata)
+            stats["updated"] += len(moved)
+        if not new_docs:
+            if progress is not None:
+                progress(dict(stats, pages=counts["pages"], chunks=len(chunk_ids)))
+            continue
+
+        # Embed outside the lock so documents embed in parallel
+        embed_start = time.perf_counter()
+        vectors = embeddings.embed_documents([doc.page_content for doc in new_docs])
+        embed_seconds = time.perf_counter() - embed_start
+        stats["embed_seconds"] += embed_seconds
+        metrics.record("ingest.embed_batch", embed_seconds)
+        metrics.inc("ingest_chunks_embedded", len(new_docs))
+        with lock, metrics.span("ingest.write_batch"):
+            _upsert_chunks(vectorstore, new_ids, vectors,
+                           [doc.metadata for doc in new_docs],
+                           [doc.page_content for doc in new_docs])
+            for chunk_id, doc in zip(new_ids, new_docs):
+                bm25.add(chunk_id, doc.page_content, doc.metadata)
+        stats["embedded"] += len(new_ids)
+        logger.debug(f"Embedded batch of {len(new_ids)} chunks from {pdf_path}")
+        if progress is not None:
+            progress(dict(stats, pages=counts["pages"], chunks=len(chunk_ids)))
+
+    _check_counts(pdf_path, counts)
+
+    removed_ids = list(previous_ids - seen)
+    with lock:
+        if removed_ids:
+            vectorstore.delete(ids=removed_ids)
+            for chunk_id in removed_ids:
+                bm25.remove(chunk_id)
+        manifest["sources"][source_key] = {
+            "file_hash": file_hash,
+            "settings": settings,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "model_name": EMBEDDING_MODEL_NAME,
+            "chunk_ids": chunk_ids,
+            "indexed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    stats.update(pages=counts["pages"], chunks=len(chunk_ids),
+                 removed=len(removed_ids), seconds=time.perf_counter() - start)
+    logger.info(
+        f"Incremental index of {pdf_path}: {stats['embedded']} embedded, "
+        f"{len(chunk_ids) - stats['embedded']} unchanged ({stats['updated']} with updated "
+        f"metadata), {len(removed_ids)} removed"
+    )
+    return stats
+
+def _switch_backend(persist_dir: str, embeddings: HuggingFaceEmbeddings,
+                    manifest: dict, vectorstore, backend: str) -> None:
+    """Bring a backend up to date from the one that last wrote the index."""
+    previous = _manifest_backend(manifest)
+    # Only read for its float32 vectors, whatever is served from RAM
+    source = _open_store(persist_dir, embeddings, previous, "off")
+    with metrics.span("ingest.migrate_backend"):
+        copied = _copy_vectors(source, vectorstore)
+    if copied < sum(len(entry.get("chunk_ids", [])) for entry in manifest["sources"].values()):
+        # The other backend lost its vectors; re-index from the PDFs instead
+        logger.warning(f"{previous} store in {persist_dir} is incomplete, re-indexing all sources")
+        manifest["sources"] = {}
+    manifest["backend"] = backend
+    vectorstore.persist()
+    _save_manifest(persist_dir, manifest)
+    _bump_index_generation(persist_dir)
+    logger.info(f"Copied {copied} vectors from the {previous} to the {backend} backend in {persist_dir}")
+
+def _open_managed_store(persist_dir: str, embeddings: HuggingFaceEmbeddings,
+                        backend: Optional[str] = None,
+                        compact: Optional[str] = None) -> Tuple[Chroma, dict, BM25Index]:
+    """Open the persisted collection, manifest and BM25 index for incremental updates."""
+    backend = vector_backend(backend)
+    manifest_exists = os.path.exists(_manifest_path(persist_dir))
+    manifest = _load_manifest(persist_dir)
+    vectorstore = _open_store(persist_dir, embeddings, backend, compact)
+    if not manifest_exists:
+        _drop_unmanaged_chunks(vectorstore)
+        manifest["backend"] = backend
+        return vectorstore, manifest, BM25Index()
+
+    if _manifest_backend(manifest) != backend:
+        _switch_backend(persist_dir, embeddings, manifest, vectorstore, backend)
+
+    bm25 = BM25Index.load(persist_dir)
+    if bm25 is None:
+        # Indexed before BM25 existed: unchanged documents are skipped, so
+        # catch the lexical index up with the collection now
+        logger.info(f"Building BM25 index from the existing collection in {persist_dir}")
+        bm25 = BM25Index.from_vectorstore(vectorstore)
+        bm25.save(persist_dir)
+    return vectorstore, manifest, bm25
+
+def _commit_index(persist_dir: str, vectorstore: Chroma, manifest: Optional[dict],
+                  bm25: BM25Index) -> None:
+    """Persist Chroma, the BM25 index and the manifest, then signal readers."""
+    vectorstore.persist()
+    # The manifest goes last so it never describes chunks BM25 is missing
+    bm25.save(persist_dir)
+    if manifest is not None:
+        _save_manifest(persist_dir, manifest)
+    _bump_index_generation(persist_dir)
+    _publish_bm25_index(persist_dir, bm25)
+
+def _sync_compact_codes(vectorstore: Chroma) -> None:
+    """Write the codes of a compact NumPy store if the persisted index has none."""
+    from vector_index import NumpyVectorStore
+
+    if isinstance(vectorstore, NumpyVectorStore) and vectorstore.dtype != "float32":
+        with metrics.span("ingest.compact_codes"):
+            vectorstore.persist()
+
+def _build_incremental(pdf_path: str, chunk_size: int, chunk_overlap: int,
+                       persist_dir: str, embeddings: HuggingFaceEmbeddings,
+                       batch_size: int, parse_workers: int,
+                       progress: Optional[Callable[[dict], None]],
+                       compact: Optional[str], backend: Optional[str],
+                       force: bool = False) -> Chroma:
+    """
+    Embed only new or changed chunks and delete chunks that disappeared;
+    with force, re-embed every chunk of the PDF.
+    """
+    vectorstore, manifest, bm25 = _open_managed_store(persist_dir, embeddings, backend, compact)
+    stats = _index_document(vectorstore, embeddings, pdf_path, chunk_size,
+                            chunk_overlap, batch_size, parse_workers,
+                            manifest, threading.Lock(), bm25, progress, force)
+    if not stats["skipped"]:
+        _commit_index(persist_dir, vectorstore, manifest, bm25)
+    _sync_compact_codes(vectorstore)
+    return vectorstore
+
+def build_vector_store(pdf_path: str = "Career_Advisor_Guide_2025.pdf", 
+                      chunk_size: int = 500, 
+                      chunk_overlap: int = 50,
+                      persist_dir: str = "chroma_db",
+                      incremental: bool = True,
+                      batch_size: int = EMBED_BATCH_SIZE,
+                      parse_workers: int = 0,
+                      progress: Optional[Callable[[dict], None]] = None,
+                      compact: Optional[str] = None,
+                      backend: Optional[str] = None) -> Optional[Chroma]:
+    """
+    Build a vector store from a PDF document.
+
+    In incremental mode the source file and every chunk are hashed together
+    with the chunking and model settings. An unchanged PDF costs a manifest
+    lookup; otherwise only new or changed chunks are embedded and chunks that
+    disappeared are deleted.
+
+    Pages are parsed lazily and chunks are embedded and written to Chroma
+    batch by batch, so memory stays bounded regardless of PDF size.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        chunk_size: Size of text chunks for splitting
+        chunk_overlap: Overlap between consecutive chunks
+        persist_dir: Directory to persist the vector store
+        incremental: Reuse unchanged chunks via the index manifest; False
+            re-embeds every chunk of the PDF (same content-hash ids, so
+            nothing is duplicated, and the manifest is updated)
+        batch_size: Number of chunks embedded and written per batch
+        parse_workers: Processes used to parse pages in parallel with
+            embedding (0 or 1 parses in this process)
+        progress: Called after every batch with a dict of pages and
+            chunks processed so far and chunks embedded
+        compact: Serve "float16" or "int8" vectors from RAM, with exact
+            float32 re-scoring (numpy backend only; default: COMPACT_VECTORS, off)
+        backend: "chroma" or "numpy" (default: VECTOR_BACKEND, chroma)
+        
+    Returns:
+        Chroma (or NumpyVectorStore) vector store or None if failed
+        
+    Raises:
+        FileNotFoundError: If PDF file doesn't exist
+        Exception: For other processing errors
+    """
+    try:
+        # Validate PDF file exists
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        if not pdf_path.lower().endswith('.pdf'):
+            raise ValueError(f"File must be a PDF: {pdf_path}")
+
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+        
+        # Initialize embeddings (shared across calls and sessions)
+        try:
+            embeddings = get_embeddings()
+        except Exception as e:
+            logger.error(f"Failed to load embeddings model: {str(e)}")
+            raise
+
+        try:
+            return _build_incremental(
+                pdf_path, chunk_size, chunk_overlap, persist_dir, embeddings,
+                batch_size, parse_workers, progress, compact, backend,
+                force=not incremental
+            )
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to create vector store: {str(e)}")
+            raise
+            
+    except FileNotFoundError:
+        logger.error(f"PDF file not found: {pdf_path}")
+        raise
+    except ValueError as e:
+        logger.error(f"Invalid input: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error building vector store: {str(e)}")
+        raise
+
+def open_vector_store(pdf_path: str = "Career_Advisor_Guide_2025.pdf",
+                      persist_dir: str = "chroma_db",
+                      backend: Optional[str] = None,
+                      compact: Optional[str] = None) -> Optional[Chroma]:
+    """
+    Open the index for a PDF, rebuilding only if the persisted one is stale.
+
+    Args:
+        pdf_path: Path to the PDF file
+        persist_dir: Directory where vector store is persisted
+        backend: "chroma" or "numpy" (default: VECTOR_BACKEND, chroma)
+        compact: Compact vectors to serve, as in build_vector_store()
+
+    Returns:
+        Chroma (or NumpyVectorStore) vector store
+    """
+    if index_is_current(pdf_path, persist_dir=persist_dir, backend=backend):
+        vectorstore = load_existing_vector_store(persist_dir, backend, compact)
+        if vectorstore is not None:
+            return vectorstore
+    return build_vector_store(pdf_path, persist_dir=persist_dir, compact=compact,
+                              backend=backend)
+
+def resolve_pdf_paths(target: Union[str, List[str]]) -> List[str]:
+    """
+    Expand a directory, glob pattern, file path or list of them into PDF paths.
+
+    Args:
+        target: Directory (searched recursively), glob pattern or file path
+
+    Returns:
+        Sorted, de-duplicated list of PDF file paths
+    """
+    targets = [target] if isinstance(target, str) else list(target)
+    paths = set()
+    for item in targets:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(path for path in matches
+                     if os.path.isfile(path) and path.lower().endswith('.pdf'))
+    return sorted(paths)
+
+def build_corpus(target: Union[str, List[str]],
+                 chunk_size: int = 500,
+                 chunk_overlap: int = 50,
+                 persist_dir: str = "chroma_db",
+                 max_workers: int = 4,
+                 batch_size: int = EMBED_BATCH_SIZE,
+                 compact: Optional[str] = None,
+                 backend: Optional[str] = None) -> Tuple[Chroma, dict]:
+    """
+    Ingest many PDFs concurrently into one incremental collection.
+
+    Every chunk carries its document's source, doc_id and title metadata.
+    Documents that fail are reported and do not stop the rest.
+
+    Args:
+        target: Directory, glob pattern, file path or list of them
+        chunk_size: Size of text chunks for splitting
+        chunk_overlap: Overlap between consecutive chunks
+        persist_dir: Directory to persist the vector store
+        max_workers: Number of documents ingested at the same time
+        batch_size: Number of chunks embedded and written per batch
+        compact: Compact vectors to serve, as in build_vector_store()
+        backend: Vector store backend, as in build_vector_store()
+
+    Returns:
+        Tuple of the Chroma vector store and an ingestion report with
+        per-document stats, failures, docs/sec and chunks/sec
+
+    Raises:
+        ValueError: If no PDF files match the target
+    """
+    pdf_paths = resolve_pdf_paths(target)
+    if not pdf_paths:
+        raise ValueError(f"No PDF files found for: {target}")
+
+    logger.info(f"Ingesting {len(pdf_paths)} PDFs with {max_workers} workers")
+    start = time.perf_counter()
+
+    embeddings = get_embeddings()
+    vectorstore, manifest, bm25 = _open_managed_store(persist_dir, embeddings, backend, compact)
+    lock = threading.Lock()
+
+    documents, failed = [], []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(_index_document, vectorstore, embeddings, pdf_path,
+                        chunk_size, chunk_overlap, batch_size, 0, manifest, lock, bm25): pdf_path
+            for pdf_path in pdf_paths
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                documents.append(future.result())
+            except Exception as e:
+                logger.error(f"Failed to ingest {pdf_path}: {str(e)}")
+                failed.append({"source": pdf_path, "error": str(e)})
+
+    changed = any(not stats["skipped"] for stats in documents)
+    if changed:
+        _commit_index(persist_dir, vectorstore, manifest, bm25)
+    _sync_compact_codes(vectorstore)
+
+    total_seconds = time.perf_counter() - start
+    # Skipped documents cost a manifest lookup, so they do not count as throughput
+    processed = [stats for stats in documents if not stats["skipped"]]
+    total_chunks = sum(stats["chunks"] for stats in processed)
+    report = {
+        "documents": sorted(documents, key=lambda stats: stats["source"]),
+        "failed": failed,
+        "total_seconds": total_seconds,
+        "total_chunks": total_chunks,
+        "embedded_chunks": sum(stats["embedded"] for stats in documents),
+        "docs_per_sec": len(processed) / total_seconds if total_seconds else 0.0,
+        "chunks_per_sec": total_chunks / total_seconds if total_seconds else 0.0,
+    }
+    logger.info(
+        f"Ingested {len(documents)} PDFs ({len(failed)} failed) in {total_seconds:.1f}s: "
+        f"{report['docs_per_sec']:.2f} docs/sec, {report['chunks_per_sec']:.1f} chunks/sec"
+    )
+    return vectorstore, report
+
+def load_existing_vector_store(persist_dir: str = "chroma_db",
+                               backend: Optional[str] = None,
+                               compact: Optional[str] = None) -> Optional[Chroma]:
+    """
+    Load an existing vector store from disk.
+    
+    Args:
+        persist_dir: Directory where vector store is persisted
+        backend: "chroma" or "numpy" (default: VECTOR_BACKEND, chroma)
+        compact: Compact vectors to serve, as in build_vector_store()
+        
+    Returns:
+        Chroma (or NumpyVectorStore) vector store or None if not found
+    """
+    try:
+        if not os.path.exists(persist_dir):
+            logger.info(f"No existing vector store found at {persist_dir}")
+            return None
+        
+        # Initialize embeddings (must match the one used during creation)
+        embeddings = get_embeddings()
+        
+        # Load existing vector store
+        dtype = compact_dtype(compact, backend)
+        if vector_backend(backend) == "numpy":
+            from vector_index import NumpyVectorStore
+
+            vectorstore = NumpyVectorStore.load(persist_dir, embeddings, dtype)
+            if vectorstore is None:
+                logger.info(f"No NumPy index found in {persist_dir}")
+                return None
+        else:
+            from langchain_community.vectorstores import Chroma
+
+            vectorstore = Chroma(
+                persist_directory=persist_dir,
+                embedding_function=embeddings
+            )
+        
+        logger.info(f"Loaded existing vector store from {persist_dir}")
+        return vectorstore
+        
+    except Exception as e:
+        logger.error(f"Failed to load existing vector store: {str(e)}")
+        return None
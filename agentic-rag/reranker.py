@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import metrics
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from sentence_transformers import CrossEncoder
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+RERANKER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# Small batches keep the latency budget check fine-grained; MiniLM-L6 scores
+# a batch of 8 query/chunk pairs in a few tens of milliseconds on CPU.
+RERANK_BATCH_SIZE = 8
+RERANK_CANDIDATES = 20
+RERANK_BUDGET_SECONDS = 0.15
+# Per-pair cost assumed until a batch has been timed; deliberately on the
+# slow side so the first batch after startup cannot overrun the budget
+DEFAULT_PAIR_SECONDS = 0.01
+
+# Cross-encoders are shared by every session in the process, like embeddings
+_registry: Dict[Tuple[str, str], CrossEncoder] = {}
+_failed: Dict[Tuple[str, str], str] = {}
+# Smoothed seconds per scored pair, per model, shared by every Reranker so
+# a new instance (e.g. per Streamlit rerun) starts from the measured cost
+_pair_seconds: Dict[Tuple[str, str], float] = {}
+_lock = threading.Lock()
+_cost_lock = threading.Lock()
+
+def get_cross_encoder(model_name: str = RERANKER_MODEL_NAME,
+                      device: str = "cpu") -> CrossEncoder:
+    """
+    Return the shared cross-encoder, loading it on first use.
+
+    Args:
+        model_name: Sentence-transformers cross-encoder name
+        device: Torch device to load the model on
+
+    Returns:
+        CrossEncoder instance shared across the process
+    """
+    key = (model_name, device)
+    with _lock:
+        model = _registry.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        try:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(model_name, device=device)
+        except Exception as e:
+            _failed[key] = str(e)
+            logger.error(f"Failed to load cross-encoder {model_name}: {str(e)}")
+            raise
+        _registry[key] = model
+        logger.info(f"Loaded cross-encoder {model_name} on {device} "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return model
+
+class Reranker:
+    """
+    Re-rank a retrieved candidate pool with a cross-encoder, within a budget.
+
+    Candidates are scored in batches. Before each batch the time it is
+    expected to take is checked against the latency budget, and the batch
+    is shrunk to what still fits; once nothing fits, the scored prefix is
+    re-ordered and the rest keeps its retrieval order. The per-pair cost is
+    measured per model across the process and starts at
+    DEFAULT_PAIR_SECONDS, so the first batch is checked too. While the model
+    is still loading re-ranking is skipped, so a cold start never blocks a
+    turn.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL_NAME,
+                 device: str = "cpu",
+                 candidate_k: int = RERANK_CANDIDATES,
+                 budget_seconds: float = RERANK_BUDGET_SECONDS,
+                 batch_size: int = RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.device = device
+        self.candidate_k = candidate_k
+        self.budget_seconds = budget_seconds
+        self.batch_size = max(1, batch_size)
+        self._loader: Optional[threading.Thread] = None
+        self._loader_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Load the model now, blocking until it is ready."""
+        get_cross_encoder(self.model_name, self.device)
+
+    def start_loading(self) -> None:
+        """Load the model in a background thread if it is not loaded yet."""
+        with self._loader_lock:
+            if self.ready or (self._loader is not None and self._loader.is_alive()):
+                return
+            if (self.model_name, self.device) in _failed:
+                return
+            self._loader = threading.Thread(target=self._load_quietly, daemon=True)
+            self._loader.start()
+
+    def _load_quietly(self) -> None:
+        try:
+            self.warm()
+        except Exception:
+            pass  # already logged; re-ranking stays disabled
+
+    @property
+    def ready(self) -> bool:
+        return (self.model_name, self.device) in _registry
+
+    @property
+    def pair_seconds(self) -> float:
+        """Expected seconds to score one query/chunk pair."""
+        with _cost_lock:
+            return _pair_seconds.get((self.model_name, self.device), DEFAULT_PAIR_SECONDS)
+
+    def _observe(self, pair_seconds: float) -> None:
+        key = (self.model_name, self.device)
+        with _cost_lock:
+            previous = _pair_seconds.get(key)
+            _pair_seconds[key] = (pair_seconds if previous is None
+                                  else 0.8 * previous + 0.2 * pair_seconds)
+
+    def rerank(self, query: str, docs: List[Document],
+               top_n: int = 3) -> Tuple[List[Document], bool]:
+        """
+        Re-order candidates by cross-encoder score and keep the best top_n.
+
+        Args:
+            query: User query text
+            docs: Candidates in retrieval order, best first
+            top_n: Number of documents to return
+
+        Returns:
+            Tuple of (top_n documents, whether every candidate was scored)
+        """
+        if len(docs) <= 1:
+            return docs[:top_n], True
+        if not self.ready:
+            self.start_loading()
+            metrics.inc("rerank_skipped")
+            return docs[:top_n], False
+        model = _registry[(self.model_name, self.device)]
+
+        start = time.perf_counter()
+        deadline = start + self.budget_seconds
+        scores: List[float] = []
+        with metrics.span("rerank.total"):
+            while len(scores) < len(docs):
+                batch_start = time.perf_counter()
+                fits = int((deadline - batch_start) / self.pair_seconds)
+                if fits < 1:
+                    break
+                batch = docs[len(scores):len(scores) + min(self.batch_size, fits)]
+                with metrics.span("rerank.batch"):
+                    batch_scores = model.predict(
+                        [(query, doc.page_content) for doc in batch],
+                        batch_size=len(batch),
+                        show_progress_bar=False,
+                    )
+                scores.extend(float(score) for score in batch_scores)
+                self._observe((time.perf_counter() - batch_start) / len(batch))
+
+        scored = len(scores)
+        metrics.inc("rerank_pairs_scored", scored)
+        if not scored:
+            metrics.inc("rerank_skipped")
+            return docs[:top_n], False
+        if scored < len(docs):
+            metrics.inc("rerank_truncated")
+            logger.debug(f"Re-ranked {scored}/{len(docs)} candidates within "
+                         f"{self.budget_seconds * 1000:.0f}ms budget")
+
+        order = sorted(range(scored), key=lambda i: scores[i], reverse=True)
+        ranked = [docs[i] for i in order] + docs[scored:]
+        return ranked[:top_n], scored == len(docs)
+
+def build_reranker(enabled: Optional[bool] = None) -> Optional[Reranker]:
+    """
+    Build a reranker from the environment, or None if re-ranking is off.
+
+    RERANK=on enables it; RERANK_CANDIDATES and RERANK_BUDGET_MS tune the
+    candidate pool and latency budget.
+
+    Args:
+        enabled: Override RERANK
+
+    Returns:
+        Reranker or None
+    """
+    if enabled is None:
+        enabled = os.getenv("RERANK", "off").lower() in ("1", "on", "true")
+    if not enabled:
+        return None
+    return Reranker(
+        candidate_k=int(os.getenv("RERANK_CANDIDATES", str(RERANK_CANDIDATES))),
+        budget_seconds=float(os.getenv("RERANK_BUDGET_MS",
+                                       str(RERANK_BUDGET_SECONDS * 1000))) / 1000,
+    )
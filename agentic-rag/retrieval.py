@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from context import assemble_context
+from rag_pipeline import hybrid_search, index_version
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from reranker import Reranker
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Concurrent queries arriving within the window are embedded in one batch;
+# MiniLM embeds 16 short queries on CPU in little more time than one
+QUERY_BATCH_WINDOW_SECONDS = 0.003
+QUERY_BATCH_MAX = 16
+# A caller whose batch has not come back by then embeds its query itself
+QUERY_BATCH_TIMEOUT_SECONDS = 5.0
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: lowercase, single spaces, no trailing punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+class RetrievalCache:
+    """
+    LRU/TTL cache of query embeddings and top-k results.
+
+    Results are keyed by normalized query text. With a similarity_threshold
+    a miss falls back to the cached query whose embedding is closest by
+    cosine similarity, if it is at least that close. Results are dropped
+    whenever the index version changes; query embeddings are kept because
+    they only depend on the embeddings model.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._results: "OrderedDict[str, dict]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0,
+                      "embedding_hits": 0, "invalidations": 0}
+
+    def sync_version(self, version) -> None:
+        """Drop cached results if the index changed since they were stored."""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self.stats["invalidations"] += 1
+                logger.info("Index changed, clearing retrieval cache")
+            self._results.clear()
+            self._version = version
+
+    def _expired(self, entry: dict) -> bool:
+        return time.monotonic() - entry["stored_at"] > self.ttl_seconds
+
+    def get(self, key: str, k: int) -> Optional[List[Document]]:
+        """Exact lookup; a result cached for a larger k also serves smaller k."""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or entry["k"] < k:
+                return None
+            if self._expired(entry):
+                del self._results[key]
+                return None
+            self._results.move_to_end(key)
+            self.stats["hits"] += 1
+            return list(entry["docs"][:k])
+
+    def get_similar(self, embedding: List[float], k: int) -> Optional[List[Document]]:
+        """Near-duplicate lookup by cosine similarity of normalized embeddings."""
+        if self.similarity_threshold is None:
+            return None
+        import numpy as np
+
+        with self._lock:
+            candidates = [(key, entry) for key, entry in self._results.items()
+                          if entry["k"] >= k and not self._expired(entry)]
+            if not candidates:
+                return None
+            matrix = np.asarray([entry["embedding"] for _, entry in candidates], dtype=np.float32)
+            scores = matrix @ np.asarray(embedding, dtype=np.float32)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            key, entry = candidates[best]
+            self._results.move_to_end(key)
+            self.stats["near_hits"] += 1
+            return list(entry["docs"][:k])
+
+    def put(self, key: str, k: int, embedding: List[float],
+            docs: List[Document], version) -> None:
+        """Store results unless the index changed while they were computed."""
+        with self._lock:
+            if version != self._version:
+                return
+            self._results[key] = {"k": k, "embedding": embedding,
+                                  "docs": list(docs), "stored_at": time.monotonic()}
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def get_embedding(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+                self.stats["embedding_hits"] += 1
+            return embedding
+
+    def put_embedding(self, key: str, embedding: List[float]) -> None:
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_entries:
+                self._embeddings.popitem(last=False)
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._embeddings.clear()
+
+def similarity_threshold_from_env() -> Optional[float]:
+    """
+    Near-duplicate threshold from RETRIEVAL_SIMILARITY_THRESHOLD (e.g. 0.95);
+    unset, "off" or 0 keeps the cache to exact query matches.
+    """
+    value = os.getenv("RETRIEVAL_SIMILARITY_THRESHOLD", "").strip().lower()
+    if value in ("", "off", "none"):
+        return None
+    try:
+        threshold = float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid RETRIEVAL_SIMILARITY_THRESHOLD={value!r}")
+        return None
+    return threshold if 0 < threshold <= 1 else None
+
+# One cache per index directory, search mode and near-duplicate threshold,
+# shared by every session in the process
+_shared_caches: Dict[Tuple[str, bool, bool, Optional[float]], RetrievalCache] = {}
+_shared_lock = threading.Lock()
+
+def shared_cache(persist_dir: str = "chroma_db", hybrid: bool = True,
+                 reranked: bool = False,
+                 similarity_threshold: Optional[float] = None) -> RetrievalCache:
+    """
+    Return the process-wide retrieval cache for an index directory.
+
+    Args:
+        persist_dir: Index directory
+        hybrid: Whether results come from hybrid search
+        reranked: Whether results are re-ranked
+        similarity_threshold: Cosine similarity at which a cached query
+            answers a new one (default: RETRIEVAL_SIMILARITY_THRESHOLD;
+            0 = exact matches only)
+    """
+    if similarity_threshold is None:
+        similarity_threshold = similarity_threshold_from_env()
+    elif similarity_threshold <= 0:
+        similarity_threshold = None
+    key = (persist_dir, hybrid, reranked, similarity_threshold)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = RetrievalCache(similarity_threshold=similarity_threshold)
+            _shared_caches[key] = cache
+        return cache
+
+class QueryEmbeddingBatcher:
+    """
+    Embeds concurrent queries together instead of one forward pass each.
+
+    Callers block in embed_query() while a worker thread collects queries:
+    the batch closes when max_batch_size queries are waiting or
+    window_seconds after its first query arrived, whichever comes first.
+    Queries that arrive while a batch is being embedded form the next batch
+    without further waiting. Identical texts in a batch are embedded once.
+
+    Metrics: retrieval.embed_queue_wait (time a query waited for its batch
+    to start), retrieval.embed_batch (time to embed a batch) and the
+    query_embed_batches / query_embed_batched_queries counters, whose ratio
+    is the mean batch size.
+
+    A failing batch fails each of its callers' queries, and a caller
+    waiting longer than timeout_seconds (e.g. behind a stuck batch) embeds
+    its query directly instead, so the worker can never hang a search.
+    """
+
+    def __init__(self, embeddings, window_seconds: float = QUERY_BATCH_WINDOW_SECONDS,
+                 max_batch_size: int = QUERY_BATCH_MAX,
+                 timeout_seconds: float = QUERY_BATCH_TIMEOUT_SECONDS):
+        self.embeddings = embeddings
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout_seconds = timeout_seconds
+        self._queue: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="query-embed", daemon=True)
+                self._thread.start()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed one query, batched with any concurrent ones."""
+        if self.window_seconds <= 0 or self.max_batch_size == 1:
+            return self.embeddings.embed_query(text)
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, time.perf_counter(), future))
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            metrics.inc("query_embed_batch_timeouts")
+            logger.warning(f"Query embedding batch took over {self.timeout_seconds}s, "
+                           f"embedding the query directly")
+            return self.embeddings.embed_query(text)
+
+    def _collect(self) -> List[Tuple[str, float, Future]]:
+        batch = [self._queue.get()]
+        deadline = batch[0][1] + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Tuple[str, float, Future]] = []
+            try:
+                batch = self._collect()
+                self._embed_batch(batch)
+            except Exception as e:
+                # Whatever failed, the worker lives on and no caller is left waiting
+                logger.error(f"Failed to embed a batch of {len(batch)} queries: {str(e)}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _embed_batch(self, batch: List[Tuple[str, float, Future]]) -> None:
+        start = time.perf_counter()
+        for _, enqueued, _ in batch:
+            metrics.record("retrieval.embed_queue_wait", start - enqueued)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        with metrics.span("retrieval.embed_batch"):
+            vectors = list(self.embeddings.embed_documents(texts))
+        if len(vectors) != len(texts):
+            raise ValueError(f"Embeddings returned {len(vectors)} vectors for {len(texts)} queries")
+        vectors_by_text = dict(zip(texts, vectors))
+        self.batch_sizes[len(batch)] += 1
+        metrics.inc("query_embed_batches")
+        metrics.inc("query_embed_batched_queries", len(batch))
+        for text, _, future in batch:
+            future.set_result(vectors_by_text[text])
+
+# One batcher per embeddings model, shared by every session in the process
+_batchers: Dict[int, QueryEmbeddingBatcher] = {}
+
+def shared_query_batcher(embeddings) -> Optional[QueryEmbeddingBatcher]:
+    """
+    Return the process-wide query batcher for an embeddings model.
+
+    The window comes from QUERY_BATCH_WINDOW_MS and the batch cap from
+    QUERY_BATCH_MAX; a window of 0 disables batching (returns None).
+    """
+    window_ms = float(os.getenv("QUERY_BATCH_WINDOW_MS", str(QUERY_BATCH_WINDOW_SECONDS * 1000)))
+    if window_ms <= 0:
+        return None
+    with _shared_lock:
+        batcher = _batchers.get(id(embeddings))
+        if batcher is None or batcher.embeddings is not embeddings:
+            batcher = QueryEmbeddingBatcher(embeddings, window_ms / 1000,
+                                            int(os.getenv("QUERY_BATCH_MAX", str(QUERY_BATCH_MAX))))
+            _batchers[id(embeddings)] = batcher
+        return batcher
+
+class CachedRetriever:
+    """
+    Hybrid (dense + BM25) or dense-only search with a retrieval cache in front.
+
+    With a reranker, a larger candidate pool is retrieved and re-ranked down
+    to k. Results are only cached when every candidate was re-ranked, so a
+    turn that ran out of re-ranking budget is not remembered as final.
+
+    Each search mode keeps its own shared cache, since the same query
+    returns different results in each. With a batcher, query embeddings
+    are computed together with those of concurrent searches. A
+    similarity_threshold (default: RETRIEVAL_SIMILARITY_THRESHOLD) lets a
+    cached near-duplicate query answer a new one.
+    """
+
+    def __init__(self, vectorstore, persist_dir: str = "chroma_db",
+                 cache: Optional[RetrievalCache] = None, hybrid: bool = True,
+                 reranker: Optional[Reranker] = None,
+                 batcher: Optional[QueryEmbeddingBatcher] = None,
+                 similarity_threshold: Optional[float] = None):
+        self.vectorstore = vectorstore
+        self.persist_dir = persist_dir
+        self.hybrid = hybrid
+        self.reranker = reranker
+        self.batcher = batcher
+        self.cache = (cache if cache is not None
+                      else shared_cache(persist_dir, hybrid, reranker is not None,
+                                        similarity_threshold))
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the cached embedding for repeated text."""
+        key = normalize_query(query)
+        embedding = self.cache.get_embedding(key)
+        if embedding is None:
+            with metrics.span("retrieval.embed_query"):
+                if self.batcher is not None:
+                    embedding = self.batcher.embed_query(query)
+                else:
+                    embedding = self.vectorstore.embeddings.embed_query(query)
+            self.cache.put_embedding(key, embedding)
+        else:
+            metrics.inc("query_embedding_cache_hits")
+        return embedding
+
+    def search(self, query: str, k: int = 3) -> List[Document]:
+        """
+        Return the top-k documents for a query.
+
+        Args:
+            query: User query text
+            k: Number of documents to return
+
+        Returns:
+            List of matching documents, best first
+        """
+        version = index_version(self.persist_dir)
+        self.cache.sync_version(version)
+
+        key = normalize_query(query)
+        docs = self.cache.get(key, k)
+        if docs is not None:
+            metrics.inc("retrieval_cache_hits")
+            metrics.inc("chunks_retrieved", len(docs))
+            return docs
+
+        embedding = self.embed_query(query)
+        docs = self.cache.get_similar(embedding, k)
+        if docs is not None:
+            metrics.inc("retrieval_cache_near_hits")
+            metrics.inc("chunks_retrieved", len(docs))
+            return docs
+
+        self.cache.record_miss()
+        metrics.inc("retrieval_cache_misses")
+        pool_k = max(k, self.reranker.candidate_k) if self.reranker is not None else k
+        with metrics.span("retrieval.search"):
+            if self.hybrid:
+                docs = hybrid_search(self.vectorstore, query, k=pool_k,
+                                     persist_dir=self.persist_dir, embedding=embedding)
+            else:
+                docs = self.vectorstore.similarity_search_by_vector(embedding, k=pool_k)
+
+        complete = True
+        if self.reranker is not None:
+            docs, complete = self.reranker.rerank(query, docs, k)
+        if complete:
+            self.cache.put(key, k, embedding, docs, version)
+        metrics.inc("chunks_retrieved", len(docs))
+        return docs
+
+    async def asearch(self, query: str, k: int = 3,
+                      executor: Optional[Executor] = None) -> List[Document]:
+        """
+        Async search(): exact cache hits are answered on the event loop,
+        query embedding and the searches run in an executor.
+
+        Args:
+            query: User query text
+            k: Number of documents to return
+            executor: Executor for the blocking work (default: loop's default)
+
+        Returns:
+            List of matching documents, most similar first
+        """
+        self.cache.sync_version(index_version(self.persist_dir))
+        docs = self.cache.get(normalize_query(query), k)
+        if docs is not None:
+            metrics.inc("retrieval_cache_hits")
+            metrics.inc("chunks_retrieved", len(docs))
+            return docs
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.search, query, k)
+
+async def pipelined_turns(agent, retriever: CachedRetriever, queries: Iterable[str],
+                          k: int = 3, student_profile: str = "",
+                          executor: Optional[Executor] = None
+                          ) -> AsyncIterator[Tuple[str, List[Document], str]]:
+    """
+    Answer a sequence of queries, retrieving turn N+1 while turn N generates.
+
+    Args:
+        agent: Agent exposing an async arespond()
+        retriever: Retriever used for every turn
+        queries: Queries in turn order
+        k: Number of documents to retrieve per turn
+        student_profile: Profile passed to the agent
+        executor: Executor for retrieval work
+
+    Yields:
+        Tuples of (query, retrieved documents, response) in turn order
+    """
+    queries = iter(queries)
+    query = next(queries, None)
+    if query is None:
+        return
+    pending = asyncio.ensure_future(retriever.asearch(query, k, executor))
+
+    while query is not None:
+        docs = await pending
+        next_query = next(queries, None)
+        if next_query is not None:
+            # Start the next retrieval before awaiting this turn's generation
+            pending = asyncio.ensure_future(retriever.asearch(next_query, k, executor))
+
+        response = await agent.arespond(context=assemble_context(docs), query=query,
+                                        student_profile=student_profile)
+        yield query, docs, response
+        query = next_query
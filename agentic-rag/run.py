@@ -1,171 +1,486 @@
-#!/usr/bin/env python3
-"""
-Simple runner script for the Agentic RAG project.
-Provides easy commands to run different interfaces.
-"""
-
-import sys
-import os
-import subprocess
-import argparse
-from pathlib import Path
-
-def check_requirements():
-    """Check if required packages are installed"""
-    try:
-        import streamlit
-        import google.generativeai
-        import langchain
-        return True
-    except ImportError as e:
-        print(f"❌ Missing required packages: {str(e)}")
-        print("📦 Please install requirements: pip install -r requirements.txt")
-        return False
-
-def check_env():
-    """Check if environment is properly configured"""
-    if not os.path.exists(".env"):
-        print("❌ .env file not found")
-        print("🔧 Please create a .env file with your Google API key:")
-        print("   GOOGLE_API_KEY=your_api_key_here")
-        return False
-    
-    # Load .env file to check API key
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    if not os.getenv("GOOGLE_API_KEY"):
-        print("❌ GOOGLE_API_KEY not found in .env file")
-        print("🔧 Please add your Google API key to the .env file:")
-        print("   GOOGLE_API_KEY=your_api_key_here")
-        return False
-    
-    print("✅ Environment configured correctly")
-    return True
-
-def run_streamlit():
-    """Run the Streamlit web interface"""
-    print("🚀 Starting Streamlit web interface...")
-    try:
-        subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to start Streamlit: {e}")
-        sys.exit(1)
-    except KeyboardInterrupt:
-        print("\n👋 Streamlit stopped")
-
-def run_cli():
-    """Run the command-line interface"""
-    print("🚀 Starting CLI interface...")
-    try:
-        subprocess.run([sys.executable, "main.py"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to start CLI: {e}")
-        sys.exit(1)
-    except KeyboardInterrupt:
-        print("\n👋 CLI stopped")
-
-def install_requirements():
-    """Install required packages"""
-    print("📦 Installing requirements...")
-    try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], check=True)
-        print("✅ Requirements installed successfully")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install requirements: {e}")
-        sys.exit(1)
-
-def create_sample_env():
-    """Create a sample .env file"""
-    env_content = """# Agentic RAG Configuration
-# Add your Google API key below:
-GOOGLE_API_KEY=your_google_api_key_here
-
-# Optional: Other configuration
-# LOG_LEVEL=INFO
-"""
-    
-    if os.path.exists(".env"):
-        print("⚠️  .env file already exists")
-        response = input("Do you want to overwrite it? (y/N): ")
-        if response.lower() != 'y':
-            print("❌ Operation cancelled")
-            return
-    
-    with open(".env", "w") as f:
-        f.write(env_content)
-    
-    print("✅ Sample .env file created")
-    print("🔧 Please edit the .env file and add your Google API key")
-
-def show_status():
-    """Show project status"""
-    print("📊 Agentic RAG Project Status")
-    print("=" * 40)
-    
-    # Check files
-    required_files = ["requirements.txt", "app.py", "main.py", "crew_config.py", "rag_pipeline.py"]
-    for file in required_files:
-        if os.path.exists(file):
-            print(f"✅ {file}")
-        else:
-            print(f"❌ {file}")
-    
-    # Check .env
-    if os.path.exists(".env"):
-        print("✅ .env")
-        from dotenv import load_dotenv
-        load_dotenv()
-        if os.getenv("GOOGLE_API_KEY"):
-            print("✅ Google API Key configured")
-        else:
-            print("❌ Google API Key not configured")
-    else:
-        print("❌ .env")
-    
-    # Check packages
-    print("\n📦 Package Status:")
-    packages = ["streamlit", "google-generativeai", "langchain", "chromadb", "python-dotenv"]
-    for pkg in packages:
-        try:
-            __import__(pkg.replace("-", "_"))
-            print(f"✅ {pkg}")
-        except ImportError:
-            print(f"❌ {pkg}")
-
-def main():
-    parser = argparse.ArgumentParser(description="Agentic RAG Project Runner")
-    parser.add_argument("command", nargs="?", choices=["web", "cli", "install", "setup", "status"], 
-                       help="Command to run")
-    
-    args = parser.parse_args()
-    
-    if not args.command:
-        print("🤖 Agentic RAG Assistant")
-        print("=" * 30)
-        print("Available commands:")
-        print("  web     - Start Streamlit web interface")
-        print("  cli     - Start command-line interface")
-        print("  install - Install requirements")
-        print("  setup   - Create sample .env file")
-        print("  status  - Show project status")
-        print("\nUsage: python run.py [command]")
-        return
-    
-    if args.command == "install":
-        install_requirements()
-    elif args.command == "setup":
-        create_sample_env()
-    elif args.command == "status":
-        show_status()
-    elif args.command == "web":
-        if not check_requirements() or not check_env():
-            sys.exit(1)
-        run_streamlit()
-    elif args.command == "cli":
-        if not check_requirements() or not check_env():
-            sys.exit(1)
-        run_cli()
-
-if __name__ == "__main__":
+#!/usr/bin/env python3
+"""
+Simple runner script for the Agentic RAG project.
+Provides easy commands to run different interfaces.
+"""
+
+import sys
+import os
+import json
+import subprocess
+import argparse
+from pathlib import Path
+from importlib import metadata
+
+# Distributions reported by status; detected from installed metadata so
+# nothing (torch in particular) is imported just to check it is there
+STATUS_PACKAGES = ["streamlit", "google-generativeai", "langchain", "langchain-community",
+                   "chromadb", "pypdf", "python-dotenv", "sentence-transformers", "torch", "numpy",
+                   "onnxruntime"]
+REQUIRED_PACKAGES = ["streamlit", "google-generativeai", "langchain"]
+DEFAULT_DOCUMENT = "Career_Advisor_Guide_2025.pdf"
+
+def package_version(dist):
+    """Installed version of a distribution, or None if it is not installed"""
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return None
+
+def check_requirements():
+    """Check if required packages are installed"""
+    missing = [pkg for pkg in REQUIRED_PACKAGES if package_version(pkg) is None]
+    if missing:
+        print(f"❌ Missing required packages: {', '.join(missing)}")
+        print("📦 Please install requirements: pip install -r requirements.txt")
+        return False
+    return True
+
+def check_env():
+    """Check if environment is properly configured"""
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "local":
+        print("✅ Using local LLM backend (no API key needed)")
+        return True
+    
+    if not os.path.exists(".env"):
+        print("❌ .env file not found")
+        print("🔧 Please create a .env file with your Google API key:")
+        print("   GOOGLE_API_KEY=your_api_key_here")
+        return False
+    
+    # Load .env file to check API key
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "local":
+        print("✅ Using local LLM backend (no API key needed)")
+        return True
+    
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("❌ GOOGLE_API_KEY not found in .env file")
+        print("🔧 Please add your Google API key to the .env file:")
+        print("   GOOGLE_API_KEY=your_api_key_here")
+        return False
+    
+    print("✅ Environment configured correctly")
+    return True
+
+def run_streamlit():
+    """Run the Streamlit web interface"""
+    print("🚀 Starting Streamlit web interface...")
+    try:
+        subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to start Streamlit: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 Streamlit stopped")
+
+def run_cli():
+    """Run the command-line interface"""
+    print("🚀 Starting CLI interface...")
+    try:
+        subprocess.run([sys.executable, "main.py"], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to start CLI: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 CLI stopped")
+
+def run_server(host="127.0.0.1", port=8000, max_concurrent=8):
+    """Run the headless JSON HTTP API"""
+    print("🚀 Starting HTTP API...")
+    try:
+        subprocess.run([sys.executable, "server.py", "--host", host, "--port", str(port),
+                        "--max-concurrent", str(max_concurrent)], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to start server: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+
+def run_bench(extra_args):
+    """Run the benchmark suite, passing extra options through to bench.py"""
+    print("⏱️  Running benchmarks...")
+    try:
+        subprocess.run([sys.executable, "bench.py", *extra_args], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 Benchmark stopped")
+
+def install_requirements():
+    """Install required packages"""
+    print("📦 Installing requirements...")
+    try:
+        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], check=True)
+        print("✅ Requirements installed successfully")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to install requirements: {e}")
+        sys.exit(1)
+
+def run_ingest(target, workers=4):
+    """Bulk-ingest a directory or glob of PDFs into the shared vector store"""
+    if not target:
+        print("❌ Please give a directory or glob of PDFs: python run.py ingest <path>")
+        sys.exit(1)
+    
+    print(f"📚 Ingesting PDFs from {target} with {workers} workers...")
+    try:
+        from rag_pipeline import build_corpus
+        _, report = build_corpus(target, max_workers=workers)
+    except ImportError as e:
+        print(f"❌ Missing required packages: {str(e)}")
+        print("📦 Please install requirements: pip install -r requirements.txt")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+    
+    print(f"\n{'Document':40} {'Pages':>6} {'Chunks':>7} {'New':>6} {'Embed s':>8} {'Total s':>8}")
+    for stats in report["documents"]:
+        name = os.path.basename(stats["source"])[:40]
+        if stats["skipped"]:
+            print(f"{name:40} {'-':>6} {stats['chunks']:>7} {'-':>6} {'-':>8} {'(current)':>8}")
+        else:
+            print(f"{name:40} {stats['pages']:>6} {stats['chunks']:>7} {stats['embedded']:>6} "
+                  f"{stats['embed_seconds']:>8.2f} {stats['seconds']:>8.2f}")
+    for failure in report["failed"]:
+        print(f"❌ {failure['source']}: {failure['error']}")
+    
+    print(f"\n✅ {len(report['documents'])} documents in {report['total_seconds']:.1f}s "
+          f"({report['docs_per_sec']:.2f} docs/sec, {report['chunks_per_sec']:.1f} chunks/sec)")
+    if report["failed"]:
+        sys.exit(1)
+
+def run_compact(persist_dir=None, dtype="int8", queries=200, rescore=50):
+    """Write compact vectors into the NumPy index and report their size and recall"""
+    persist_dir = persist_dir or "chroma_db"
+    if not os.path.isdir(persist_dir):
+        print(f"❌ No vector store at {persist_dir}; run python run.py ingest <path> first")
+        sys.exit(1)
+    
+    try:
+        import numpy as np
+        from rag_pipeline import get_embeddings
+        from vector_index import NumpyVectorStore, evaluate_compression
+    except ImportError as e:
+        print(f"❌ Missing required packages: {str(e)}")
+        print("📦 Please install requirements: pip install -r requirements.txt")
+        sys.exit(1)
+    
+    # Compact vectors are served by the NumPy backend; ingesting with it
+    # copies existing Chroma vectors over without re-embedding
+    vectorstore = NumpyVectorStore.load(persist_dir, dtype=dtype)
+    if vectorstore is None:
+        print(f"❌ No NumPy index in {persist_dir}; run "
+              f"VECTOR_BACKEND=numpy python run.py ingest <path> first")
+        sys.exit(1)
+    if not len(vectorstore):
+        print("⚠️  The vector store is empty")
+        return
+    print(f"🗜️  Writing {dtype} vectors for {persist_dir}...")
+    vectorstore.persist()
+    
+    # Queries are the opening words of sampled chunks: short, like real
+    # questions, and with a known relevant chunk in the collection
+    data = vectorstore.get(include=["documents", "embeddings"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    snippets = [" ".join(data["documents"][i].split()[:12]) for i in sample]
+    query_vectors = np.asarray(get_embeddings().embed_documents(snippets), dtype=np.float32)
+    
+    ks = [k for k in (1, 3, 5, 10) if k <= len(vectors)]
+    report = evaluate_compression(vectors, query_vectors, ("float16", "int8"), ks, rescore)
+    print(f"\n{len(vectors)} vectors x {vectors.shape[1]} dims, {len(snippets)} queries, "
+          f"re-scoring top {rescore}")
+    print(f"{'Serving':8} {'RAM B/vec':>9} {'Ratio':>6} {'Max error':>9} {'Search ms':>9}  "
+          + "  ".join(f"{'R@' + str(k):>11}" for k in ks))
+    for name, row in report.items():
+        recall = "  ".join(f"{row['recall_coarse'][str(k)]:.3f}/{row['recall'][str(k)]:.3f}" for k in ks)
+        print(f"{name:8} {row['bytes_per_vector']:>9} {row['compression']:>5.1f}x "
+              f"{row['roundtrip_error']:>9.1e} {row['search_ms']:>9.2f}  {recall}")
+    print("\nRecall is coarse/re-scored against exact float32 search; float32 rows stay "
+          "memory-mapped on disk and are read only to re-score candidates")
+    print(f"✅ {dtype} vectors ({vectorstore.bytes_per_vector * len(vectorstore) / 1e6:.1f} MB "
+          f"in RAM) written to {os.path.join(persist_dir, 'numpy_index')}")
+    print(f"   Serve them with VECTOR_BACKEND=numpy COMPACT_VECTORS={dtype}")
+
+def run_onnx():
+    """Export the embedding model to ONNX and compare it with the torch backend"""
+    try:
+        from embeddings import onnx_model_dir
+        from onnx_embeddings import compare_backends, export_onnx_model, read_export_info
+    except ImportError as e:
+        print(f"❌ Missing required packages: {str(e)}")
+        print("📦 Please install requirements: pip install -r requirements.txt")
+        sys.exit(1)
+    
+    info = read_export_info(onnx_model_dir())
+    if info is None:
+        print("📦 Exporting the embedding model to ONNX (needs torch once)...")
+        try:
+            export_onnx_model()
+        except (ImportError, ValueError) as e:
+            print(f"❌ Export failed: {str(e)}")
+            sys.exit(1)
+        info = read_export_info(onnx_model_dir())
+    for graph, report in info["validation"].items():
+        recall = (f", recall@{report['k']} on a torch-built index {report['recall_at_k']:.3f}"
+                  if "recall_at_k" in report else "")
+        print(f"{'✅' if report['passed'] else '❌'} {graph} graph vs torch: "
+              f"min cosine {report['min_cosine']:.5f}, max abs diff {report['max_abs_diff']:.5f}{recall}")
+    
+    print("\n⏱️  Measuring each backend in a fresh process...")
+    try:
+        results = compare_backends()
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Measurement failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+        sys.exit(1)
+    print(f"\n{'Backend':8} {'Startup s':>9} {'RSS MB':>7} {'+RSS MB':>8} {'Query p50 ms':>13} {'Chunks/s':>9}")
+    for backend, row in results.items():
+        delta = row["rss_delta_bytes"]
+        print(f"{backend:8} {row['startup_seconds']:>9.2f} {(row['rss_bytes'] or 0) / 1e6:>7.0f} "
+              f"{(delta or 0) / 1e6:>8.0f} {row['query_p50_ms']:>13.2f} {row['chunks_per_sec']:>9.1f}")
+    agreement = results["onnx"]["agreement"]
+    print(f"\nONNX vs torch vectors: min cosine {agreement['min_cosine']:.5f}, "
+          f"mean {agreement['mean_cosine']:.5f}")
+    print("✅ Set EMBEDDING_BACKEND=onnx to use it for ingestion and queries")
+
+def create_sample_env():
+    """Create a sample .env file"""
+    env_content = """# Agentic RAG Configuration
+# Add your Google API key below:
+GOOGLE_API_KEY=your_google_api_key_here
+
+# Optional: Other configuration
+# LOG_LEVEL=INFO
+"""
+    
+    if os.path.exists(".env"):
+        print("⚠️  .env file already exists")
+        response = input("Do you want to overwrite it? (y/N): ")
+        if response.lower() != 'y':
+            print("❌ Operation cancelled")
+            return
+    
+    with open(".env", "w") as f:
+        f.write(env_content)
+    
+    print("✅ Sample .env file created")
+    print("🔧 Please edit the .env file and add your Google API key")
+
+def collect_status(persist_dir="chroma_db"):
+    """Gather project status from files and metadata only, without heavy imports"""
+    from embeddings import EMBEDDING_MODEL_NAME, model_cache_path, onnx_model_exported
+    from rag_pipeline import compact_dtype, index_is_current, read_index_manifest, vector_backend
+    
+    required_files = ["requirements.txt", "app.py", "main.py", "server.py", "crew_config.py", "rag_pipeline.py"]
+    
+    env_file = os.path.exists(".env")
+    if env_file:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+    llm_backend = os.getenv("LLM_BACKEND", "gemini").lower()
+    
+    # A bad setting is reported as a problem instead of failing the status run
+    config_errors = []
+    try:
+        backend = vector_backend()
+    except ValueError as e:
+        backend = None
+        config_errors.append(str(e))
+    if backend is not None:
+        try:
+            compact_dtype(backend=backend)
+        except ValueError as e:
+            config_errors.append(str(e))
+    
+    manifest = read_index_manifest(persist_dir)
+    default_entry = manifest["sources"].get(os.path.abspath(DEFAULT_DOCUMENT), {})
+    model_path = model_cache_path()
+    
+    return {
+        "files": {file: os.path.exists(file) for file in required_files},
+        "env": {
+            "env_file": env_file,
+            "api_key": bool(os.getenv("GOOGLE_API_KEY")),
+            "llm_backend": llm_backend,
+            "config_errors": config_errors,
+        },
+        "packages": {pkg: package_version(pkg) for pkg in STATUS_PACKAGES},
+        "index": {
+            "persist_dir": persist_dir,
+            "backend": backend,
+            "exists": os.path.isdir(persist_dir),
+            "documents": len(manifest["sources"]),
+            "chunks": sum(len(entry.get("chunk_ids", [])) for entry in manifest["sources"].values()),
+            "default_document": DEFAULT_DOCUMENT,
+            "default_document_exists": os.path.exists(DEFAULT_DOCUMENT),
+            "default_document_current": index_is_current(DEFAULT_DOCUMENT, persist_dir=persist_dir),
+            "indexed_at": default_entry.get("indexed_at"),
+        },
+        "embedding_model": {
+            "name": EMBEDDING_MODEL_NAME,
+            "cached": model_path is not None,
+            "path": model_path,
+            "backend": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+            "onnx_exported": onnx_model_exported(),
+        },
+    }
+
+def status_problems(status):
+    """Preflight failures that would stop the app from starting"""
+    problems = [f"missing file: {file}" for file, present in status["files"].items() if not present]
+    problems += [f"missing package: {pkg}" for pkg in REQUIRED_PACKAGES
+                 if status["packages"].get(pkg) is None]
+    if status["env"]["llm_backend"] == "gemini" and not status["env"]["api_key"]:
+        problems.append("GOOGLE_API_KEY not configured")
+    problems += [f"invalid configuration: {error}" for error in status["env"]["config_errors"]]
+    model = status["embedding_model"]
+    if model["backend"] == "onnx" and not model["onnx_exported"]:
+        problems.append("EMBEDDING_BACKEND=onnx but the model is not exported (python run.py onnx)")
+    return problems
+
+def show_status(as_json=False):
+    """Show project status"""
+    status = collect_status()
+    if as_json:
+        print(json.dumps(status, indent=2))
+        return
+    
+    print("📊 Agentic RAG Project Status")
+    print("=" * 40)
+    
+    # Check files
+    for file, present in status["files"].items():
+        print(f"{'✅' if present else '❌'} {file}")
+    
+    # Check .env
+    env = status["env"]
+    print(f"{'✅' if env['env_file'] else '❌'} .env")
+    if env["llm_backend"] == "local":
+        print("✅ Local LLM backend (no API key needed)")
+    elif env["api_key"]:
+        print("✅ Google API Key configured")
+    else:
+        print("❌ Google API Key not configured")
+    for error in env["config_errors"]:
+        print(f"❌ {error}")
+    
+    # Check packages
+    print("\n📦 Package Status:")
+    for pkg, version in status["packages"].items():
+        print(f"✅ {pkg} {version}" if version else f"❌ {pkg}")
+    
+    # Check index and model cache
+    index = status["index"]
+    print("\n📚 Index Status:")
+    print(f"{'✅' if index['exists'] else '❌'} {index['persist_dir']} "
+          f"({index['documents']} documents, {index['chunks']} chunks, "
+          f"{index['backend'] or 'unknown'} backend)")
+    if not index["default_document_exists"]:
+        print(f"⚠️  {index['default_document']} not found")
+    elif index["default_document_current"]:
+        print(f"✅ {index['default_document']} indexed and current ({index['indexed_at']})")
+    else:
+        print(f"⚠️  {index['default_document']} not indexed or changed since indexing")
+    model = status["embedding_model"]
+    print(f"{'✅' if model['cached'] else '⚠️ '} {model['name']} "
+          f"{'cached' if model['cached'] else 'not downloaded yet'}")
+    if model["backend"] == "onnx":
+        print(f"{'✅' if model['onnx_exported'] else '⚠️ '} ONNX embedding backend "
+              f"{'exported' if model['onnx_exported'] else 'not exported yet (python run.py onnx)'}")
+
+def run_check(as_json=False):
+    """Fast preflight for health checks: exit 0 if the app can start, 1 otherwise"""
+    status = collect_status()
+    problems = status_problems(status)
+    if as_json:
+        print(json.dumps({"ok": not problems, "problems": problems,
+                          "index_current": status["index"]["default_document_current"],
+                          "model_cached": status["embedding_model"]["cached"]}))
+    elif problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+    else:
+        print("✅ Preflight checks passed")
+    sys.exit(1 if problems else 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG Project Runner")
+    parser.add_argument("command", nargs="?", choices=["web", "cli", "serve", "install", "setup", "status", "check", "ingest", "bench", "compact", "onnx"], 
+                       help="Command to run")
+    parser.add_argument("target", nargs="?",
+                       help="Directory or glob of PDFs (ingest) or vector store directory (compact)")
+    parser.add_argument("--workers", type=int, default=4,
+                       help="Documents ingested concurrently (ingest)")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="int8",
+                       help="Compact vectors served from RAM (compact)")
+    parser.add_argument("--host", default="127.0.0.1",
+                       help="Interface to bind (serve)")
+    parser.add_argument("--port", type=int, default=8000,
+                       help="Port to listen on (serve)")
+    parser.add_argument("--max-concurrent", type=int, default=8,
+                       help="Requests handled at once (serve)")
+    parser.add_argument("--json", action="store_true",
+                       help="Machine-readable output (status, check)")
+    
+    args, extra_args = parser.parse_known_args()
+    if extra_args and args.command != "bench":
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+    
+    if not args.command:
+        print("🤖 Agentic RAG Assistant")
+        print("=" * 30)
+        print("Available commands:")
+        print("  web     - Start Streamlit web interface")
+        print("  cli     - Start command-line interface")
+        print("  serve   - Start the JSON HTTP API")
+        print("  install - Install requirements")
+        print("  setup   - Create sample .env file")
+        print("  status  - Show project status")
+        print("  check   - Fast preflight check for health probes")
+        print("  ingest  - Ingest a directory or glob of PDFs")
+        print("  bench   - Benchmark ingestion, retrieval and turns")
+        print("  compact - Write int8/float16 serving vectors and report recall")
+        print("  onnx    - Export the ONNX embedding model and compare with torch")
+        print("\nUsage: python run.py [command]")
+        return
+    
+    if args.command == "install":
+        install_requirements()
+    elif args.command == "setup":
+        create_sample_env()
+    elif args.command == "status":
+        show_status(as_json=args.json)
+    elif args.command == "check":
+        run_check(as_json=args.json)
+    elif args.command == "ingest":
+        run_ingest(args.target, workers=args.workers)
+    elif args.command == "bench":
+        run_bench(extra_args)
+    elif args.command == "compact":
+        run_compact(args.target, dtype=args.dtype)
+    elif args.command == "onnx":
+        run_onnx()
+    elif args.command == "web":
+        if not check_requirements() or not check_env():
+            sys.exit(1)
+        run_streamlit()
+    elif args.command == "cli":
+        if not check_requirements() or not check_env():
+            sys.exit(1)
+        run_cli()
+    elif args.command == "serve":
+        if not check_requirements() or not check_env():
+            sys.exit(1)
+        run_server(args.host, args.port, args.max_concurrent)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Headless JSON HTTP API for the Agentic RAG assistant.
+
+The vector store, embeddings model and agent are loaded once and shared by
+every request. Endpoints:
+
+    GET  /health   - liveness, 200 as soon as the process is up
+    GET  /ready    - readiness, 200 only once the index is warm
+    GET  /metrics  - per-stage timings and counters, Prometheus text format
+    POST /chat     - {"query": str, "k": int, "student_profile": str}; 502 with an
+                     "error" field if the LLM backend fails
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from dotenv import load_dotenv
+
+import metrics
+from context import assemble_context
+from crew_config import GenerationError
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+MAX_BODY_BYTES = 64 * 1024
+
+class RAGService:
+    """Shared retrieve + respond state behind the HTTP handlers."""
+
+    def __init__(self, pdf_path: str = "Career_Advisor_Guide_2025.pdf",
+                 persist_dir: str = "chroma_db", max_concurrent: int = 8):
+        self.pdf_path = pdf_path
+        self.persist_dir = persist_dir
+        self.agent = None
+        self.retriever = None
+        self.web_searcher = None
+        self.error: Optional[str] = None
+        self.ready = threading.Event()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def warm(self) -> None:
+        """Load the agent, index and embeddings model, then mark the service ready."""
+        try:
+            from crew_config import build_agent
+            from rag_pipeline import build_vector_store, load_existing_vector_store
+            from reranker import build_reranker
+            from retrieval import CachedRetriever, shared_query_batcher
+            from web_search import build_web_searcher
+
+            self.agent = build_agent()
+            try:
+                self.web_searcher = build_web_searcher()
+            except ValueError as e:
+                # Serve without web results rather than not at all
+                logger.warning(f"Web search disabled, invalid configuration: {str(e)}")
+
+            if os.path.exists(self.pdf_path):
+                # Costs a manifest lookup when the persisted index is current
+                vectorstore = build_vector_store(self.pdf_path, persist_dir=self.persist_dir)
+            else:
+                vectorstore = load_existing_vector_store(self.persist_dir)
+
+            if vectorstore is not None:
+                reranker = build_reranker()
+                if reranker is not None:
+                    reranker.start_loading()
+                self.retriever = CachedRetriever(vectorstore, persist_dir=self.persist_dir,
+                                                 reranker=reranker,
+                                                 batcher=shared_query_batcher(vectorstore.embeddings))
+                # Run one query so model weights and the index are paged in
+                vectorstore.similarity_search("warmup", k=1)
+            else:
+                logger.warning("No index available, serving without RAG context")
+
+            self.ready.set()
+            logger.info("Service is warm and ready")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Service warmup failed: {str(e)}")
+
+    def try_acquire(self) -> bool:
+        return self._slots.acquire(blocking=False)
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def answer(self, query: str, k: int = 3, student_profile: str = "") -> dict:
+        """Retrieve context for a query and generate the response."""
+        timings = {}
+        docs = []
+        start = time.perf_counter()
+        # Started first so the web round trip overlaps vector retrieval
+        pending_web = self.web_searcher.start(query) if self.web_searcher is not None else None
+        if self.retriever is not None:
+            docs = self.retriever.search(query, k=k)
+        timings["retrieval_seconds"] = time.perf_counter() - start
+        if pending_web is not None:
+            start = time.perf_counter()
+            docs = docs + pending_web.result()
+            timings["web_wait_seconds"] = time.perf_counter() - start
+
+        context = assemble_context(docs)
+        start = time.perf_counter()
+        # Raises GenerationError instead of returning an apology as the answer
+        response = self.agent.respond(context=context, query=query,
+                                      student_profile=student_profile, raise_errors=True)
+        timings["generation_seconds"] = time.perf_counter() - start
+        metrics.record("turn.total", sum(timings.values()))
+
+        return {
+            "response": response,
+            "context": [{"content": d.page_content, "metadata": d.metadata} for d in docs],
+            "timings": timings,
+        }
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AgenticRAG/1.0"
+
+    @property
+    def service(self) -> RAGService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status: int, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_text(200, metrics.render_prometheus())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/ready":
+            if self.service.ready.is_set():
+                self._send_json(200, {"status": "ready",
+                                      "rag": self.service.retriever is not None})
+            else:
+                self._send_json(503, {"status": "failed" if self.service.error else "warming",
+                                      "error": self.service.error})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/chat":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        if not self.service.ready.is_set():
+            self._send_json(503, {"error": "Service is not ready"}, {"Retry-After": "1"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY_BYTES:
+                self._send_json(413, {"error": "Request body too large"})
+                return
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            query = str(payload.get("query", "")).strip()
+            k = int(payload.get("k", 3))
+            student_profile = str(payload.get("student_profile", ""))
+        except (ValueError, TypeError, AttributeError):
+            self._send_json(400, {"error": "Body must be a JSON object"})
+            return
+        if not query:
+            self._send_json(400, {"error": "Missing 'query'"})
+            return
+        if not 1 <= k <= 10:
+            self._send_json(400, {"error": "'k' must be between 1 and 10"})
+            return
+
+        if not self.service.try_acquire():
+            self._send_json(503, {"error": "Too many concurrent requests"}, {"Retry-After": "1"})
+            return
+        try:
+            self._send_json(200, self.service.answer(query, k, student_profile))
+        except GenerationError as e:
+            metrics.inc("chat_generation_errors")
+            self._send_json(502, {"error": f"LLM backend failed: {str(e)}"})
+        except Exception as e:
+            logger.error(f"Request failed: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+        finally:
+            self.service.release()
+
+def serve(host: str = "127.0.0.1", port: int = 8000, max_concurrent: int = 8,
+          pdf_path: str = "Career_Advisor_Guide_2025.pdf",
+          persist_dir: str = "chroma_db") -> None:
+    """Start the HTTP API; /ready turns green once the background warmup ends."""
+    service = RAGService(pdf_path, persist_dir, max_concurrent)
+    httpd = ThreadingHTTPServer((host, port), RAGRequestHandler)
+    httpd.daemon_threads = True
+    httpd.service = service
+
+    threading.Thread(target=service.warm, name="warmup", daemon=True).start()
+    metrics.start_json_dump_from_env()
+    print(f"🚀 Serving on http://{host}:{port} (max {max_concurrent} concurrent requests)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrent", type=int, default=8,
+                        help="Requests handled at once; extra requests get 503")
+    parser.add_argument("--pdf", default="Career_Advisor_Guide_2025.pdf",
+                        help="Document indexed at startup")
+    parser.add_argument("--persist-dir", default="chroma_db")
+    args = parser.parse_args()
+
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "gemini" and not os.getenv("GOOGLE_API_KEY"):
+        print("❌ Error: GOOGLE_API_KEY not found in environment variables.")
+        sys.exit(1)
+
+    serve(args.host, args.port, args.max_concurrent, args.pdf, args.persist_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from rag_pipeline import build_vector_store, index_is_current
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+UPLOAD_ROOT = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_TTL_SECONDS = float(os.getenv("UPLOAD_TTL_HOURS", "24")) * 3600
+DOCUMENT_FILENAME = "document.pdf"
+LAST_USED_FILENAME = ".last_used"
+INCOMING_DIRNAME = ".incoming"
+GC_INTERVAL_SECONDS = 600
+COPY_BLOCK_BYTES = 1024 * 1024
+
+# Per-document locks: a short one guarding the stored file against garbage
+# collection, and one held while indexing so concurrent uploads of the same
+# PDF embed it once
+_file_locks: Dict[str, threading.Lock] = {}
+_build_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+_last_gc = 0.0
+
+def _doc_lock(locks: Dict[str, threading.Lock], doc_hash: str) -> threading.Lock:
+    with _locks_lock:
+        lock = locks.get(doc_hash)
+        if lock is None:
+            lock = threading.Lock()
+            locks[doc_hash] = lock
+        return lock
+
+def document_dir(doc_hash: str, upload_root: str = UPLOAD_ROOT) -> str:
+    """Directory holding an uploaded PDF and its own vector store."""
+    return os.path.join(upload_root, doc_hash)
+
+def stage_upload(fileobj: BinaryIO, upload_root: str = UPLOAD_ROOT) -> Tuple[str, str]:
+    """
+    Stream an uploaded file into the shared upload store, hashing as it goes.
+
+    The file is written once to a private temp file and then moved to a
+    path named after its content hash, so identical uploads share one copy.
+
+    Args:
+        fileobj: Readable binary file object (e.g. a Streamlit UploadedFile)
+        upload_root: Root directory for uploaded documents
+
+    Returns:
+        Tuple of (content hash, path of the stored PDF)
+
+    Raises:
+        ValueError: If the file is empty or not a PDF
+    """
+    incoming = os.path.join(upload_root, INCOMING_DIRNAME)
+    os.makedirs(incoming, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=incoming, suffix=".pdf", delete=False) as tmp:
+        tmp_path = tmp.name
+        try:
+            for block in iter(lambda: fileobj.read(COPY_BLOCK_BYTES), b""):
+                if not size and not block.startswith(b"%PDF-"):
+                    raise ValueError("Uploaded file is not a PDF")
+                digest.update(block)
+                tmp.write(block)
+                size += len(block)
+        except Exception:
+            tmp.close()
+            os.remove(tmp_path)
+            raise
+    if not size:
+        os.remove(tmp_path)
+        raise ValueError("Uploaded file is empty")
+
+    doc_hash = digest.hexdigest()
+    doc_dir = document_dir(doc_hash, upload_root)
+    pdf_path = os.path.join(doc_dir, DOCUMENT_FILENAME)
+    with _doc_lock(_file_locks, doc_hash):
+        if os.path.exists(pdf_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(doc_dir, exist_ok=True)
+            os.replace(tmp_path, pdf_path)
+        # Counts as use, so garbage collection cannot race the indexing
+        touch_upload(doc_dir)
+    logger.info(f"Staged upload {doc_hash[:12]} ({size} bytes) at {pdf_path}")
+    return doc_hash, pdf_path
+
+def touch_upload(persist_dir: str) -> None:
+    """Mark an uploaded document as in use so garbage collection keeps it."""
+    try:
+        with open(os.path.join(persist_dir, LAST_USED_FILENAME), "a"):
+            pass
+        os.utime(os.path.join(persist_dir, LAST_USED_FILENAME))
+    except OSError as e:
+        logger.warning(f"Could not mark {persist_dir} as used: {str(e)}")
+
+def _last_used(path: str) -> float:
+    try:
+        return os.stat(os.path.join(path, LAST_USED_FILENAME)).st_mtime
+    except OSError:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return 0.0
+
+def collect_garbage(upload_root: str = UPLOAD_ROOT,
+                    ttl_seconds: float = UPLOAD_TTL_SECONDS) -> List[str]:
+    """
+    Delete uploaded documents and stale temp files unused for ttl_seconds.
+
+    Documents that are being indexed right now are never deleted.
+
+    Args:
+        upload_root: Root directory for uploaded documents
+        ttl_seconds: Idle time after which a document is removed
+
+    Returns:
+        List of removed paths
+    """
+    global _last_gc
+    _last_gc = time.time()
+    if not os.path.isdir(upload_root):
+        return []
+
+    cutoff = time.time() - ttl_seconds
+    removed = []
+    incoming = os.path.join(upload_root, INCOMING_DIRNAME)
+    if os.path.isdir(incoming):
+        for name in os.listdir(incoming):
+            path = os.path.join(incoming, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed.append(path)
+            except OSError:
+                pass
+
+    for name in os.listdir(upload_root):
+        path = os.path.join(upload_root, name)
+        if name == INCOMING_DIRNAME or not os.path.isdir(path):
+            continue
+        if _last_used(path) >= cutoff:
+            continue
+        file_lock = _doc_lock(_file_locks, name)
+        build_lock = _doc_lock(_build_locks, name)
+        if not file_lock.acquire(blocking=False):
+            continue
+        try:
+            if not build_lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(path)
+            finally:
+                build_lock.release()
+        finally:
+            file_lock.release()
+
+    if removed:
+        logger.info(f"Removed {len(removed)} expired uploads from {upload_root}")
+    return removed
+
+def maybe_collect_garbage(upload_root: str = UPLOAD_ROOT,
+                          ttl_seconds: float = UPLOAD_TTL_SECONDS) -> None:
+    """Run collect_garbage() if it has not run in the last GC_INTERVAL_SECONDS."""
+    if time.time() - _last_gc >= GC_INTERVAL_SECONDS:
+        try:
+            collect_garbage(upload_root, ttl_seconds)
+        except OSError as e:
+            logger.warning(f"Upload garbage collection failed: {str(e)}")
+
+def index_upload(doc_hash: str, pdf_path: str, filename: str = "",
+                 progress: Optional[Callable[[dict], None]] = None) -> Tuple[Chroma, dict]:
+    """
+    Index a staged upload into its own collection.
+
+    Args:
+        doc_hash: Content hash returned by stage_upload
+        pdf_path: Stored PDF path returned by stage_upload
+        filename: Original file name, for display
+        progress: Passed to build_vector_store for page/chunk progress
+
+    Returns:
+        Tuple of the Chroma vector store and a dict with doc_hash,
+        persist_dir, pdf_path, filename and reused (already indexed)
+    """
+    persist_dir = os.path.dirname(pdf_path)
+    # Holding the document lock makes a concurrent upload of the same PDF
+    # wait and then take the manifest fast path instead of embedding again
+    with _doc_lock(_build_locks, doc_hash):
+        reused = index_is_current(pdf_path, persist_dir=persist_dir)
+        vectorstore = build_vector_store(pdf_path, persist_dir=persist_dir,
+                                         progress=progress)
+        touch_upload(persist_dir)
+
+    info = {
+        "doc_hash": doc_hash,
+        "persist_dir": persist_dir,
+        "pdf_path": pdf_path,
+        "filename": filename or DOCUMENT_FILENAME,
+        "reused": reused,
+    }
+    logger.info(f"Upload {info['filename']} -> {persist_dir} "
+                f"({'reused existing index' if reused else 'indexed'})")
+    return vectorstore, info
+
+def open_upload(fileobj: BinaryIO, filename: str = "",
+                upload_root: str = UPLOAD_ROOT,
+                ttl_seconds: float = UPLOAD_TTL_SECONDS) -> Tuple[Chroma, dict]:
+    """
+    Index an uploaded PDF into its own collection, shared by identical uploads.
+
+    Each distinct PDF gets a vector store keyed by its content hash, so
+    sessions never see each other's documents unless they uploaded the same
+    file, and a PDF uploaded by many users is embedded once.
+
+    Args:
+        fileobj: Readable binary file object
+        filename: Original file name, for display
+        upload_root: Root directory for uploaded documents
+        ttl_seconds: Idle time after which uploads are garbage-collected
+
+    Returns:
+        Same as index_upload()
+
+    Raises:
+        ValueError: If the file is empty or not a PDF
+    """
+    maybe_collect_garbage(upload_root, ttl_seconds)
+    doc_hash, pdf_path = stage_upload(fileobj, upload_root)
+    return index_upload(doc_hash, pdf_path, filename)
@@ -0,0 +1,593 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+COMPACT_DTYPES = ("float32", "float16", "int8")
+# Candidates re-scored against their float32 rows; on MiniLM vectors 50
+# brings int8 recall@10 back to within a fraction of a percent of float32
+RESCORE_CANDIDATES = 50
+# Rows of codes converted and scored per block, so a scan never holds a
+# float32 copy of the matrix; small blocks stay in cache (int8 scans about
+# as fast as the float32 product)
+SCAN_BLOCK_ROWS = 1024
+NUMPY_INDEX_DIRNAME = "numpy_index"
+NUMPY_INDEX_VERSION = 1
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress float32 vectors to float16 or int8.
+
+    int8 uses symmetric per-vector scaling: each row is divided by
+    max(|row|) / 127 and rounded, and the scale is kept to dequantize.
+
+    Args:
+        vectors: (n, dim) float array
+        dtype: "float32", "float16" or "int8"
+
+    Returns:
+        Tuple of (codes, per-row float32 scales or None)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype: {dtype} (expected one of {', '.join(COMPACT_DTYPES)})")
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """Inverse of quantize(), as float32."""
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+def _top_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k highest scores per row, best first."""
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+def _recall(truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    """Mean share of each row's true top-k found in its top-k."""
+    if not len(truth):
+        return 0.0
+    return float(np.mean([len(set(expected[:k]) & set(row[:k])) / k
+                          for expected, row in zip(truth.tolist(), found.tolist())]))
+
+def evaluate_compression(vectors: np.ndarray, queries: np.ndarray,
+                         dtypes: Sequence[str] = ("float16", "int8"),
+                         ks: Sequence[int] = (1, 3, 5, 10),
+                         rescore_k: int = RESCORE_CANDIDATES) -> Dict[str, dict]:
+    """
+    Compare compact serving against exact float32 search.
+
+    Every dtype is served by a NumpyVectorStore through the same search
+    path as a persisted index: a scan of the codes held in RAM, then the
+    top rescore_k candidates re-scored against their float32 rows. Recall@k
+    is the share of the exact float32 top-k that the store returns in its
+    own top-k, averaged over the queries, with and without re-scoring.
+
+    Args:
+        vectors: (n, dim) float32 corpus vectors
+        queries: (m, dim) float32 query vectors
+        dtypes: Compact dtypes to evaluate
+        ks: Values of k for recall@k
+        rescore_k: Candidates re-scored exactly
+
+    Returns:
+        Dict keyed by dtype (plus "float32") with the vector bytes held in
+        RAM per chunk, compression ratio, largest quantize/dequantize
+        round-trip error, recall@k (coarse and rescored) and mean search
+        ms per query
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    ids = [str(i) for i in range(len(vectors))]
+    max_k = max(ks)
+    report: Dict[str, dict] = {}
+    exact = None
+    for dtype in ("float32", *dtypes):
+        store = NumpyVectorStore(dtype=dtype, rescore_k=rescore_k)
+        store.upsert(ids, vectors, [{} for _ in ids], ["" for _ in ids])
+        # The first search quantizes the matrix; keep that out of the timing
+        store.search_vectors(queries[:1], max_k)
+        start = time.perf_counter()
+        rows = [store.search_vectors(query, max_k)[0][0] for query in queries]
+        search_seconds = time.perf_counter() - start
+        rows = np.asarray(rows).reshape(len(queries), -1)
+        if exact is None:
+            exact = rows
+        store.rescore_k = 0
+        coarse = store.search_vectors(queries, max_k)[0]
+        report[dtype] = {
+            "bytes_per_vector": store.bytes_per_vector,
+            "compression": report["float32"]["bytes_per_vector"] / store.bytes_per_vector
+                           if report else 1.0,
+            "roundtrip_error": float(np.abs(dequantize(*quantize(vectors, dtype)) - vectors).max())
+                               if len(vectors) else 0.0,
+            "recall": {str(k): _recall(exact, rows, k) for k in ks},
+            "recall_coarse": {str(k): _recall(exact, coarse, k) for k in ks},
+            "search_ms": search_seconds / max(1, len(queries)) * 1000,
+        }
+    return report
+
+class NumpyVectorStore:
+    """
+    In-process vector store: one float32 matrix plus a side table of chunks.
+
+    A drop-in for the parts of the Chroma interface this project uses
+    (similarity_search, similarity_search_by_vector, get, delete,
+    add_documents, persist), so it can back CachedRetriever, hybrid_search
+    and ingestion unchanged. Vectors are the L2-normalized embeddings from
+    get_embeddings, so a dot product is cosine similarity and top-k is one
+    matrix-vector product plus argpartition. Several queries can be
+    answered with one matrix-matrix product via similarity_search_by_vectors.
+
+    On disk (persist_dir/numpy_index) the matrix is a .npy file opened with
+    mmap_mode="r", so opening costs a metadata read and pages are loaded by
+    the OS on first scan; chunk texts and metadata are a JSON sidecar read
+    on first use. Every persist() writes new files and switches meta.json
+    to them, so readers holding the old mapping are never disturbed.
+    Writes are kept in memory until persist().
+
+    With dtype "float16" or "int8" the store serves compact vectors: the
+    quantized codes (written next to the matrix by persist()) are the only
+    vectors held in RAM and every query scans them, then the top rescore_k
+    candidates are re-scored exactly against their float32 rows, which are
+    read from the memory-mapped matrix on demand. int8 keeps 388 bytes per
+    384-dim vector instead of 1536.
+    """
+
+    def __init__(self, embedding_function: Optional[Embeddings] = None,
+                 persist_directory: Optional[str] = None,
+                 dtype: str = "float32",
+                 rescore_k: int = RESCORE_CANDIDATES):
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype} "
+                             f"(expected one of {', '.join(COMPACT_DTYPES)})")
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.dtype = dtype
+        self.rescore_k = rescore_k
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+        # Quantized (codes, scales) of the matrix, for compact dtypes
+        self._codes: Optional[Tuple[np.ndarray, Optional[np.ndarray]]] = None
+        self._codes_on_disk = False
+        self._documents: Optional[List[str]] = []
+        self._metadatas: Optional[List[dict]] = []
+        self._sidecar_path: Optional[str] = None
+        # Matrix file the loaded index was read from, to match codes against
+        self._vectors_file: Optional[str] = None
+        self._meta_mtime: Optional[int] = None
+        self._dirty = False
+        self._writes = 0
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Vector bytes held in RAM per chunk: the codes plus the int8 scale."""
+        dim = self._vectors.shape[1] if self._vectors.ndim == 2 else 0
+        if dim == 0 and self._pending:
+            dim = self._pending[0].shape[1]
+        itemsize = np.dtype(self.dtype).itemsize
+        return dim * itemsize + (4 if self.dtype == "int8" else 0)
+
+    # ----- persistence -------------------------------------------------
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        return os.path.join(path, "meta.json")
+
+    @classmethod
+    def load(cls, persist_dir: str, embedding_function: Optional[Embeddings] = None,
+             dtype: str = "float32") -> Optional["NumpyVectorStore"]:
+        """
+        Open a persisted store, or return None if there is none.
+
+        Args:
+            persist_dir: Directory the vector store is persisted under
+            embedding_function: Embeddings used for text queries and add_documents
+            dtype: Vectors served from RAM: "float32", "float16" or "int8"
+
+        Returns:
+            NumpyVectorStore with the matrix memory-mapped, or None
+        """
+        store = cls(embedding_function, persist_dir, dtype)
+        return store if store._reload() else None
+
+    def _reload(self) -> bool:
+        """(Re)read meta.json and map the current matrix. Caller holds no lock."""
+        path = numpy_index_path(self.persist_directory)
+        meta_path = self._meta_path(path)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != NUMPY_INDEX_VERSION:
+                logger.warning(f"Ignoring NumPy index with unknown version: {path}")
+                return False
+            vectors = np.load(os.path.join(path, meta["vectors"]), mmap_mode="r")
+            with open(os.path.join(path, meta["ids"]), "r", encoding="utf-8") as f:
+                ids = json.load(f)
+            codes = None
+            entry = meta.get("codes", {}).get(self.dtype) if self.dtype != "float32" else None
+            if entry:
+                # Read fully: the codes are what every query scans
+                codes = (np.load(os.path.join(path, entry["codes"])),
+                         np.load(os.path.join(path, entry["scales"]))
+                         if entry.get("scales") else None)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read NumPy index {path}: {str(e)}")
+            return False
+        if len(ids) != len(vectors) or (codes is not None and len(codes[0]) != len(ids)):
+            logger.warning(f"NumPy index {path} has {len(ids)} ids for {len(vectors)} vectors")
+            return False
+
+        with self._lock:
+            self._ids = ids
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            self._vectors = vectors
+            self._pending = []
+            self._codes = codes
+            self._codes_on_disk = codes is not None
+            self._documents = None
+            self._metadatas = None
+            self._sidecar_path = os.path.join(path, meta["docs"])
+            self._vectors_file = meta["vectors"]
+            self._meta_mtime = mtime
+            self._dirty = False
+        return True
+
+    def _refresh(self) -> None:
+        """Pick up a newer index persisted by another process or store object."""
+        if self.persist_directory is None or self._dirty:
+            return
+        try:
+            mtime = os.stat(self._meta_path(numpy_index_path(self.persist_directory))).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._meta_mtime:
+            self._reload()
+
+    def _load_sidecar(self) -> None:
+        """Read chunk texts and metadata on first use. Caller holds the lock."""
+        if self._documents is not None:
+            return
+        with open(self._sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self._documents = sidecar["documents"]
+        self._metadatas = sidecar["metadatas"]
+
+    def _matrix(self) -> np.ndarray:
+        """All vectors as one array, folding in pending rows. Caller holds the lock."""
+        if self._pending:
+            parts = ([self._vectors] if len(self._vectors) else []) + self._pending
+            self._vectors = np.ascontiguousarray(np.concatenate(parts), dtype=np.float32)
+            self._pending = []
+        return self._vectors
+
+    def _quantized(self) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Codes and scales of the matrix for compact dtypes, quantized after
+        writes or when the persisted index has none. Caller holds the lock.
+        """
+        if self.dtype == "float32" or not len(self._ids):
+            return None
+        if self._codes is None:
+            start = time.perf_counter()
+            self._codes = quantize(self._matrix(), self.dtype)
+            logger.debug(f"Quantized {len(self._ids)} vectors to {self.dtype} "
+                         f"in {time.perf_counter() - start:.2f}s")
+        return self._codes
+
+    def _write_codes(self, path: str, token: str,
+                     codes: Tuple[np.ndarray, Optional[np.ndarray]]) -> Dict[str, str]:
+        """Save the codes (and int8 scales) of this store's dtype; returns their file names."""
+        entry = {"codes": f"codes-{self.dtype}-{token}.npy"}
+        np.save(os.path.join(path, entry["codes"]), codes[0])
+        if codes[1] is not None:
+            entry["scales"] = f"scales-{self.dtype}-{token}.npy"
+            np.save(os.path.join(path, entry["scales"]), codes[1])
+        return entry
+
+    @classmethod
+    def _write_meta(cls, path: str, meta: dict) -> int:
+        meta_path = cls._meta_path(path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        return os.stat(meta_path).st_mtime_ns
+
+    def persist(self) -> None:
+        """
+        Write the matrix and sidecar to persist_directory if anything
+        changed. If only the codes of a compact dtype are missing on disk,
+        add them to the persisted index and leave the rest of it alone.
+        """
+        if self.persist_directory is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                if self.dtype != "float32" and not self._codes_on_disk:
+                    self._persist_codes()
+                return
+            self._load_sidecar()
+            vectors = self._matrix()
+            codes = self._quantized()
+            ids = list(self._ids)
+            sidecar = {"documents": list(self._documents), "metadatas": list(self._metadatas)}
+            writes = self._writes
+
+        path = numpy_index_path(self.persist_directory)
+        os.makedirs(path, exist_ok=True)
+        token = f"{time.time_ns():x}"
+        files = {"vectors": f"vectors-{token}.npy", "ids": f"ids-{token}.json",
+                 "docs": f"docs-{token}.json"}
+        np.save(os.path.join(path, files["vectors"]), vectors)
+        # Codes of other dtypes described the old matrix; they are rebuilt
+        # by whichever store opens the index with that dtype
+        code_files = {self.dtype: self._write_codes(path, token, codes)} if codes is not None else {}
+        with open(os.path.join(path, files["ids"]), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+        with open(os.path.join(path, files["docs"]), "w", encoding="utf-8") as f:
+            json.dump(sidecar, f)
+        mtime = self._write_meta(path, {
+            "version": NUMPY_INDEX_VERSION, "count": len(ids),
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "codes": code_files, **files})
+
+        # Old files may still be mapped by readers (and cannot be removed on
+        # Windows); they are retried on the next persist
+        keep = set(files.values()) | {name for entry in code_files.values() for name in entry.values()}
+        for name in os.listdir(path):
+            if name not in keep and name.split("-", 1)[0] in ("vectors", "ids", "docs", "codes", "scales"):
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self._sidecar_path = os.path.join(path, files["docs"])
+            self._vectors_file = files["vectors"]
+            self._meta_mtime = mtime
+            self._codes_on_disk = codes is not None
+            # Writes that raced this persist stay pending for the next one
+            self._dirty = self._writes != writes
+        logger.info(f"Persisted {len(ids)} vectors to {path}")
+
+    def _persist_codes(self) -> None:
+        """Add this dtype's codes to the persisted index. Caller holds the lock."""
+        path = numpy_index_path(self.persist_directory)
+        try:
+            with open(self._meta_path(path), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read NumPy index {path}: {str(e)}")
+            return
+        if meta.get("vectors") != self._vectors_file:
+            # Re-persisted since this store loaded it; these codes would not match
+            return
+        codes = self._quantized()
+        if codes is None:
+            return
+        meta.setdefault("codes", {})[self.dtype] = self._write_codes(path, f"{time.time_ns():x}", codes)
+        self._meta_mtime = self._write_meta(path, meta)
+        self._codes_on_disk = True
+        logger.info(f"Added {self.dtype} codes for {len(self._ids)} vectors to {path}")
+
+    # ----- writes ------------------------------------------------------
+
+    def upsert(self, ids: Sequence[str], embeddings, metadatas: Sequence[dict],
+               documents: Sequence[str]) -> None:
+        """Insert or replace chunks with pre-computed embeddings."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not len(ids):
+            return
+        with self._lock:
+            self._load_sidecar()
+            matrix = self._matrix()
+            if len(matrix) and matrix.shape[1] != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match "
+                                 f"the index ({matrix.shape[1]})")
+            new_rows = []
+            for i, chunk_id in enumerate(ids):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    self._rows[chunk_id] = len(self._ids)
+                    self._ids.append(chunk_id)
+                    self._documents.append(documents[i])
+                    self._metadatas.append(dict(metadatas[i] or {}))
+                    new_rows.append(i)
+                    continue
+                if not matrix.flags.writeable:
+                    matrix = self._vectors = np.array(matrix)
+                matrix[row] = vectors[i]
+                self._documents[row] = documents[i]
+                self._metadatas[row] = dict(metadatas[i] or {})
+            if new_rows:
+                self._pending.append(vectors[new_rows])
+            self._codes = None
+            self._dirty = True
+            self._writes += 1
+
+    def update_metadatas(self, ids: Sequence[str], metadatas: Sequence[dict]) -> None:
+        """Replace the metadata of stored chunks; unknown ids are ignored."""
+        with self._lock:
+            self._load_sidecar()
+            for chunk_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._metadatas[row] = dict(metadata or {})
+            self._dirty = True
+            self._writes += 1
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Embed documents and add them; returns their ids."""
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in documents]
+        vectors = self._embedding_function.embed_documents([doc.page_content for doc in documents])
+        self.upsert(ids, vectors, [doc.metadata for doc in documents],
+                    [doc.page_content for doc in documents])
+        return ids
+
+    def delete(self, ids: Optional[Iterable[str]] = None) -> None:
+        """Remove chunks by id; unknown ids are ignored."""
+        if not ids:
+            return
+        with self._lock:
+            drop = {self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows}
+            if not drop:
+                return
+            self._load_sidecar()
+            keep = np.array([row not in drop for row in range(len(self._ids))], dtype=bool)
+            self._vectors = np.ascontiguousarray(self._matrix()[keep])
+            self._ids = [chunk_id for row, chunk_id in enumerate(self._ids) if keep[row]]
+            self._documents = [text for row, text in enumerate(self._documents) if keep[row]]
+            self._metadatas = [meta for row, meta in enumerate(self._metadatas) if keep[row]]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._codes = None
+            self._dirty = True
+            self._writes += 1
+
+    # ----- reads -------------------------------------------------------
+
+    def get(self, ids: Optional[Sequence[str]] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> dict:
+        """
+        Chroma-style get: ids plus the requested "documents", "metadatas"
+        and "embeddings" (a float32 array), for all chunks or the given ids.
+        """
+        self._refresh()
+        with self._lock:
+            rows = (list(range(len(self._ids))) if ids is None
+                    else [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows])
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include or "metadatas" in include:
+                self._load_sidecar()
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                matrix = self._matrix()
+                result["embeddings"] = (np.asarray(matrix[rows]) if len(matrix)
+                                        else np.zeros((0, 0), dtype=np.float32))
+        return result
+
+    def _snapshot(self) -> Tuple[np.ndarray, Optional[tuple], List[str], List[dict]]:
+        """
+        Matrix, compact codes (or None) and side table as of now. Writes
+        replace or extend these objects, so rows of the returned arrays stay
+        valid for the lists.
+        """
+        self._refresh()
+        with self._lock:
+            self._load_sidecar()
+            return self._matrix(), self._quantized(), self._documents, self._metadatas
+
+    def search_vectors(self, queries, k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows for a batch of query vectors.
+
+        Args:
+            queries: (m, dim) or (dim,) float32 query embeddings
+            k: Number of results per query
+
+        Returns:
+            Tuple of (m, k') row indices and inner-product scores, best
+            first, with k' = min(k, number of vectors)
+        """
+        matrix, codes, _, _ = self._snapshot()
+        return self._search(matrix, codes, queries, k)
+
+    def _search(self, matrix: np.ndarray, codes: Optional[tuple], queries,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(matrix))
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        if codes is None:
+            return _top_rows(queries @ matrix.T, k)
+
+        # Coarse pass over the codes, a block at a time so the scan never
+        # holds a float32 copy of the whole matrix
+        coarse = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+            end = start + SCAN_BLOCK_ROWS
+            block = queries @ codes[0][start:end].astype(np.float32).T
+            if codes[1] is not None:
+                block *= codes[1][start:end]
+            coarse[:, start:end] = block
+        candidates, scores = _top_rows(coarse, max(k, self.rescore_k))
+        if self.rescore_k <= 0:
+            return candidates[:, :k], scores[:, :k]
+
+        # Exact pass: only the candidates' float32 rows are read from the map
+        rows = np.unique(candidates)
+        exact = queries @ np.asarray(matrix[rows], dtype=np.float32).T
+        exact = np.take_along_axis(exact, np.searchsorted(rows, candidates), axis=1)
+        order, scores = _top_rows(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), scores
+
+    def _search_documents(self, queries, k: int) -> List[List[Tuple[Document, float]]]:
+        from langchain_core.documents import Document
+
+        matrix, codes, documents, metadatas = self._snapshot()
+        rows, scores = self._search(matrix, codes, queries, k)
+        return [[(Document(page_content=documents[row], metadata=dict(metadatas[row])), float(score))
+                 for row, score in zip(query_rows, query_scores)]
+                for query_rows, query_scores in zip(rows, scores)]
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 3) -> List[List[Document]]:
+        """Answer several queries with one matrix product; one result list per query."""
+        return [[doc for doc, _ in results] for results in self._search_documents(embeddings, k)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 3, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    def similarity_search(self, query: str, k: int = 3, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k)
+
+    def similarity_search_with_score(self, query: str, k: int = 3,
+                                     **kwargs) -> List[Tuple[Document, float]]:
+        """Like Chroma, scores are squared L2 distances (lower is closer)."""
+        results = self._search_documents([self._embedding_function.embed_query(query)], k)[0]
+        return [(doc, 2.0 - 2.0 * score) for doc, score in results]
+
+def numpy_index_path(persist_dir: str = "chroma_db") -> str:
+    return os.path.join(persist_dir, NUMPY_INDEX_DIRNAME)
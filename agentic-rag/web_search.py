@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+from retrieval import normalize_query
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+WEB_SEARCH_RESULTS = 3
+# Longest a turn waits for web results after starting the search; variants
+# still running then are dropped from this answer but fill the cache
+WEB_SEARCH_BUDGET_SECONDS = 1.5
+WEB_SEARCH_TIMEOUT_SECONDS = 5.0
+WEB_SEARCH_CACHE_TTL_SECONDS = 3600.0
+WEB_SEARCH_CACHE_ENTRIES = 512
+WEB_SEARCH_VARIANTS = 2
+WEB_SEARCH_WORKERS = 8
+
+# Question phrasing that search engines do better without
+_FILLER_WORDS = frozenset(
+    "what which who whom how why when where is are was were do does did can could should "
+    "would will the a an of for in to on me my i you your please give tell about best".split()
+)
+
+class SearchProvider(ABC):
+    """
+    Interface for web search backends.
+
+    search() returns results as dicts with "title", "href" and "body" (the
+    DuckDuckGo text-search format) and should give up after timeout_seconds.
+    """
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int, timeout_seconds: float) -> List[dict]:
+        """Results for query, at most max_results, within timeout_seconds."""
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo text search through the duckduckgo_search package"""
+    name = "duckduckgo"
+
+    def __init__(self, region: str = "in-en"):
+        self.region = region
+
+    def search(self, query: str, max_results: int, timeout_seconds: float) -> List[dict]:
+        from duckduckgo_search import DDGS
+
+        with DDGS(timeout=max(1, math.ceil(timeout_seconds))) as ddgs:
+            return list(ddgs.text(query, region=self.region, max_results=max_results) or [])
+
+class HttpSearchProvider(SearchProvider):
+    """
+    JSON search endpoint: GET <url>?q=<query>&n=<max_results> returning a
+    list of {"title", "href", "body"}, e.g. LocalSearchServer.
+    """
+    name = "http"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def search(self, query: str, max_results: int, timeout_seconds: float) -> List[dict]:
+        params = urllib.parse.urlencode({"q": query, "n": max_results})
+        with urllib.request.urlopen(f"{self.url}?{params}", timeout=timeout_seconds) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+class _LocalSearchHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        query = params.get("q", [""])[0]
+        count = int(params.get("n", ["3"])[0])
+        time.sleep(self.server.latency_seconds)
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+        results = [{"title": f"{query} ({i + 1})",
+                    "href": f"https://search.local/{digest}/{i + 1}",
+                    "body": f"Result {i + 1} about {query}."} for i in range(count)]
+        body = json.dumps(results).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class LocalSearchServer:
+    """
+    Offline stand-in search server for tests and benchmarks.
+
+    Serves deterministic results for any query after latency_seconds, in
+    the format HttpSearchProvider expects, on a free local port.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self._httpd = ThreadingHTTPServer((host, port), _LocalSearchHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.latency_seconds = latency_seconds
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    @property
+    def latency_seconds(self) -> float:
+        return self._httpd.latency_seconds
+
+    @latency_seconds.setter
+    def latency_seconds(self, value: float) -> None:
+        self._httpd.latency_seconds = value
+
+    def start(self) -> "LocalSearchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="local-search", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def query_variants(query: str, max_variants: int = WEB_SEARCH_VARIANTS) -> List[str]:
+    """
+    Phrasings of a query to search in parallel: the query as asked, then
+    its keywords without question words.
+    """
+    query = " ".join(query.split())
+    keywords = " ".join(word for word in re.findall(r"[\w+#.-]+", query.lower())
+                        if word not in _FILLER_WORDS)
+    variants = [query] + ([keywords] if keywords else [])
+    return list(dict.fromkeys(variants))[:max(1, max_variants)]
+
+def merge_results(result_lists: Sequence[List[dict]], max_results: int) -> List[dict]:
+    """Interleave results of each variant by rank, keeping the first hit per URL."""
+    merged, seen = [], set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            result = results[rank]
+            url = (result.get("href") or "").rstrip("/").lower()
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            merged.append(result)
+            if len(merged) >= max_results:
+                return merged
+    return merged
+
+def to_documents(results: List[dict]) -> List[Document]:
+    """Web results as documents for assemble_context, with the URL kept in the text."""
+    from langchain_core.documents import Document
+
+    docs = []
+    for rank, result in enumerate(results):
+        title = " ".join((result.get("title") or "").split())
+        body = " ".join((result.get("body") or "").split())
+        docs.append(Document(
+            page_content=f"{title}: {body} (Source: {result.get('href', '')})",
+            metadata={"source": result.get("href", ""), "title": title,
+                      "origin": "web", "rank": rank},
+        ))
+    return docs
+
+class PendingWebSearch:
+    """Web search started by WebSearcher.start(); result() honours the budget."""
+
+    def __init__(self, futures: List[Future], deadline: float, max_results: int,
+                 cached: Optional[List[dict]] = None):
+        self._futures = futures
+        self._deadline = deadline
+        self._max_results = max_results
+        self._cached = cached
+
+    def result(self) -> List[Document]:
+        """
+        Results available by the deadline, most relevant first.
+
+        Blocks at most until the budget that started with the search runs
+        out; variants still running are left out.
+        """
+        if self._cached is not None:
+            return to_documents(self._cached)
+        with metrics.span("web.wait"):
+            done, not_done = wait(self._futures, timeout=max(0.0, self._deadline - time.perf_counter()))
+        if not_done:
+            metrics.inc("web_search_timeouts", len(not_done))
+        results = [future.result() for future in self._futures
+                   if future in done and future.result() is not None]
+        merged = merge_results(results, self._max_results)
+        metrics.inc("web_results", len(merged))
+        return to_documents(merged)
+
+class WebSearcher:
+    """
+    Web search as a retrieval source next to the vector store.
+
+    Each query is searched as a few variants in parallel, each with its own
+    provider timeout. start() returns immediately so vector retrieval runs
+    meanwhile; the answer then waits for web results only until
+    budget_seconds after the start. Merged results are cached per
+    normalized query for cache_ttl_seconds, including results of variants
+    that finished after the budget, so a repeat question gets them all.
+    """
+
+    def __init__(self, provider: SearchProvider, max_results: int = WEB_SEARCH_RESULTS,
+                 budget_seconds: float = WEB_SEARCH_BUDGET_SECONDS,
+                 timeout_seconds: float = WEB_SEARCH_TIMEOUT_SECONDS,
+                 cache_ttl_seconds: float = WEB_SEARCH_CACHE_TTL_SECONDS,
+                 max_variants: int = WEB_SEARCH_VARIANTS,
+                 max_workers: int = WEB_SEARCH_WORKERS):
+        self.provider = provider
+        self.max_results = max_results
+        self.budget_seconds = budget_seconds
+        self.timeout_seconds = timeout_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.max_variants = max_variants
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._cache: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_get(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.cache_ttl_seconds:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_put(self, key: str, results: List[dict]) -> None:
+        with self._lock:
+            self._cache[key] = (time.time(), results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > WEB_SEARCH_CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def _search_variant(self, query: str) -> Optional[List[dict]]:
+        start = time.perf_counter()
+        try:
+            results = self.provider.search(query, self.max_results, self.timeout_seconds)
+        except Exception as e:
+            metrics.inc("web_search_errors")
+            logger.warning(f"Web search ({self.provider.name}) failed for {query!r}: {str(e)}")
+            return None
+        finally:
+            metrics.record("web.search_call", time.perf_counter() - start)
+        return list(results)
+
+    def start(self, query: str) -> PendingWebSearch:
+        """
+        Start searching a query in the background.
+
+        Args:
+            query: User query text
+
+        Returns:
+            PendingWebSearch whose result() returns within the budget
+        """
+        deadline = time.perf_counter() + self.budget_seconds
+        key = normalize_query(query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            metrics.inc("web_cache_hits")
+            return PendingWebSearch([], deadline, self.max_results, cached)
+        metrics.inc("web_cache_misses")
+
+        futures = [self._pool.submit(self._search_variant, variant)
+                   for variant in query_variants(query, self.max_variants)]
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def on_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            results = [future.result() for future in futures]
+            if any(result is not None for result in results):
+                self._cache_put(key, merge_results([r for r in results if r is not None],
+                                                   self.max_results))
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return PendingWebSearch(futures, deadline, self.max_results)
+
+    def search(self, query: str) -> List[Document]:
+        """Search and wait for results, at most budget_seconds."""
+        return self.start(query).result()
+
+def build_provider(name: Optional[str] = None) -> SearchProvider:
+    """
+    Search provider from WEB_SEARCH_PROVIDER: duckduckgo (default) or http,
+    which queries WEB_SEARCH_URL (e.g. a LocalSearchServer).
+    """
+    name = (name or os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo")).lower()
+    if name == "duckduckgo":
+        return DuckDuckGoProvider()
+    if name == "http":
+        url = os.getenv("WEB_SEARCH_URL")
+        if not url:
+            raise ValueError("WEB_SEARCH_URL is required for the http search provider")
+        return HttpSearchProvider(url)
+    raise ValueError(f"Unknown web search provider: {name}")
+
+# Shared by every session so cached web results are reused across users
+_shared_searchers: Dict[Tuple[str, float], WebSearcher] = {}
+_shared_lock = threading.Lock()
+
+def build_web_searcher(enabled: Optional[bool] = None,
+                       budget_seconds: Optional[float] = None) -> Optional[WebSearcher]:
+    """
+    Return the process-wide web searcher, or None if web search is off.
+
+    WEB_SEARCH=on enables it; WEB_SEARCH_RESULTS, WEB_SEARCH_BUDGET_MS,
+    WEB_SEARCH_TIMEOUT_MS and WEB_SEARCH_CACHE_TTL tune it.
+
+    Args:
+        enabled: Override WEB_SEARCH
+        budget_seconds: Override WEB_SEARCH_BUDGET_MS
+
+    Returns:
+        WebSearcher or None
+
+    Raises:
+        ValueError: If the provider is unknown or misconfigured, or a
+            numeric setting is not a number
+    """
+    if enabled is None:
+        enabled = os.getenv("WEB_SEARCH", "off").lower() in ("1", "on", "true")
+    if not enabled:
+        return None
+    if budget_seconds is None:
+        budget_seconds = float(os.getenv("WEB_SEARCH_BUDGET_MS",
+                                         str(WEB_SEARCH_BUDGET_SECONDS * 1000))) / 1000
+    provider_name = os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo").lower()
+    key = (provider_name, budget_seconds)
+    with _shared_lock:
+        searcher = _shared_searchers.get(key)
+        if searcher is None:
+            searcher = WebSearcher(
+                build_provider(provider_name),
+                max_results=int(os.getenv("WEB_SEARCH_RESULTS", str(WEB_SEARCH_RESULTS))),
+                budget_seconds=budget_seconds,
+                timeout_seconds=float(os.getenv("WEB_SEARCH_TIMEOUT_MS",
+                                                str(WEB_SEARCH_TIMEOUT_SECONDS * 1000))) / 1000,
+                cache_ttl_seconds=float(os.getenv("WEB_SEARCH_CACHE_TTL",
+                                                  str(WEB_SEARCH_CACHE_TTL_SECONDS))),
+            )
+            _shared_searchers[key] = searcher
+        return searcher